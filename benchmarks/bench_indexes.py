@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""\
+Time the queries that depend on the database indexes, with and without the
+indexes.
+
+Usage:
+    bench_indexes.py [-n <deals>] [-s <seed>]
+
+Options:
+    -n --num-deals <deals>  [default: 1000000]
+        The number of rows to put in the deal table.  The other tables are
+        filled in proportionally, i.e. 56 deals and 12 exchanges per round,
+        and 10 rounds per game.
+
+    -s --seed <seed>        [default: 0]
+        The seed for the random number generator used to fill in the tables.
+"""
+
+import docopt, random, tempfile, time
+import tich_me
+
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+def make_random_db(session, num_deals, rng):
+    seats = list(tich_me.SeatTypes)
+    card_ids = list(tich_me.get_card_ids(session).values())
+    bulk = tich_me.BulkInsert(session)
+
+    num_rounds = num_deals // len(card_ids)
+    num_games = max(num_rounds // 10, 1)
+    urls = []
+
+    for i in range(num_games):
+        url = f'http://example.com/{i}.tch'
+        game = bulk.add(tich_me.Game, url=url)
+        urls.append(url)
+
+        seat_ids = [
+                bulk.add(tich_me.Seat, game_id=game, player_id=1, seat=x)
+                for x in seats
+        ]
+
+        for j in range(10):
+            round = bulk.add(tich_me.Round, game_id=game, order=j)
+            cards = rng.sample(card_ids, len(card_ids))
+            hands = [cards[k::4] for k in range(4)]
+
+            for seat, hand in zip(seat_ids, hands):
+                for k, card in enumerate(hand):
+                    bulk.add(tich_me.Deal,
+                            round_id=round,
+                            seat_id=seat,
+                            card_id=card,
+                            group=tich_me.DealTypes.first_8 if k < 8 \
+                                    else tich_me.DealTypes.second_6,
+                    )
+
+            for k, giver in enumerate(seat_ids):
+                for l in range(1, 4):
+                    bulk.add(tich_me.Exchange,
+                            round_id=round,
+                            giver_id=giver,
+                            taker_id=seat_ids[(k + l) % 4],
+                            card_id=hands[k][l],
+                    )
+
+            if rng.random() < 0.3:
+                bulk.add(tich_me.Call,
+                        round_id=round,
+                        seat_id=rng.choice(seat_ids),
+                        call=rng.choice(list(tich_me.CallTypes)),
+                )
+
+        # Keep memory use reasonable.
+        if i % 100 == 0:
+            bulk.execute()
+
+    bulk.add(tich_me.Player, name='bench')
+    bulk.execute()
+    session.commit()
+
+    return urls
+
+def time_it(f, repeat=3):
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def time_queries(session, urls, rng):
+    lookup_urls = rng.sample(urls, min(len(urls), 1000))
+
+    def lookup():
+        for url in lookup_urls:
+            tich_me.is_game_recorded(session, url)
+
+    def join():
+        for q in tich_me.query_exchanges_by_call(session).values():
+            q.count()
+
+    return {
+            f'is_game_recorded() x{len(lookup_urls)}': time_it(lookup),
+            'query_exchanges_by_call()': time_it(join),
+    }
+
+def drop_indexes(engine):
+    for table in tich_me.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(engine)
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    num_deals = int(args['--num-deals'])
+    rng = random.Random(int(args['--seed']))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f'sqlite:///{Path(tmp) / "tichu.db"}')
+        tich_me.init_schema(engine)
+        session = sessionmaker(bind=engine)()
+
+        start = time.perf_counter()
+        urls = make_random_db(session, num_deals, rng)
+        print(f"Filled in {session.query(tich_me.Deal).count()} deals "
+              f"in {time.perf_counter() - start:.1f}s")
+        print()
+
+        with_indexes = time_queries(session, urls, rng)
+        drop_indexes(engine)
+        without_indexes = time_queries(session, urls, rng)
+
+        print(f"{'':30s} {'indexed':>10s} {'unindexed':>10s}")
+        for k in with_indexes:
+            print(f"{k:30s} {with_indexes[k]:9.3f}s {without_indexes[k]:9.3f}s")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+"""\
+Measure the throughput and peak memory use of parsing, recording, and
+analyzing games, using randomly generated game logs.
+
+Usage:
+    bench_ingest.py [-n <games>]... [-p <pool>] [-s <seed>] [-m]
+        [-o <json>] [-c <json>] [-t <tolerance>]
+
+Options:
+    -n --num-games <games>
+        The number of games to benchmark with.  This can be specified more
+        than once to benchmark several scales, e.g. `-n 1000 -n 100000 -n
+        1000000`.  Note that recording a million games takes hours and
+        several GB of disk space.  The default is 1000.
+
+    -p --pool <pool>            [default: 1000]
+        The number of distinct logs to generate.  Larger benchmarks cycle
+        through the same logs (with different URLs), since generating logs is
+        slower than parsing them.
+
+    -s --seed <seed>            [default: 0]
+        The seed for the random number generator used to make the logs.
+
+    -m --memory
+        Also measure the peak memory allocated by each stage, using
+        `tracemalloc`.  This makes everything several times slower, so the
+        throughputs measured in the same run aren't comparable to ones
+        measured without this option.
+
+    -o --output <json>
+        Save the results to the given path, e.g. to use as a baseline for
+        future runs.
+
+    -c --compare <json>
+        Compare the results to a baseline saved with `--output`.  The exit
+        code is nonzero if any stage got slower (or used more memory) by more
+        than the tolerance.
+
+    -t --tolerance <tolerance>  [default: 0.2]
+        The fraction by which a result can be worse than the baseline before
+        it counts as a regression.
+"""
+
+import docopt, json, sys, tempfile, time, tracemalloc
+import tich_me
+
+from itertools import cycle, islice
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from tich_me.synthetic import generate_logs
+
+BATCH_SIZE = 1000
+MAX_ORM_GAMES = 100
+
+def iter_logs(pool, num_games):
+    for i, log in enumerate(islice(cycle(pool), num_games)):
+        yield f'http://example.com/{i}.tch', log
+
+def parse_games(logs):
+    for url, log in logs:
+        game = tich_me.parse_game(log)
+        game['url'] = url
+        yield game
+
+def bench_parse(pool, num_games):
+    n = 0
+    for url, log in iter_logs(pool, num_games):
+        tich_me.parse_game(log)
+        n += 1
+    return n
+
+def bench_record_bulk(session, pool, num_games):
+    # Only the time spent recording is wanted, so parse each batch before
+    # starting the clock.
+    elapsed = 0
+    games = parse_games(iter_logs(pool, num_games))
+
+    while True:
+        batch = list(islice(games, BATCH_SIZE))
+        if not batch:
+            break
+
+        start = time.perf_counter()
+        tich_me.record_games_bulk(session, batch)
+        session.commit()
+        elapsed += time.perf_counter() - start
+
+    return num_games, elapsed
+
+def bench_record_orm(session, pool, num_games):
+    games = list(parse_games(iter_logs(pool, num_games)))
+
+    start = time.perf_counter()
+    for game in games:
+        tich_me.record_game(session, game)
+        session.commit()
+    return len(games), time.perf_counter() - start
+
+def bench_query_exchanges_by_call(session):
+    for q in tich_me.query_exchanges_by_call(session).values():
+        q.count()
+
+def bench_count_exchanges(session):
+    tich_me.count_exchanges(session)
+
+def measure(results, name, f, memory=False, units=None):
+    """
+    Call the given function, and record how long it took and (optionally)
+    how much memory it allocated.  If the function returns ``(n, elapsed)``,
+    only *elapsed* seconds are counted.  If *units* is given, the function
+    should return a count of those units, and a throughput is recorded too.
+    """
+    if memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    n = f()
+    elapsed = time.perf_counter() - start
+
+    if isinstance(n, tuple):
+        n, elapsed = n
+
+    result = {'seconds': elapsed}
+
+    if units:
+        result[f'{units}/sec'] = n / elapsed
+
+    if memory:
+        result['peak MB'] = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+
+    results[name] = result
+    return result
+
+def run_benchmarks(pool, num_games, memory=False):
+    results = {}
+    orm_games = min(num_games, MAX_ORM_GAMES)
+
+    measure(results, 'parse_game', lambda: bench_parse(pool, num_games),
+            memory, units='games')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session = make_session(Path(tmp) / 'bulk.db')
+        measure(results, 'record_games_bulk',
+                lambda: bench_record_bulk(session, pool, num_games),
+                memory, units='games')
+        measure(results, 'query_exchanges_by_call',
+                lambda: bench_query_exchanges_by_call(session),
+                memory)
+        measure(results, 'count_exchanges (cold)',
+                lambda: bench_count_exchanges(session),
+                memory)
+        measure(results, 'count_exchanges (warm)',
+                lambda: bench_count_exchanges(session),
+                memory)
+        session.close()
+
+        session = make_session(Path(tmp) / 'orm.db')
+        measure(results, f'record_game (x{orm_games})',
+                lambda: bench_record_orm(session, pool, orm_games),
+                memory, units='games')
+        session.close()
+
+    return results
+
+def make_session(path):
+    engine = create_engine(f'sqlite:///{path}')
+    tich_me.init_schema(engine)
+    return sessionmaker(bind=engine)()
+
+def compare_results(results, baseline, tolerance):
+    """
+    Return a list of descriptions of any results that are worse than the
+    baseline by more than the given tolerance.
+    """
+    regressions = []
+
+    for scale, stages in results.items():
+        for stage, metrics in stages.items():
+            for metric, value in metrics.items():
+                try:
+                    expected = baseline[scale][stage][metric]
+                except KeyError:
+                    continue
+
+                higher_is_better = metric.endswith('/sec')
+                worse = value < expected * (1 - tolerance) \
+                        if higher_is_better \
+                        else value > expected * (1 + tolerance)
+
+                if worse:
+                    regressions.append(
+                            f"{scale} games, {stage}, {metric}: "
+                            f"{value:.3g} vs {expected:.3g}"
+                    )
+
+    return regressions
+
+def print_results(num_games, results):
+    print(f"{num_games} games:")
+    for stage, metrics in results.items():
+        metrics = '  '.join(f"{v:10.3f} {k}" for k, v in metrics.items())
+        print(f"  {stage:30s} {metrics}")
+    print()
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    scales = [int(x) for x in args['--num-games']] or [1000]
+    pool_size = int(args['--pool'])
+    seed = int(args['--seed'])
+
+    start = time.perf_counter()
+    pool = list(generate_logs(min(pool_size, max(scales)), seed))
+    print(f"Generated {len(pool)} logs in {time.perf_counter() - start:.1f}s")
+    print()
+
+    results = {}
+    for num_games in scales:
+        results[str(num_games)] = run_benchmarks(
+                pool, num_games, args['--memory'])
+        print_results(num_games, results[str(num_games)])
+
+    if args['--output']:
+        Path(args['--output']).write_text(json.dumps(results, indent=2))
+
+    if args['--compare']:
+        baseline = json.loads(Path(args['--compare']).read_text())
+        regressions = compare_results(
+                results, baseline, float(args['--tolerance']))
+
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        else:
+            print("No regressions.")
@@ -20,18 +20,25 @@ setup(
             'tich_me=tich_me.main:main',
         ],
     },
+    python_requires='>=3.8',
     install_requires=[
         'appdirs',
         'docopt',
-        'sqlalchemy',
+        'sqlalchemy>=1.4',
         'requests',
         'beautifulsoup4',
         'numpy',
-        'pandas',
+        'pandas>=1.2',
         'matplotlib',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
     classifiers=[
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Games/Entertainment :: Board Games',
         'License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)',
         'Natural Language :: English',
@@ -3,7 +3,8 @@
 import tich_me, pytest
 
 import sys, os; sys.path.append(os.path.dirname(__file__))
-from test_model import db_session
+from test_model import db_session, count_queries
+from test_parsing import get_demo_game
 from test_recording import record_demo_game
 
 test_exchanges_by_call_params = {
@@ -151,3 +152,255 @@ def test_exchanges_by_call(db_session, demo):
         # Make sure no unexpected extra cards were passed.
         assert queries[k].count() == num_exchanges
 
+
+def test_count_exchanges(db_session):
+    from collections import Counter
+
+    for demo in test_exchanges_by_call_params:
+        record_demo_game(db_session, demo)
+
+    # Count the exchanges the slow way, one ORM object at a time.
+    counts = Counter()
+    relations = {1: 'right', 2: 'partner', 3: 'left'}
+
+    for call, q in tich_me.query_exchanges_by_call(db_session).items():
+        for exchange in q.all():
+            giver = exchange.giver.seat.value
+            taker = exchange.taker.seat.value
+            relation = relations[(giver - taker) % 4]
+            counts[call, relation, tich_me.get_rank(exchange.card)] += 1
+
+    df = tich_me.count_exchanges(db_session)
+
+    assert list(df.columns) == ['call', 'giver', 'rank', 'count', 'prob']
+    assert {
+            (x.call, x.giver, x.rank): x.count
+            for x in df.itertuples()
+    } == counts
+
+    for (call, giver), group in df.groupby(['call', 'giver']):
+        assert group['prob'].sum() == pytest.approx(1)
+
+def test_refresh_exchange_counts(db_session, count_queries):
+    from datetime import datetime
+    from collections import Counter
+
+    def record_dated_game(demo, date):
+        game_dict = tich_me.parse_game(get_demo_game(demo))
+        game_dict['url'] = demo
+        game_dict['date'] = date
+        tich_me.record_game(db_session, game_dict)
+        db_session.commit()
+
+    def query_summary():
+        return Counter({
+                (x.year, x.month, x.call, x.giver, x.rank): x.count
+                for x in db_session.query(tich_me.ExchangeCount)
+        })
+
+    record_dated_game('normal_game.tch', datetime(2018, 6, 30))
+    tich_me.refresh_exchange_counts(db_session)
+    june = query_summary()
+
+    assert sum(june.values()) == db_session.query(tich_me.Exchange).count()
+
+    # Refreshing again without any new games doesn't count anything.
+    count_queries.clear()
+    tich_me.refresh_exchange_counts(db_session)
+    assert not any('exchange_count' in x for x in count_queries)
+
+    # Adding a game in a new month only adds rows for that month.
+    record_dated_game('one_round_grand_tichu.tch', datetime(2018, 7, 1))
+    tich_me.refresh_exchange_counts(db_session)
+    both = query_summary()
+
+    assert {k: v for k, v in both.items() if k[:2] == (2018, 6)} == june
+    assert sum(both.values()) - sum(june.values()) == 12
+
+    df = tich_me.count_exchanges(db_session)
+    assert df['count'].sum() == db_session.query(tich_me.Exchange).count()
+
+@pytest.mark.parametrize('format, num_workers', [('svg', 1), ('png', 2)])
+def test_save_exchange_figures(db_session, tmp_path, format, num_workers):
+    record_demo_game(db_session, 'normal_game.tch')
+    df = tich_me.count_exchanges(db_session)
+
+    paths = tich_me.save_exchange_figures(
+            df, tmp_path / 'figures', format, num_workers)
+
+    assert {x.name for x in paths} == {
+            f'{name}.{format}' for name in tich_me.EXCHANGE_FIGURES
+    }
+    assert all(x.stat().st_size > 0 for x in paths)
+
+def test_load_cached_frame(tmp_path):
+    import pandas as pd
+
+    source = tmp_path / 'source.txt'
+    source.write_text('1')
+    cache = tmp_path / 'cache' / 'df.pkl'
+    calls = []
+
+    def calculate():
+        calls.append(source.read_text())
+        return pd.DataFrame({'x': [int(source.read_text())]})
+
+    df = tich_me.load_cached_frame(cache, [source], calculate)
+    assert df['x'].tolist() == [1]
+    assert tich_me.load_cached_frame(cache, [source], calculate).equals(df)
+    assert calls == ['1']
+
+    source.write_text('22')
+    df = tich_me.load_cached_frame(cache, [source], calculate)
+    assert df['x'].tolist() == [22]
+    assert calls == ['1', '22']
+
+    # Changes that are only in the write-ahead log count too.
+    source.with_name('source.txt-wal').write_text('333')
+    df = tich_me.load_cached_frame(cache, [source], calculate)
+    assert calls == ['1', '22', '22']
+
+def test_bootstrap_exchange_probs(db_session):
+    for demo in test_exchanges_by_call_params:
+        record_demo_game(db_session, demo)
+
+    counts = tich_me.count_exchanges(db_session)
+    df = tich_me.bootstrap_exchange_probs(counts, num_samples=1000)
+
+    assert df.equals(
+            tich_me.bootstrap_exchange_probs(counts, num_samples=1000))
+
+    # Every rank is included, even if it was never passed.
+    assert len(df) == 17 * len(counts[['call', 'giver']].drop_duplicates())
+    assert df['count'].sum() == counts['count'].sum()
+    assert (df['prob_lo'] <= df['prob']).all()
+    assert (df['prob'] <= df['prob_hi']).all()
+
+    # The intervals get narrower with more data.
+    more = counts.assign(count=counts['count'] * 100)
+    df_more = tich_me.bootstrap_exchange_probs(more, num_samples=1000)
+    width = df['prob_hi'] - df['prob_lo']
+    width_more = df_more['prob_hi'] - df_more['prob_lo']
+    assert width_more.sum() < width.sum() / 5
+
+    baseline = df[['call', 'giver', 'rank']].assign(prob=1/17)
+    compared = tich_me.compare_exchange_probs(df, baseline)
+    assert compared['significant'].tolist() == [
+            not lo <= 1/17 <= hi
+            for lo, hi in zip(df['prob_lo'], df['prob_hi'])
+    ]
+
+def test_bootstrap_exchange_probs_never_passed():
+    import pandas as pd
+
+    # Rank 15 was never passed, but with only 33 exchanges, that isn't 
+    # surprising if it's passed 2% of the time by chance.
+    ranks = [x for x in range(1, 18) if x != 15]
+    counts = pd.DataFrame({
+            'call': 'grand_tichu',
+            'giver': 'left',
+            'rank': ranks,
+            'count': [2] * 15 + [3],
+    })
+    assert counts['count'].sum() == 33
+
+    df = tich_me.bootstrap_exchange_probs(counts, num_samples=1000)
+    never = df[df['rank'] == 15].iloc[0]
+    assert never['prob'] == 0
+    assert never['prob_lo'] == 0
+    assert never['prob_hi'] > 0.019
+
+    baseline = pd.DataFrame({
+            'call': ['grand_tichu'],
+            'giver': ['left'],
+            'rank': [15],
+            'prob': [0.019],
+    })
+    compared = tich_me.compare_exchange_probs(df, baseline)
+    assert not compared['significant'].any()
+
+    # With many more exchanges, never passing rank 15 is significant.
+    more = counts.assign(count=counts['count'] * 100)
+    df_more = tich_me.bootstrap_exchange_probs(more, num_samples=1000)
+    compared = tich_me.compare_exchange_probs(df_more, baseline)
+    assert compared['significant'].tolist() == [
+            rank == 15 for rank in compared['rank']
+    ]
+
+def test_grand_tichus(db_session, tmp_path):
+    from tich_me.synthetic import generate_logs
+
+    games = []
+    for i, log in enumerate(generate_logs(20)):
+        game = tich_me.parse_game(log)
+        game['url'] = f'{i}.tch'
+        games.append(game)
+
+    tich_me.record_games_bulk(db_session, games)
+    db_session.commit()
+
+    df = tich_me.query_grand_tichus(db_session)
+
+    # Find the same calls the slow way, one ORM object at a time.
+    expected = {}
+    for call in db_session.query(tich_me.Call):
+        if call.call != tich_me.CallTypes.grand_tichu:
+            continue
+
+        hand, = [x for x in call.round.hands if x.seat_id == call.seat_id]
+        first = min(call.round.finishes, key=lambda x: x.order)
+        expected[call.round_id, hand.first_8] = first.seat_id == call.seat_id
+
+    assert len(expected) > 5
+    assert 0 < sum(expected.values()) < len(expected)
+    assert {
+            (x.round_id, x.first_8): x.success
+            for x in df.itertuples()
+    } == expected
+
+    features = tich_me.grand_tichu_features(df)
+    assert (features['num_cards'] == 8).all()
+
+    summary = tich_me.summarize_grand_tichus(features)
+    for feature, group in summary.groupby('feature'):
+        assert group['calls'].sum() == len(df)
+        assert group['successes'].sum() == df['success'].sum()
+
+    assert (summary['rate_lo'] <= summary['rate']).all()
+    assert (summary['rate'] <= summary['rate_hi']).all()
+
+    paths = tich_me.save_figures(
+            tich_me.GRAND_TICHU_FIGURES, summary, tmp_path, 'png')
+    assert all(x.stat().st_size > 0 for x in paths)
+
+def test_grand_tichus_all_or_nothing():
+    import pandas as pd
+    import matplotlib.pyplot as plt
+
+    # Every call with 0 aces fails, and every call with 1 ace succeeds.  The 
+    # confidence intervals for these rates are the easiest to get wrong.
+    df = pd.DataFrame({
+            'num_aces': [0] * 11 + [1] * 6,
+            'success': [False] * 11 + [True] * 6,
+    })
+    summary = tich_me.summarize_grand_tichus(df, ['num_aces'])
+
+    assert summary['rate'].tolist() == [0, 1]
+    assert summary['rate_lo'].iloc[0] == 0
+    assert summary['rate_hi'].iloc[1] == 1
+
+    fig = tich_me.plot_grand_tichu_success(summary)
+    plt.close(fig)
+
+def test_wilson_interval():
+    lo, hi = tich_me.wilson_interval([0, 5, 10], [10, 10, 10])
+
+    assert lo[0] == 0
+    assert hi[2] == 1
+    assert lo[1] == pytest.approx(0.2366, abs=1e-4)
+    assert hi[1] == pytest.approx(0.7634, abs=1e-4)
+
+    # Rounding error doesn't push the interval past the observed rate.
+    for n in [6, 11, 21, 22]:
+        lo, hi = tich_me.wilson_interval([0, n], [n, n])
+        assert lo[0] == 0 and hi[1] == 1
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest
+
+import sys, os; sys.path.append(os.path.dirname(__file__))
+from test_parsing import get_demo_game
+from test_downloading import stub_bsw, RecordProgress
+
+@pytest.fixture
+def logs(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(f'sqlite:///{tmp_path / "logs.db"}')
+    tich_me.init_archive_schema(engine)
+
+    Session = sessionmaker(bind=engine)
+    return Session()
+
+
+def test_archive_log(logs):
+    game_txt = get_demo_game('normal_game.tch')
+
+    digest = tich_me.archive_log(logs, game_txt, 'http://example.com/1.tch')
+    logs.commit()
+
+    # Identical logs are only stored once.
+    assert tich_me.archive_log(logs, game_txt, 'http://example.com/1.tch') \
+            == digest
+    assert tich_me.archive_log(logs, game_txt, 'http://example.com/2.tch') \
+            == digest
+    logs.commit()
+
+    assert logs.query(tich_me.Log).count() == 1
+    assert tich_me.count_archived_logs(logs) == 2
+
+    for url in ['http://example.com/1.tch', 'http://example.com/2.tch']:
+        assert tich_me.is_log_archived(logs, url)
+        assert tich_me.load_archived_log(logs, url) == game_txt
+
+    assert not tich_me.is_log_archived(logs, 'http://example.com/3.tch')
+
+    # The logs are compressed.
+    log = logs.query(tich_me.Log).one()
+    assert len(log.data) < len(game_txt) / 3
+
+@pytest.mark.parametrize('num_workers, batch_size', [(1, 1000), (2, 3)])
+def test_reparse_archive(stub_bsw, num_workers, batch_size):
+    tich_me.scrape_bsw_month(2018, 7, RecordProgress())
+    stub_bsw.close()
+
+    session = tich_me.init_db()
+    expected = {
+            table: session.query(table).count()
+            for table in [tich_me.Game, tich_me.Round, tich_me.Deal]
+    }
+    session.close()
+    tich_me.app.DB_PATH.unlink()
+
+    progress = RecordProgress()
+    progress.parse_game = progress.download_game
+    tich_me.reparse_archive(progress, num_workers, batch_size)
+
+    assert progress.games == sorted(progress.games)
+    assert len(progress.games) == len(stub_bsw.games)
+    assert len(progress.errors) == 2
+
+    session = tich_me.init_db()
+    for table, count in expected.items():
+        assert session.query(table).count() == count
+
+def test_reparse_empty_archive(stub_bsw, monkeypatch):
+    from tich_me import main
+
+    # Make a database with games that aren't in the archive.
+    session = tich_me.init_db()
+    for name in ['normal_game.tch', 'one_round_grand_tichu.tch']:
+        game = tich_me.parse_game(get_demo_game(name))
+        game['url'] = name
+        tich_me.record_games_bulk(session, [game])
+    session.commit()
+    session.close()
+
+    monkeypatch.setattr(sys, 'argv', ['tich_me', 'reparse'])
+    with pytest.raises(SystemExit):
+        main.main()
+
+    session = tich_me.init_db()
+    assert session.query(tich_me.Game).count() == 2
+    session.close()
+
+    # If the archive has fewer games than the database, ask first.
+    logs = tich_me.init_archive()
+    tich_me.archive_log(logs, get_demo_game('one_round_no_tichu.tch'), 'x')
+    logs.commit()
+    logs.close()
+
+    prompts = []
+    monkeypatch.setattr('builtins.input', lambda x: prompts.append(x) or 'n')
+    main.main()
+
+    assert len(prompts) == 1
+
+    session = tich_me.init_db()
+    assert session.query(tich_me.Game).count() == 2
+    session.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+Check that games can be recorded and analyzed with each supported kind of
+database.
+
+The PostgreSQL tests need a server to connect to.  Either set
+$TICH_ME_TEST_POSTGRES_URL to the URL of a database that can be wiped (e.g.
+``postgresql+psycopg://localhost/tich_me_test``), or install the
+`testing.postgresql` package (and PostgreSQL itself) to have a throwaway
+server started automatically.  Otherwise, the tests are skipped.
+"""
+
+import tich_me, pytest, os
+
+import sys; sys.path.append(os.path.dirname(__file__))
+from test_parsing import get_demo_game
+
+DEMO_GAMES = 'normal_game.tch', 'one_round_grand_tichu.tch'
+
+@pytest.fixture(scope='session')
+def postgres_url():
+    url = os.environ.get('TICH_ME_TEST_POSTGRES_URL')
+    if url:
+        yield url
+        return
+
+    try:
+        import testing.postgresql
+        server = testing.postgresql.Postgresql()
+    except Exception:
+        pytest.skip("no PostgreSQL server available")
+
+    try:
+        yield server.url().replace('postgresql://', 'postgresql+psycopg://')
+    finally:
+        server.stop()
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def db_url(request, tmp_path):
+    if request.param == 'sqlite':
+        url = f'sqlite:///{tmp_path / "tichu.db"}'
+    else:
+        url = request.getfixturevalue('postgres_url')
+
+    tich_me.drop_db(url)
+    yield url
+    tich_me.drop_db(url)
+
+def parse_demo_game(name, url=None):
+    game = tich_me.parse_game(get_demo_game(name))
+    game['url'] = url or name
+    return game
+
+
+def test_get_db_url(monkeypatch, tmp_path):
+    monkeypatch.setattr(tich_me.app, 'DB_URL', None)
+    monkeypatch.setattr(tich_me.app, 'DB_PATH', tmp_path / 'tichu.db')
+
+    assert tich_me.get_db_url() == f'sqlite:///{tmp_path / "tichu.db"}'
+    assert tich_me.get_db_path() == tmp_path / 'tichu.db'
+
+    monkeypatch.setattr(tich_me.app, 'DB_URL', 'postgresql://host/tichu')
+
+    assert tich_me.get_db_url() == 'postgresql://host/tichu'
+    assert tich_me.get_db_path() is None
+    assert tich_me.get_db_path('sqlite://') is None
+
+def test_record_and_analyze(db_url):
+    session = tich_me.init_db(url=db_url)
+
+    # Record some games in bulk, and then one with the ORM, to make sure the
+    # ids assigned by `BulkInsert` don't collide with the ones the database
+    # assigns.
+    tich_me.record_games_bulk(session, [parse_demo_game(DEMO_GAMES[0])])
+    session.commit()
+
+    tich_me.record_game(session, parse_demo_game(DEMO_GAMES[1]))
+    session.commit()
+
+    tich_me.record_games_bulk(session, [parse_demo_game(DEMO_GAMES[0], 'x')])
+    session.commit()
+
+    assert session.query(tich_me.Game).count() == 3
+    assert {x.url for x in session.query(tich_me.Game)} == {*DEMO_GAMES, 'x'}
+
+    df = tich_me.count_exchanges(session)
+    assert df['count'].sum() == session.query(tich_me.Exchange).count()
+
+def test_concurrent_writers(db_url):
+    if db_url.startswith('sqlite'):
+        pytest.skip("SQLite only allows one writer at a time")
+
+    import random
+    from tich_me.synthetic import generate_game
+
+    # Two sessions collect and insert rows at the same time, as two ingest
+    # workers would.  The games have different players, otherwise the second
+    # session would wait for the first to commit its new players.
+    rng = random.Random(0)
+    sessions = [tich_me.init_db(url=db_url) for i in range(2)]
+
+    for i, session in enumerate(sessions):
+        names = [f'player{i}{j}' for j in range(4)]
+        game = tich_me.parse_game(generate_game(rng, names))
+        game['url'] = f'{i}.tch'
+        tich_me.record_games_bulk(session, [game])
+
+    for session in sessions:
+        session.commit()
+
+    assert sessions[0].query(tich_me.Game).count() == 2
+    assert sessions[0].query(tich_me.Player).count() == 8
+
+def test_concurrent_writers_same_players(db_url):
+    if db_url.startswith('sqlite'):
+        pytest.skip("SQLite only allows one writer at a time")
+
+    import random
+    from threading import Thread
+    from tich_me.synthetic import generate_game
+
+    # Both sessions add the same new players.  The second has to wait for the 
+    # first to commit, so it runs in another thread.
+    rng = random.Random(0)
+    names = [f'player{i}' for i in range(4)]
+    sessions = [tich_me.init_db(url=db_url) for i in range(2)]
+
+    errors = []
+
+    def record(session, i):
+        game = tich_me.parse_game(generate_game(rng, names))
+        game['url'] = f'{i}.tch'
+        tich_me.record_games_bulk(session, [game])
+
+    def record_and_commit(session, i):
+        try:
+            record(session, i)
+            session.commit()
+        except Exception as err:
+            errors.append(err)
+
+    record(sessions[0], 0)
+
+    thread = Thread(target=record_and_commit, args=(sessions[1], 1))
+    thread.start()
+    sessions[0].commit()
+    thread.join()
+
+    assert not errors
+
+    session = tich_me.init_db(url=db_url)
+    assert session.query(tich_me.Game).count() == 2
+    assert session.query(tich_me.Player).count() == 4
+    assert session.query(tich_me.PlayerStats).count() == 4
+    assert {x.num_games for x in session.query(tich_me.PlayerStats)} == {2}
+
+def test_drop_db(db_url):
+    session = tich_me.init_db(url=db_url)
+    tich_me.record_games_bulk(session, [parse_demo_game(DEMO_GAMES[0])])
+    session.commit()
+    session.close()
+
+    tich_me.drop_db(db_url)
+
+    session = tich_me.init_db(url=db_url)
+    assert session.query(tich_me.Game).count() == 0
+    session.close()
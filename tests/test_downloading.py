@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest, time
+
+import sys, os; sys.path.append(os.path.dirname(__file__))
+from test_parsing import DEMO_GAMES
+from test_model import db_session
+
+class StubBsw:
+    """
+    Serve the demo games from a local HTTP server, pretending to be
+    BrettSpielWelt.  The index for every month lists all the demo games.  The
+    *delay* attribute simulates the network latency of the real server, and
+    the *failures* attribute maps paths to the number of times they should
+    respond with "503 Service Unavailable" before succeeding.
+    """
+
+    def __init__(self, delay=0):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from threading import Thread
+
+        bsw = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                time.sleep(bsw.delay)
+                bsw.num_requests += 1
+
+                if bsw.failures.get(self.path):
+                    bsw.failures[self.path] -= 1
+                    self.send_error(503)
+                    return
+
+                try:
+                    body = bsw.get(self.path).encode('utf-8')
+                except FileNotFoundError:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+
+            def handle_error(self, request, client_address):
+                # Clients that time out close the connection before the 
+                # response is sent.  That's expected, so don't print a stack 
+                # trace about it.
+                pass
+
+        self.delay = delay
+        self.num_requests = 0
+        self.failures = {}
+        self.games = sorted(x.name for x in DEMO_GAMES.glob('*.tch'))
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def get(self, path):
+        month, name = path.strip('/').partition('/')[::2]
+
+        if not name:
+            return '\n'.join(
+                    f'<a href="/{month}/{x}">2018-07-04 12:{i:02} {x}</a><br>'
+                    for i, x in enumerate(self.games)
+            )
+
+        if name not in self.games:
+            raise FileNotFoundError(name)
+
+        return (DEMO_GAMES / name).read_text()
+
+    def game_urls(self, month='201807'):
+        return [f'{self.url}/{month}/{x}' for x in self.games]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class RecordProgress:
+
+    def __init__(self):
+        self.games = []
+        self.errors = {}
+        self.index_urls = []
+
+    def download_index(self, url):
+        self.index_url = url
+        self.index_urls.append(url)
+
+    def download_game(self, url, i, n):
+        self.games.append(url)
+
+    def error(self, url, err):
+        self.errors[url] = err
+
+    def finish(self, stats):
+        self.stats = stats
+
+@pytest.fixture
+def stub_bsw(monkeypatch, tmp_path):
+    bsw = StubBsw()
+    monkeypatch.setattr(tich_me.scrape, 'BSW_URL', bsw.url)
+    monkeypatch.setattr(tich_me.app, 'DB_PATH', tmp_path / 'tichu.db')
+    monkeypatch.setattr(tich_me.app, 'ARCHIVE_PATH', tmp_path / 'logs.db')
+    yield bsw
+    bsw.close()
+
+
+def test_fetch_bsw_games_in_order(stub_bsw):
+    urls = stub_bsw.game_urls() + [f'{stub_bsw.url}/201807/missing.tch']
+    http = tich_me.init_http(4)
+    downloads = list(tich_me.fetch_bsw_games(http, urls, num_workers=4))
+
+    assert [url for url, future in downloads] == urls
+
+    for url, future in downloads[:-1]:
+        name = url.split('/')[-1]
+        assert future.result() == (DEMO_GAMES / name).read_text()
+
+    with pytest.raises(tich_me.scrape.requests.HTTPError):
+        downloads[-1][1].result()
+
+def test_fetch_bsw_games_concurrently(stub_bsw):
+    stub_bsw.delay = 0.1
+    urls = stub_bsw.game_urls()
+
+    def time_fetch(num_workers):
+        http = tich_me.init_http(num_workers)
+        start = time.perf_counter()
+        for url, future in tich_me.fetch_bsw_games(http, urls, num_workers):
+            future.result()
+        return time.perf_counter() - start
+
+    t1 = time_fetch(1)
+    t8 = time_fetch(8)
+
+    assert t1 > len(urls) * stub_bsw.delay
+    assert t8 < t1 / 3
+
+def test_fetch_bsw_game_retry(stub_bsw):
+    url = stub_bsw.game_urls()[0]
+    path = url[len(stub_bsw.url):]
+
+    stub_bsw.failures[path] = 2
+    http = tich_me.init_http(backoff=0)
+
+    assert tich_me.fetch_bsw_game(http, url) == stub_bsw.get(path)
+    assert stub_bsw.num_requests == 3
+
+    stub_bsw.failures[path] = 2
+    http = tich_me.init_http(retries=1, backoff=0)
+
+    with pytest.raises(tich_me.scrape.requests.HTTPError):
+        tich_me.fetch_bsw_game(http, url)
+
+def test_fetch_bsw_game_timeout(stub_bsw):
+    stub_bsw.delay = 0.5
+    http = tich_me.init_http(timeout=0.1, retries=0)
+
+    with pytest.raises(tich_me.scrape.requests.RequestException):
+        tich_me.fetch_bsw_game(http, stub_bsw.game_urls()[0])
+
+def test_scrape_bsw_game(stub_bsw, db_session):
+    path = '/201807/normal_game.tch'
+    tich_me.scrape_bsw_game(db_session, stub_bsw.url + path)
+    db_session.commit()
+
+    expected = tich_me.parse_game(stub_bsw.get(path))
+    game = db_session.query(tich_me.Game).one()
+
+    assert game.url == stub_bsw.url + path
+    assert len(game.rounds) == len(expected['rounds'])
+
+    # The player statistics are counted while the game is being streamed, so 
+    # make sure they match the ones calculated from the recorded rounds.
+    def dump_stats():
+        return {
+                x.player_id: tuple(getattr(x, k) for k in tich_me.PLAYER_STATS)
+                for x in db_session.query(tich_me.PlayerStats)
+        }
+
+    streamed = dump_stats()
+    assert all(x[1] == len(expected['rounds']) for x in streamed.values())
+
+    tich_me.rebuild_player_stats(db_session)
+    assert dump_stats() == streamed
+
+def test_scrape_bsw_month(stub_bsw):
+    progress = RecordProgress()
+    tich_me.scrape_bsw_month(2018, 7, progress, num_workers=4)
+
+    assert progress.index_url == f'{stub_bsw.url}/201807/'
+    assert progress.games == stub_bsw.game_urls()
+
+    stats = progress.stats
+    assert stats.calls['download game'] == len(stub_bsw.games)
+    assert stats.counts['bytes fetched'] > 0
+    assert stats.counts['rows inserted'] > 0
+    assert 'Elapsed' in stats.summarize()
+
+    # Games where a player leaves and is replaced can't be parsed yet.
+    unparseable = [
+            f'{stub_bsw.url}/201807/300357.tch',
+            f'{stub_bsw.url}/201807/player_swap.tch',
+    ]
+    assert set(progress.errors) == set(unparseable)
+    assert stats.counts['errors'] == len(unparseable)
+    assert stats.counts['games recorded'] == \
+            len(stub_bsw.games) - len(unparseable)
+
+    session = tich_me.init_db()
+    assert session.query(tich_me.Game).count() == \
+            len(stub_bsw.games) - len(unparseable)
+
+    # Games that are already in the database or the archive aren't downloaded 
+    # again.
+    progress = RecordProgress()
+    stub_bsw.num_requests = 0
+    tich_me.scrape_bsw_month(2018, 7, progress, num_workers=4)
+
+    assert set(progress.games) == set(unparseable)
+    assert stub_bsw.num_requests == 1
+
+def test_scrape_bsw_months(stub_bsw):
+    stub_bsw.delay = 0.1
+    months = [(2018, 6), (2018, 7), (2018, 8)]
+
+    progress = RecordProgress()
+    start = time.perf_counter()
+    tich_me.scrape_bsw_months(months, progress, num_workers=8)
+    elapsed = time.perf_counter() - start
+
+    # The indices are downloaded concurrently, and progress is reported for 
+    # all the months together.
+    assert progress.index_urls == [
+            f'{stub_bsw.url}/{y}{m:02}/' for y, m in months
+    ]
+    assert progress.games == [
+            url for y, m in months for url in stub_bsw.game_urls(f'{y}{m:02}')
+    ]
+
+    # Downloading one at a time would take at least this long (recording the 
+    # games takes some time too, so don't expect a full 8x speedup).
+    assert elapsed < len(progress.games) * stub_bsw.delay
+
+    session = tich_me.init_db()
+    assert session.query(tich_me.Game).count() == \
+            len(months) * (len(stub_bsw.games) - 2)
+
+    with pytest.raises(tich_me.NoDataBefore2007):
+        tich_me.scrape_bsw_months([(2006, 12), (2007, 1)], progress)
+
+def test_scrape_bsw_month_savepoints(stub_bsw, monkeypatch):
+    # Make one game fail after its rows have already been inserted, to check 
+    # that only that game is rolled back.
+    bad_url = f'{stub_bsw.url}/201807/normal_game.tch'
+    record_games_bulk = tich_me.scrape.record_games_bulk
+
+    def record_games_bulk_or_fail(session, games):
+        record_games_bulk(session, games)
+        session.flush()
+        if games[0]['url'] == bad_url:
+            raise ValueError("fail after insert")
+
+    monkeypatch.setattr(
+            tich_me.scrape, 'record_games_bulk', record_games_bulk_or_fail)
+
+    progress = RecordProgress()
+    tich_me.scrape_bsw_month(
+            2018, 7, progress, commit_every=3, synchronous='off')
+
+    assert bad_url in progress.errors
+
+    session = tich_me.init_db()
+    games = session.query(tich_me.Game).all()
+    assert bad_url not in {x.url for x in games}
+    assert len(games) == len(stub_bsw.games) - len(progress.errors)
+    assert session.query(tich_me.Round).count() == \
+            sum(len(x.rounds) for x in games)
+
+    # The ingest settings are applied to the database and the archive.
+    import sqlite3
+    for path in [tich_me.app.DB_PATH, tich_me.app.ARCHIVE_PATH]:
+        db = sqlite3.connect(path)
+        assert db.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+        db.close()
+
+    with pytest.raises(ValueError):
+        tich_me.scrape_bsw_month(2018, 7, progress, synchronous='sometimes')
+
+def test_scrape_bsw_month_commit_every(stub_bsw, monkeypatch):
+    # Simulate a crash while committing the second batch of games, to check 
+    # that the games recorded since the first commit are rolled back.
+    commit_bsw_games = tich_me.scrape.commit_bsw_games
+    num_games = []
+
+    class Crash(BaseException):
+        pass
+
+    def commit_or_crash(session, logs):
+        num_games.append(session.query(tich_me.Game).count())
+        if len(num_games) > 1:
+            raise Crash
+        commit_bsw_games(session, logs)
+
+    monkeypatch.setattr(tich_me.scrape, 'commit_bsw_games', commit_or_crash)
+
+    with pytest.raises(Crash):
+        tich_me.scrape_bsw_month(
+                2018, 7, RecordProgress(), commit_every=3, synchronous='off')
+
+    assert 0 < num_games[0] < num_games[1]
+
+    session = tich_me.init_db()
+    assert session.query(tich_me.Game).count() == num_games[0]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest
+
+import sys, os; sys.path.append(os.path.dirname(__file__))
+from test_model import db_session
+from test_parsing import get_demo_game
+
+pytest.importorskip('pyarrow')
+
+@pytest.fixture
+def arrow_dir(db_session, tmp_path):
+    from datetime import datetime
+
+    demos = {
+            'normal_game.tch': datetime(2018, 6, 30, 23, 59),
+            'two_rounds_grand_tichus_diff_seats.tch': datetime(2018, 7, 1),
+            'one_round_tichu_before.tch': None,
+    }
+    for demo, date in demos.items():
+        game_dict = tich_me.parse_game(get_demo_game(demo))
+        game_dict['url'] = demo
+        game_dict['date'] = date
+        tich_me.record_game(db_session, game_dict)
+        db_session.commit()
+
+    tich_me.export_db(db_session, tmp_path / 'arrow')
+    return tmp_path / 'arrow'
+
+
+def test_export_db(db_session, arrow_dir):
+    assert {x.name for x in (arrow_dir / 'deals').iterdir()} == {
+            '2018-06.arrow',
+            '2018-07.arrow',
+            'undated.arrow',
+    }
+
+    deals = tich_me.load_arrow(arrow_dir, 'deals')
+    assert len(deals) == db_session.query(tich_me.Deal).count()
+    assert deals['card'].min() == 0
+    assert deals['card'].max() == 55
+
+    # Every card is dealt exactly once per round.
+    assert (deals.groupby('round_id')['card'].nunique() == 56).all()
+
+    games = tich_me.load_arrow(arrow_dir, 'games', months=[(2018, 7)])
+    assert list(games['url']) == ['two_rounds_grand_tichus_diff_seats.tch']
+
+    scores = tich_me.load_arrow(arrow_dir, 'scores')
+    assert set(scores['team']) == {0, 1}
+    assert len(scores) == 2 * db_session.query(tich_me.Round).count()
+
+    actions = tich_me.load_arrow(arrow_dir, 'actions')
+    assert len(actions) == db_session.query(tich_me.Action).count()
+    assert actions['cards'].dtype == 'uint64'
+
+def test_count_exchanges_arrow(db_session, arrow_dir):
+    import pandas as pd
+
+    expected = tich_me.count_exchanges(db_session)
+    actual = tich_me.count_exchanges_arrow(arrow_dir)
+
+    pd.testing.assert_frame_equal(actual, expected)
+
+def test_query_grand_tichus_arrow(db_session, arrow_dir):
+    df = tich_me.query_grand_tichus(db_session)
+    df_arrow = tich_me.query_grand_tichus_arrow(arrow_dir)
+
+    assert len(df) > 0
+    assert sorted(df.itertuples(index=False)) == \
+            sorted(df_arrow.itertuples(index=False))
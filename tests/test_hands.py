@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest
+import numpy as np
+
+import sys, os; sys.path.append(os.path.dirname(__file__))
+from test_model import db_session
+from test_recording import record_demo_game
+
+from tich_me import SuitTypes as S, SpecialTypes as X
+
+def make_hand(*cards):
+    return int(tich_me.CardMask.from_cards(cards))
+
+def test_hand_features():
+    hands = [
+            # Four-of-a-kind, pair, dragon.
+            make_hand(
+                *((s, 7, None) for s in S),
+                (S.red, 13, None), (S.blue, 13, None),
+                (None, None, X.dragon),
+            ),
+            # Straight flush from 2 to 6, and a straight from the one to 6.
+            make_hand(
+                *((S.green, r, None) for r in range(2, 7)),
+                (None, None, X.one), (None, None, X.phoenix),
+                (S.red, 5, None), (S.black, 10, None),
+            ),
+            # Two straight flushes, and no straight longer than 9.
+            make_hand(
+                *((S.red, r, None) for r in range(2, 7)),
+                *((S.black, r, None) for r in range(6, 11)),
+                (None, None, X.hound),
+            ),
+            make_hand(),
+    ]
+    df = tich_me.hand_features(np.array(hands, dtype=np.uint64))
+
+    assert list(df['num_cards']) == [7, 9, 11, 0]
+    assert list(df['num_7s']) == [4, 0, 1, 0]
+    assert list(df['num_kings']) == [2, 0, 0, 0]
+    assert list(df['dragon']) == [True, False, False, False]
+    assert list(df['one']) == [False, True, False, False]
+    assert list(df['hound']) == [False, False, True, False]
+    assert list(df['num_pairs']) == [2, 1, 1, 0]
+    assert list(df['num_triples']) == [1, 0, 0, 0]
+    assert list(df['num_four_of_a_kinds']) == [1, 0, 0, 0]
+    assert list(df['num_straight_flushes']) == [0, 1, 2, 0]
+    assert list(df['num_bombs']) == [1, 1, 2, 0]
+    assert list(df['longest_straight']) == [1, 6, 9, 0]
+    assert list(df['points']) == [45, -5, 15, 0]
+
+def test_hand_features_vs_card_mask(db_session):
+    record_demo_game(db_session, 'normal_game.tch')
+    hands = tich_me.load_hands(db_session)
+    df = tich_me.hand_features(hands['hand'])
+
+    assert len(df) == len(hands) > 0
+
+    for hand, (i, row) in zip(hands['hand'], df.iterrows()):
+        mask = tich_me.CardMask(int(hand))
+        assert row['num_cards'] == len(mask) == 14
+        assert (row['num_bombs'] > 0) == mask.has_bomb()
+        assert row['dragon'] == (
+                tich_me.special_mask(X.dragon) & mask != 0)
+
+    cards = tich_me.unpack_hands(hands['hand'])
+    assert cards.shape == (len(hands), 56)
+    assert list(tich_me.pack_hands(cards)) == list(hands['hand'])
+
+def test_hands_from_deals(db_session):
+    record_demo_game(db_session, 'normal_game.tch')
+    month, = tich_me.query_months(db_session)
+    frames = tich_me.query_month_frames(db_session, month)
+
+    seats = {x.id: x.seat.value for x in db_session.query(tich_me.Seat)}
+    expected = {
+            (row.round_id, seats[row.seat_id]): row.hand
+            for row in tich_me.load_hands(db_session, 'first_8')\
+                    .itertuples()
+    }
+    first_8 = tich_me.hands_from_deals(
+            frames['deals'], [tich_me.DealTypes.first_8])
+    actual = {
+            (row.round_id, row.seat): row.hand
+            for row in first_8.itertuples()
+    }
+    assert actual == expected
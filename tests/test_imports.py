@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest
+import ast, json, subprocess, sys
+from pathlib import Path
+
+HEAVY_MODULES = {
+        'sqlalchemy', 'numpy', 'pandas', 'matplotlib', 'pyarrow',
+        'requests', 'bs4', 'lxml',
+}
+
+def run_python(code):
+    p = subprocess.run(
+            [sys.executable, '-c', code],
+            capture_output=True, text=True, check=True,
+    )
+    return json.loads(p.stdout.splitlines()[-1])
+
+def test_exports_complete():
+    # Every public name defined at the top level of each submodule should be
+    # available lazily from the package.
+    package_dir = Path(tich_me.__file__).parent
+
+    for submodule in tich_me._submodules:
+        module = getattr(tich_me, submodule)
+        tree = ast.parse((package_dir / f'{submodule}.py').read_text())
+        defined = set()
+
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                defined.add(node.name)
+            if isinstance(node, ast.Assign):
+                defined |= {x.id for x in node.targets if isinstance(x, ast.Name)}
+
+        for name in defined:
+            if not name.startswith('_'):
+                assert getattr(tich_me, name) is getattr(module, name), name
+
+def test_lazy_getattr():
+    assert tich_me.init_db is tich_me.model.init_db
+    assert tich_me.count_exchanges is tich_me.analysis.count_exchanges
+    assert 'parse_game' in dir(tich_me)
+
+    with pytest.raises(AttributeError):
+        tich_me.not_a_real_name
+
+def test_import_package_is_light():
+    modules = run_python(
+            'import sys, json, tich_me; '
+            'tich_me.DB_PATH; '
+            'print(json.dumps(list(sys.modules)))'
+    )
+    assert not HEAVY_MODULES & {x.split('.')[0] for x in modules}
+
+def test_cli_help_is_fast():
+    # Time the import and the help message from inside the subprocess, so
+    # that the interpreter's own startup time isn't counted.
+    result = run_python('''if True:
+        import sys, json, time
+        start = time.perf_counter()
+        sys.argv = ['tich_me', '-h']
+        from tich_me.main import main
+        try:
+            main()
+        except SystemExit:
+            pass
+        elapsed = time.perf_counter() - start
+        print(json.dumps({
+            'elapsed': elapsed,
+            'modules': list(sys.modules),
+        }))
+    ''')
+    assert not HEAVY_MODULES & {x.split('.')[0] for x in result['modules']}
+    assert result['elapsed'] < 0.1
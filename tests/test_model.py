@@ -14,6 +14,10 @@ def db_session(tmp_path):
     Session = sessionmaker(bind=engine)
     return Session()
 
+@pytest.fixture
+def db_engine(db_session):
+    return db_session.get_bind()
+
 @pytest.fixture
 def now_is_20180704(monkeypatch):
     import datetime
@@ -50,3 +54,166 @@ def test_most_recent_month_not_downloaded(db_session, now_is_20180704):
     db_session.commit()
     assert tich_me.most_recent_month_not_downloaded(db_session) == (2018, 5)
 
+def test_query_missing_months(db_session, now_is_20180704):
+    from datetime import datetime
+
+    assert list(tich_me.iter_months((2017, 11), (2018, 2))) == [
+            (2017, 11), (2017, 12), (2018, 1), (2018, 2),
+    ]
+    assert list(tich_me.iter_months((2018, 6))) == [(2018, 6), (2018, 7)]
+    assert list(tich_me.iter_months((2018, 6), (2018, 5))) == []
+
+    db_session.add(tich_me.Game(date=datetime(2018, 5, 1)))
+    db_session.add(tich_me.Game())
+    db_session.commit()
+
+    assert tich_me.query_missing_months(db_session, (2018, 3)) == [
+            (2018, 3), (2018, 4), (2018, 6), (2018, 7),
+    ]
+    assert len(tich_me.query_missing_months(db_session)) == 11 * 12 + 7 - 1
+
+
+@pytest.fixture
+def count_queries(db_session):
+    from sqlalchemy import event
+
+    queries = []
+    engine = db_session.get_bind()
+    listener = lambda *args: queries.append(args[2])
+
+    event.listen(engine, 'before_cursor_execute', listener)
+    yield queries
+    event.remove(engine, 'before_cursor_execute', listener)
+
+def test_get_card_ids(db_session, count_queries):
+    card_ids = tich_me.get_card_ids(db_session)
+
+    assert len(card_ids) == 56
+    assert len(set(card_ids.values())) == 56
+    assert card_ids[None, None, tich_me.SpecialTypes.dragon]
+    assert card_ids[tich_me.SuitTypes.red, 14, None]
+
+    # The cards are cached after the first query.
+    count_queries.clear()
+    assert tich_me.get_card_ids(db_session) == card_ids
+    assert count_queries == []
+
+def test_player_cache(db_session, count_queries):
+    names = ['alice', 'bob']
+
+    bulk = tich_me.BulkInsert(db_session)
+    ids = tich_me.get_or_create_player_ids(db_session, names, bulk)
+    bulk.execute()
+    db_session.rollback()
+
+    # The players were rolled back, so the cache must forget them.
+    cache = tich_me.PlayerCache.from_session(db_session)
+    assert 'alice' not in cache
+    assert db_session.query(tich_me.Player).count() == 0
+
+    bulk = tich_me.BulkInsert(db_session)
+    ids = tich_me.get_or_create_player_ids(db_session, names, bulk)
+    bulk.execute()
+    db_session.commit()
+
+    assert 'alice' in cache
+    assert db_session.query(tich_me.Player).count() == 2
+
+    # Known players don't require any queries.
+    count_queries.clear()
+    bulk = tich_me.BulkInsert(db_session)
+    assert tich_me.get_or_create_player_ids(db_session, names, bulk) == ids
+    assert count_queries == []
+
+    # The cache is bounded.
+    cache.max_size = 1
+    db_session.commit()
+
+    assert len(cache) == 1
+    assert 'bob' in cache
+
+def test_migrate_schema(db_engine):
+    import sqlalchemy
+
+    # Make the database look like one created by an older version of tich_me: 
+    # with all the tables, but none of the indexes.
+    for table in tich_me.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(db_engine)
+
+    def get_index_names(table):
+        inspector = sqlalchemy.inspect(db_engine)
+        return {x['name'] for x in inspector.get_indexes(table)}
+
+    assert get_index_names('exchange') == set()
+
+    tich_me.init_schema(db_engine)
+
+    assert get_index_names('game') == {'uq_game_url', 'ix_game_date'}
+    assert get_index_names('exchange') == {'uq_exchange', 'ix_exchange_taker'}
+
+def test_unique_game_url(db_session):
+    from sqlalchemy.exc import IntegrityError
+
+    db_session.add(tich_me.Game(url='http://example.com/1.tch'))
+    db_session.add(tich_me.Game(url='http://example.com/1.tch'))
+
+    with pytest.raises(IntegrityError):
+        db_session.commit()
+
+def test_query_recorded_urls(db_session):
+    recorded = {f'http://example.com/{i}.tch' for i in range(0, 1200, 2)}
+    db_session.add_all([tich_me.Game(url=x) for x in recorded])
+    db_session.add(tich_me.Game())
+    db_session.commit()
+
+    urls = [f'http://example.com/{i}.tch' for i in range(1200)] + [None]
+    assert tich_me.query_recorded_urls(db_session, urls) == recorded
+    assert tich_me.query_recorded_urls(db_session, []) == set()
+
+def test_card_mask():
+    mask = tich_me.CardMask.from_cards([
+            (tich_me.SuitTypes.red, 2, None),
+            (None, None, tich_me.SpecialTypes.dragon),
+    ])
+
+    assert list(mask) == [0, 55]
+    assert len(mask) == 2
+    assert 55 in mask
+    assert 54 not in mask
+    assert mask.holds(tich_me.special_mask(tich_me.SpecialTypes.dragon))
+    assert not mask.has_bomb()
+
+    four_of_a_kind = tich_me.rank_mask(9)
+    assert len(four_of_a_kind) == 4
+    assert tich_me.CardMask(mask | four_of_a_kind).has_bomb()
+
+    straight_flush = tich_me.CardMask.from_cards(
+            (tich_me.SuitTypes.green, x, None) for x in range(10, 15))
+    assert straight_flush.has_bomb()
+
+    # A straight with mixed suits isn't a bomb.
+    from itertools import cycle
+    straight = tich_me.CardMask.from_cards(
+            (suit, x, None)
+            for suit, x in zip(cycle(tich_me.SuitTypes), range(10, 15)))
+    assert len(straight) == 5
+    assert not straight.has_bomb()
+
+def test_count_games_by_month(db_session):
+    from datetime import datetime
+
+    assert tich_me.count_games_by_month(db_session) == {}
+
+    db_session.add_all([
+            tich_me.Game(date=datetime(2018, 7, 4, 12, 30)),
+            tich_me.Game(date=datetime(2018, 7, 31, 23, 59)),
+            tich_me.Game(date=datetime(2017, 12, 1)),
+            tich_me.Game(),
+    ])
+    db_session.commit()
+
+    counts = tich_me.count_games_by_month(db_session)
+    assert counts == {(2017, 12): 1, (2018, 7): 2, None: 1}
+    assert list(counts) == [(2017, 12), (2018, 7), None]
+    assert tich_me.query_months(db_session) == [(2017, 12), (2018, 7), None]
@@ -66,6 +66,18 @@ def test_parse_round():
     assert round['wish'] == (0, '2')
     assert round['finishes'] == [2, 1, 3, 0]
 
+    A = tich_me.ActionTypes
+    assert round['actions'][:6] == [
+            (0, A.play, ('Ma',)),
+            (0, A.wish, ('2',)),
+            (1, A.pass_, ()),
+            (2, A.play, ('G2',)),
+            (3, A.play, ('GK',)),
+            (0, A.play, ('GA',)),
+    ]
+    assert (0, A.give_dragon, ()) in round['actions']
+    assert round['actions'][-1] == (3, A.play, ('S7', 'G7'))
+
 def test_parse_grand_tichu():
     tch = get_demo_game('one_round_grand_tichu.tch')
     game = tich_me.parse_game(tch)
@@ -105,6 +117,55 @@ def test_incomplete_game():
 
     assert len(game['rounds']) == 9
 
+def test_parse_game_stream():
+    tch = get_demo_game('normal_game.tch')
+    expected = tich_me.parse_game(tch)
+
+    # Keep track of how many lines have been read.
+    num_lines_read = 0
+
+    def iter_lines():
+        nonlocal num_lines_read
+        with open(DEMO_GAMES / 'normal_game.tch') as f:
+            for line in f:
+                num_lines_read += 1
+                yield line
+
+    game = tich_me.parse_game_stream(iter_lines())
+
+    assert game['players'] == expected['players']
+    assert num_lines_read == 5
+
+    # Rounds are parsed as the lines are read.
+    round = next(game['rounds'])
+    assert round == expected['rounds'][0]
+    assert num_lines_read < len(tch.split('\n')) / 2
+
+    assert [round, *game['rounds']] == expected['rounds']
+
+@pytest.mark.parametrize('num_workers', [1, 3])
+def test_parse_bsw_games(num_workers):
+    demos = [
+            'normal_game.tch',
+            'player_swap.tch',
+            'one_round_no_tichu.tch',
+            'one_round_grand_tichu.tch',
+    ]
+    logs = [(x, None, get_demo_game(x)) for x in demos]
+    parsed = list(tich_me.parse_bsw_games(logs, num_workers, chunk_size=1))
+
+    assert [x[0] for x in parsed] == demos
+
+    for url, game, err in parsed:
+        if url == 'player_swap.tch':
+            assert game is None
+            assert isinstance(err, Exception)
+        else:
+            assert game['url'] == url
+            assert game['rounds'] == \
+                    tich_me.parse_game(get_demo_game(url))['rounds']
+            assert err is None
+
 @pytest.mark.skip
 def test_player_swap():
     # Can't handle this one yet, and don't care enough to fix it...
@@ -3,7 +3,7 @@
 import tich_me, pytest
 
 import sys, os; sys.path.append(os.path.dirname(__file__))
-from test_model import db_session
+from test_model import db_engine, db_session
 from test_parsing import get_demo_game
 
 # These tests are pretty lame.  Hopefully I'll write more as I have trouble 
@@ -37,3 +37,203 @@ def test_query_one_round(db_session):
     assert db_session.query(tich_me.Game).count() == 1
     assert db_session.query(tich_me.Round).count() == 1
 
+
+def dump_tables(session):
+    # Rows that nothing refers to are compared without their primary keys, 
+    # since the order in which the ORM inserts them is arbitrary.
+    from collections import Counter
+
+    leaves = {
+            'deal', 'hand', 'exchange', 'call', 'wish', 'finish', 'score',
+            'action',
+    }
+    tables = {}
+
+    for table in tich_me.Base.metadata.sorted_tables:
+        columns = [
+                x for x in table.c
+                if not (table.name in leaves and x.name == 'id')
+        ]
+        rows = session.query(*columns)
+        tables[table.name] = Counter(tuple(x) for x in rows)
+
+    return tables
+
+@pytest.mark.parametrize('demos', [
+    ['one_round_no_tichu.tch'],
+    ['normal_game.tch', 'two_rounds_grand_tichus_diff_seats.tch'],
+    ['one_round_tichu_before.tch', 'one_round_tichu_before.tch'],
+])
+def test_record_games_bulk(db_engine, db_session, demos):
+    def parse_demo_games():
+        for i, demo in enumerate(demos):
+            game_dict = tich_me.parse_game(get_demo_game(demo))
+            game_dict['url'] = demo
+            yield game_dict
+
+    for game_dict in parse_demo_games():
+        tich_me.record_game(db_session, game_dict)
+        db_session.commit()
+
+    orm = dump_tables(db_session)
+
+    # Record the same games in bulk, starting from an empty database.
+    db_session.close()
+    tich_me.Base.metadata.drop_all(db_engine)
+    tich_me.init_schema(db_engine)
+
+    tich_me.record_games_bulk(db_session, parse_demo_games())
+    db_session.commit()
+
+    assert dump_tables(db_session) == orm
+    assert db_session.query(tich_me.Deal).count() > 0
+
+    # Recording the same games again doesn't do anything.
+    tich_me.record_games_bulk(db_session, parse_demo_games())
+    db_session.commit()
+
+    assert dump_tables(db_session) == orm
+
+def test_record_hands(db_session):
+    record_demo_game(db_session, 'one_round_no_tichu.tch')
+
+    hands = {
+            x.seat.player.name: x
+            for x in db_session.query(tich_me.Hand)
+    }
+    assert len(hands) == 4
+
+    # Check the hands against the deal table.
+    for hand in hands.values():
+        deals = db_session.query(tich_me.Deal).filter_by(
+                round_id=hand.round_id,
+                seat_id=hand.seat_id,
+        )
+        first_8 = {
+                tich_me.CARD_INDICES[x.card.suit, x.card.rank, x.card.special]
+                for x in deals
+                if x.group == tich_me.DealTypes.first_8
+        }
+        full = {
+                tich_me.CARD_INDICES[x.card.suit, x.card.rank, x.card.special]
+                for x in deals
+        }
+        assert set(tich_me.CardMask(hand.first_8)) == first_8
+        assert set(tich_me.CardMask(hand.full)) == full
+        assert len(first_8) == 8
+        assert len(full) == 14
+
+    # Query hands with bitwise operations.
+    dragon = tich_me.special_mask(tich_me.SpecialTypes.dragon)
+    q = db_session.query(tich_me.Hand)\
+            .filter(tich_me.sql_holds(tich_me.Hand.first_8, dragon))
+    assert q.one() is hands['Sayxas']
+
+    # Nobody was dealt a bomb in this round.
+    q = db_session.query(tich_me.Hand)\
+            .filter(tich_me.sql_has_bomb(tich_me.Hand.full))
+    assert q.count() == 0
+
+def test_player_stats(db_engine, db_session):
+    from tich_me.synthetic import generate_logs
+
+    def parse_logs(logs, prefix):
+        for i, log in enumerate(logs):
+            game_dict = tich_me.parse_game(log)
+            game_dict['url'] = f'{prefix}{i}'
+            yield game_dict
+
+    def dump_stats():
+        return {
+                x.player_id: tuple(getattr(x, k) for k in tich_me.PLAYER_STATS)
+                for x in db_session.query(tich_me.PlayerStats)
+        }
+
+    # Record some games with each code path.  Use a small pool of players, so 
+    # that most of them play games recorded both ways.
+    logs = list(generate_logs(20, num_players=8))
+
+    for game_dict in parse_logs(logs[:10], 'orm'):
+        tich_me.record_game(db_session, game_dict)
+        db_session.commit()
+
+    tich_me.record_games_bulk(db_session, parse_logs(logs[10:], 'bulk'))
+    db_session.commit()
+
+    # Recording the same games again doesn't count them twice.
+    tich_me.record_games_bulk(db_session, parse_logs(logs[10:], 'bulk'))
+    db_session.commit()
+
+    incremental = dump_stats()
+    assert len(incremental) == 8
+    assert sum(x[0] for x in incremental.values()) == 4 * 20
+
+    tich_me.rebuild_player_stats(db_session)
+    db_session.commit()
+
+    assert dump_stats() == incremental
+
+    # The statistics are calculated for databases created before the 
+    # statistics table existed.
+    db_session.close()
+    tich_me.PlayerStats.__table__.drop(db_engine)
+    tich_me.init_schema(db_engine)
+
+    assert dump_stats() == incremental
+
+    # Look up one player's statistics.
+    stats = tich_me.query_player_stats(db_session, 'player0')
+    player = db_session.query(tich_me.Player).filter_by(name='player0').one()
+    num_rounds = db_session.query(tich_me.Round)\
+            .join(tich_me.Seat, tich_me.Seat.game_id == tich_me.Round.game_id)\
+            .filter(tich_me.Seat.player_id == player.id)\
+            .count()
+
+    assert stats['num_rounds'] == num_rounds
+    assert 1 <= stats['mean_finish'] <= 4
+
+    with pytest.raises(KeyError):
+        tich_me.query_player_stats(db_session, 'not a player')
+
+def test_player_stats_double_victory(db_session):
+    # In the second round, Sayxas and lionheart99917 go out first and second, 
+    # so the order of the other two players isn't known.
+    record_demo_game(db_session, '2241381.tch')
+
+    loser = tich_me.query_player_stats(db_session, 'Us_D_Marshal_r_G')
+    winner = tich_me.query_player_stats(db_session, 'Sayxas')
+
+    assert loser['num_rounds'] == winner['num_rounds'] == 8
+    assert loser['num_finishes'] == 7
+    assert loser['total_finish_order'] == 9
+    assert winner['num_finishes'] == 8
+
+    tich_me.rebuild_player_stats(db_session)
+    rebuilt = tich_me.query_player_stats(db_session, 'Us_D_Marshal_r_G')
+
+    for k in tich_me.PLAYER_STATS:
+        assert rebuilt[k] == loser[k]
+
+def test_rebuild_hands(db_engine, db_session):
+    for name in ['normal_game.tch', 'one_round_grand_tichu.tch']:
+        game_dict = tich_me.parse_game(get_demo_game(name))
+        game_dict['url'] = name
+        tich_me.record_game(db_session, game_dict)
+    db_session.commit()
+
+    def dump_hands():
+        return {
+                (x.round_id, x.seat_id): (x.first_8, x.full)
+                for x in db_session.query(tich_me.Hand)
+        }
+
+    expected = dump_hands()
+    assert expected
+
+    # Databases created before the hand table existed get it filled in from 
+    # the deal table.
+    db_session.close()
+    tich_me.Hand.__table__.drop(db_engine)
+    tich_me.init_schema(db_engine)
+
+    assert dump_hands() == expected
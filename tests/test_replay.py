@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest
+
+import sys, os; sys.path.append(os.path.dirname(__file__))
+from test_model import db_session
+from test_parsing import get_demo_game
+
+from tich_me import ComboTypes as C
+
+@pytest.mark.parametrize('codes, combo', [
+    ('Dr', C.single),
+    ('R5 G5', C.pair),
+    ('R5 Ph', C.pair),
+    ('Ma Ph', None),
+    ('Hu Ph', None),
+    ('R5 G5 B5', C.triple),
+    ('R5 G5 Ph', C.triple),
+    ('R5 G5 B5 S5', C.four_of_a_kind),
+    ('R5 G5 B5 Ph', None),
+    ('R5 G5 R6 G6', C.steps),
+    ('R5 G5 R6 Ph', C.steps),
+    ('R5 G5 R7 G7', None),
+    ('R5 G5 B5 R6 G6', C.full_house),
+    ('R5 G5 Ph R6 G6', C.full_house),
+    ('R5 G5 B5 R6 Ph', C.full_house),
+    ('Ma G2 R3 B4 S5', C.straight),
+    ('Ma G2 R3 Ph S5', C.straight),
+    ('R10 GB RD BK Ph', C.straight),
+    ('R10 RB RD RK RA', C.straight_flush),
+    ('R10 RB RD RK Ph', C.straight),
+    ('R10 RB RD RK GK', None),
+])
+def test_classify_combo(codes, combo):
+    cards = tich_me.CardMask.from_indices(
+            tich_me.card_indices[x] for x in codes.split())
+    assert tich_me.classify_combo(cards) == combo
+
+@pytest.mark.parametrize('demo', [
+    'normal_game.tch',
+    'one_round_tichu_after.tch',
+    'two_rounds_grand_tichus_diff_seats.tch',
+])
+def test_replay_round(db_session, demo):
+    game_dict = tich_me.parse_game(get_demo_game(demo))
+    tich_me.record_game(db_session, game_dict)
+    db_session.commit()
+
+    rounds = list(tich_me.iter_rounds(db_session))
+    assert len(rounds) == len(game_dict['rounds'])
+
+    for (round_id, hands, actions, calls), round_dict in \
+            zip(rounds, game_dict['rounds']):
+
+        assert sum(len(tich_me.CardMask(x)) for x in hands) == 56
+
+        for action, state in tich_me.replay_round(hands, actions):
+            pass
+
+        assert state.finishes[:2] == round_dict['finishes'][:2]
+        assert tich_me.score_round(state, calls) == round_dict['scores']
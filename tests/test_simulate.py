@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest
+import numpy as np
+
+import sys, os; sys.path.append(os.path.dirname(__file__))
+from test_model import db_session
+from test_export import arrow_dir
+from test_hands import make_hand
+
+from tich_me import SuitTypes as S, SpecialTypes as X
+from tich_me.simulate import simulate_exchanges
+
+def test_simulate_exchanges():
+    df = simulate_exchanges(200000, seed=1)
+
+    assert df.equals(simulate_exchanges(200000, seed=1))
+    assert list(df.columns) == ['giver', 'rank', 'count', 'prob']
+    assert set(df['giver']) == set(tich_me.simulate.GIVERS)
+
+    # Every rank has four cards, except the special cards, which have one.
+    for row in df.itertuples():
+        expected = (1 if row.rank in (1, 15, 16, 17) else 4) / 56
+        assert row.prob == pytest.approx(expected, abs=0.002)
+
+    for giver, group in df.groupby('giver'):
+        assert group['count'].sum() == 200000
+
+def test_simulate_exchanges_taker_hands():
+    # A hand with the dragon, the phoenix, and three aces.
+    hand = make_hand(
+            (None, None, X.dragon),
+            (None, None, X.phoenix),
+            *((suit, 14, None) for suit in list(S)[:3]),
+            *((S.black, rank, None) for rank in range(2, 11)),
+    )
+    df = simulate_exchanges(100000, [hand]).set_index(['giver', 'rank'])
+
+    for giver in tich_me.simulate.GIVERS:
+        assert df.loc[(giver, 17), 'prob'] == 0
+        assert df.loc[(giver, 16), 'prob'] == 0
+        assert df.loc[(giver, 14), 'prob'] == pytest.approx(1/42, abs=0.002)
+        assert df.loc[(giver, 15), 'prob'] == pytest.approx(1/42, abs=0.002)
+
+def test_load_taker_hands(db_session, arrow_dir):
+    df = tich_me.load_taker_hands(db_session)
+    df_arrow = tich_me.load_taker_hands_arrow(arrow_dir)
+
+    assert sorted(zip(df['call'], df['hand'])) == \
+            sorted(zip(df_arrow['call'], df_arrow['hand']))
+    assert set(df['call']) == {'no_call', 'tichu_before', 'grand_tichu'}
+
+    baseline = tich_me.simulate_exchanges_by_call(df, 10000)
+    assert set(baseline['call']) == set(df['call'])
+    assert baseline.groupby(['call', 'giver'])['prob'].sum().tolist() == \
+            pytest.approx([1] * 9)
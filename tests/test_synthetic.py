@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import tich_me, pytest
+from tich_me.synthetic import generate_logs
+
+import sys, os; sys.path.append(os.path.dirname(__file__))
+from test_model import db_session
+
+def test_generate_logs():
+    logs = list(generate_logs(20, seed=1))
+    assert logs == list(generate_logs(20, seed=1))
+    assert logs != list(generate_logs(20, seed=2))
+
+    A = tich_me.ActionTypes
+    seen = set()
+
+    for log in logs:
+        game = tich_me.parse_game(log)
+        assert len(game['players']) == 4
+
+        for round in game['rounds']:
+            dealt = [tich_me.get_hand_masks(round, i)[1] for i in range(4)]
+            exchanges = [
+                    (i, j, tich_me.card_indices[x])
+                    for (i, j), x in round['exchanges'].items()
+            ]
+            hands = tich_me.get_hands_after_exchange(dealt, exchanges)
+            actions = tich_me.get_actions(round)
+
+            for action, state in tich_me.replay_round(
+                    hands, [x[:3] for x in actions]):
+                pass
+
+            # Every play is a legal combination, and the scores add up.
+            assert all(x[3] for x in actions if x[1] == A.play)
+            assert tich_me.score_round(state, round['calls']) == \
+                    round['scores']
+
+            seen |= {x[1] for x in actions}
+            seen |= set(round['calls'].values())
+
+    assert seen == set(A) | set(tich_me.CallTypes)
+
+def test_record_generated_logs(db_session):
+    games = []
+    for i, log in enumerate(generate_logs(5)):
+        game = tich_me.parse_game(log)
+        game['url'] = f'{i}.tch'
+        games.append(game)
+
+    tich_me.record_games_bulk(db_session, games)
+    db_session.commit()
+
+    assert db_session.query(tich_me.Game).count() == 5
+    assert db_session.query(tich_me.Round).count() == \
+            sum(len(x['rounds']) for x in games)
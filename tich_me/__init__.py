@@ -3,10 +3,41 @@
 __author__ = "Kale Kundert"
 __version__ = "0.1.3"
 
-from .app import *
-from .model import *
-from .scrape import *
-from .analysis import *
+# The submodules depend on some slow-to-import packages (e.g. SQLAlchemy, 
+# pandas, matplotlib), so they aren't imported until one of the names they 
+# define is actually used.  Names are looked up in the submodules in the order 
+# below, so the package behaves as if each one had been star-imported.
 
+_submodules = [
+        'app', 'model', 'scrape', 'analysis', 'stats', 'archive', 'export',
+        'hands', 'replay', 'simulate',
+]
 
+def __getattr__(name):
+    from importlib import import_module
 
+    if name in _submodules or name in ('main', 'synthetic'):
+        return import_module(f'.{name}', __name__)
+
+    if not name.startswith('_'):
+        for submodule in _submodules:
+            module = import_module(f'.{submodule}', __name__)
+            try:
+                value = getattr(module, name)
+            except AttributeError:
+                continue
+
+            globals()[name] = value
+            return value
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    from importlib import import_module
+
+    names = {*globals(), *_submodules}
+    for submodule in _submodules:
+        module = import_module(f'.{submodule}', __name__)
+        names |= {x for x in vars(module) if not x.startswith('_')}
+
+    return sorted(names)
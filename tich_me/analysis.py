@@ -2,21 +2,74 @@
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from . import model
+from .stats import STATS
 
 phi = 1.61803398875 
 
 def plot_exchanges(session):
     df = count_exchanges(session)
+    plot_exchange_counts(df)
 
-    plot_exchanges_by_giver(df)
-    plot_aggregated_exchanges(df)
+def plot_exchange_counts(df):
+    import matplotlib.pyplot as plt
+
+    for plot in EXCHANGE_FIGURES.values():
+        plot(df)
 
     plt.show()
 
+def save_exchange_figures(df, out_dir, format='svg', num_workers=1):
+    """
+    Save each of the figures in `EXCHANGE_FIGURES` to the given directory, see 
+    `save_figures()`.
+    """
+    return save_figures(EXCHANGE_FIGURES, df, out_dir, format, num_workers)
+
+def save_figures(figures, df, out_dir, format='svg', num_workers=1):
+    """
+    Draw each of the given figures (a dictionary mapping names to functions 
+    that take *df* and return a figure) and save it to the given directory, 
+    using a non-interactive backend (so no display is needed).  With more than 
+    one worker, the figures are rendered in parallel processes.  Return the 
+    paths of the files that were written.
+    """
+    from pathlib import Path
+    from concurrent.futures import ProcessPoolExecutor
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [
+            (plot, df, out_dir / f'{name}.{format}')
+            for name, plot in figures.items()
+    ]
+
+    if num_workers == 1:
+        return [render_figure(*job) for job in jobs]
+
+    with ProcessPoolExecutor(num_workers) as executor:
+        futures = [executor.submit(render_figure, *job) for job in jobs]
+        return [x.result() for x in futures]
+
+def render_figure(plot, df, path):
+    """
+    Draw the figure made by ``plot(df)`` and save it to the given path.  The 
+    format is inferred from the file extension.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig = plot(df)
+    fig.savefig(path)
+    plt.close(fig)
+
+    return path
+
 def plot_exchanges_by_giver(df):
+    import matplotlib.pyplot as plt
+
     givers = 'left', 'partner', 'right'
     fig, ax = plt.subplots(1, len(givers), figsize=(8, 8/phi))
 
@@ -25,8 +78,11 @@ def plot_exchanges_by_giver(df):
         plot_exchange_probs(ax[i], df[df.giver == giver])
 
     fig.tight_layout()
+    return fig
 
 def plot_aggregated_exchanges(df):
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(3, 8/phi))
 
     def agg_prob(x):
@@ -41,6 +97,7 @@ def plot_aggregated_exchanges(df):
     plot_exchange_probs(ax, df)
 
     fig.tight_layout()
+    return fig
 
 def plot_exchange_probs(ax, df, min_counts=20):
     """
@@ -83,48 +140,548 @@ def plot_bars(ax, xs, ys, **kwargs):
         ax.plot([x, x], [0, y], **kwargs)
 
 def count_exchanges(session):
-    from collections import Counter
-
-    counts = Counter()
-    queries = query_exchanges_by_call(session)
-    givers = {
-            (model.SeatTypes.south, model.SeatTypes.west): 'right',
-            (model.SeatTypes.east, model.SeatTypes.south): 'right',
-            (model.SeatTypes.north, model.SeatTypes.east): 'right',
-            (model.SeatTypes.west, model.SeatTypes.north): 'right',
-
-            (model.SeatTypes.south, model.SeatTypes.north): 'partner',
-            (model.SeatTypes.east, model.SeatTypes.west): 'partner',
-            (model.SeatTypes.north, model.SeatTypes.south): 'partner',
-            (model.SeatTypes.west, model.SeatTypes.east): 'partner',
-
-            (model.SeatTypes.south, model.SeatTypes.east): 'left',
-            (model.SeatTypes.east, model.SeatTypes.north): 'left',
-            (model.SeatTypes.north, model.SeatTypes.west): 'left',
-            (model.SeatTypes.west, model.SeatTypes.south): 'left',
+    """
+    Count how many times each rank was passed, see `query_exchange_counts()`.
+
+    The counts are read from the `model.ExchangeCount` summary table, which is 
+    brought up to date first.  Only months with new games are recounted, so 
+    this is fast even for large databases.
+    """
+    from sqlalchemy import func
+    from .model import ExchangeCount
+
+    with STATS.timer('refresh summaries'):
+        refresh_exchange_counts(session)
+
+    groups = ExchangeCount.call, ExchangeCount.giver, ExchangeCount.rank
+    q = session.query(*groups, func.sum(ExchangeCount.count))\
+            .group_by(*groups)\
+            .order_by(*groups)
+
+    with STATS.timer('count exchanges'):
+        df = pd.DataFrame(q.all(), columns=['call', 'giver', 'rank', 'count'])
+
+    n = df.groupby(['call', 'giver'])['count'].transform('sum')
+    df['prob'] = df['count'] / n
+
+    return df
+
+def bootstrap_exchange_probs(df, num_samples=10000, confidence=0.95,
+        pseudo_count=0.5, seed=0):
+    """
+    Add "prob_lo" and "prob_hi" columns to the given data frame (from 
+    `count_exchanges()`), giving a bootstrap confidence interval for each 
+    passing probability.
+
+    Resampling the exchanges with replacement is the same as drawing the 
+    counts for each call and giver from a multinomial distribution, so the 
+    resamples can be drawn without looking at the individual exchanges.  Ranks 
+    that were never passed are added with a count of zero, so each call and 
+    giver has a row for every rank.
+
+    The resamples are drawn as if every rank had been passed *pseudo_count* 
+    more times.  Otherwise, a rank that was never passed could never be 
+    resampled, and its interval would be [0, 0] no matter how few exchanges 
+    there were.
+    """
+    rng = np.random.default_rng(seed)
+    df = complete_exchange_counts(df)
+    alpha = (1 - confidence) / 2
+    groups = []
+
+    for key, group in df.groupby(['call', 'giver'], sort=False):
+        counts = group['count'].to_numpy()
+        n = counts.sum()
+        p = (counts + pseudo_count) / (n + pseudo_count * len(counts))
+        probs = rng.multinomial(n, p, size=num_samples) / n
+        lo, hi = np.quantile(probs, [alpha, 1 - alpha], axis=0)
+        groups.append(group.assign(prob_lo=lo, prob_hi=hi))
+
+    return pd.concat(groups, ignore_index=True)
+
+def complete_exchange_counts(df):
+    """
+    Add rows with a count of zero for every rank that was never passed by a 
+    particular giver to players making a particular call.
+    """
+    keys = df[['call', 'giver']].drop_duplicates()
+    ranks = pd.DataFrame({'rank': np.arange(1, NUM_RANKS + 1)})
+
+    df = keys.merge(ranks, how='cross')\
+            .merge(df, how='left', on=['call', 'giver', 'rank'])
+    df['count'] = df['count'].fillna(0).astype(int)
+
+    n = df.groupby(['call', 'giver'])['count'].transform('sum')
+    df['prob'] = df['count'] / n
+
+    return df
+
+def compare_exchange_probs(df, baseline):
+    """
+    Merge the given passing probabilities (with confidence intervals, see 
+    `bootstrap_exchange_probs()`) with the probabilities expected by chance 
+    (see `simulate.simulate_exchanges_by_call()`).
+
+    The result has a "baseline" column with the probabilities expected by 
+    chance, and a "significant" column that's true if the baseline is outside 
+    the confidence interval.
+    """
+    baseline = baseline[['call', 'giver', 'rank', 'prob']]\
+            .rename(columns={'prob': 'baseline'})
+
+    df = df.merge(baseline, how='left', on=['call', 'giver', 'rank'])
+    df['significant'] = \
+            (df['baseline'] < df['prob_lo']) | (df['baseline'] > df['prob_hi'])
+
+    return df
+
+def query_exchange_counts(session):
+    """
+    Count how many times each rank was passed, grouped by the call made by 
+    the player receiving the card and by the player giving it (relative to the 
+    receiver).
+
+    All of the counting happens in the database, so no `Exchange` objects are 
+    ever loaded.
+    """
+    from sqlalchemy import and_, case, func
+    from sqlalchemy.orm import aliased
+    from .model import Exchange, Call, Card, Seat, CallTypes
+
+    giver_seat = aliased(Seat)
+    taker_seat = aliased(Seat)
+
+    # Enum columns are stored as the names of the enum members, so those names 
+    # are what the CASE expressions below need to match.
+    #
+    # Rounds where the receiver called Tichu after the pass are lumped in with 
+    # the rounds where they didn't call anything.
+    call = case(
+            {
+                CallTypes.grand_tichu.name: 'grand_tichu',
+                CallTypes.tichu_before.name: 'tichu_before',
+            },
+            value=Call.call,
+            else_='no_call',
+    )
+
+    # Seats are numbered in the order of play, so the difference between the 
+    # giver and the taker is 1 for the player on the taker's right, 2 for 
+    # their partner, and 3 for the player on their left.
+    seat_names = {k.name: v for k, v in seat_index.items()}
+    giver_index = case(seat_names, value=giver_seat.seat)
+    taker_index = case(seat_names, value=taker_seat.seat)
+    giver = case(
+            {1: 'right', 2: 'partner', 3: 'left'},
+            value=(giver_index - taker_index + 4) % 4,
+    )
+
+    special_ranks = {k.name: v for k, v in special_rank.items()}
+    rank = case(special_ranks, value=Card.special, else_=Card.rank)
+
+    return session.query(
+                call.label('call'),
+                giver.label('giver'),
+                rank.label('rank'),
+                func.count().label('count'),
+            )\
+            .select_from(Exchange)\
+            .join(giver_seat, Exchange.giver_id == giver_seat.id)\
+            .join(taker_seat, Exchange.taker_id == taker_seat.id)\
+            .join(Card, Exchange.card_id == Card.id)\
+            .outerjoin(Call, and_(
+                Exchange.round_id == Call.round_id,
+                Exchange.taker_id == Call.seat_id,
+            ))\
+            .group_by(call, giver, rank)\
+            .order_by(call, giver, rank)
+
+def refresh_exchange_counts(session):
+    """
+    Recount the exchanges for every month that has gained games since the 
+    `model.ExchangeCount` table was last refreshed, and commit the result.
+    """
+    from .model import ExchangeCount, SummaryMonth, filter_summary_month
+
+    summarized = {
+            (None if x.year is None else (x.year, x.month)): x
+            for x in session.query(SummaryMonth)
     }
 
-    for call in queries:
-        for exchange in queries[call].all():
-            giver = givers[exchange.giver.seat, exchange.taker.seat]
-            rank = get_rank(exchange.card)
-            counts[call, giver, rank] += 1
-
-    df = pd.DataFrame([
-            dict(
-                call=call,
-                giver=giver,
-                rank=rank,
-                count=count,
-            )
-            for (call, giver, rank), count in counts.items()
-    ])
+    for month, num_games in model.count_games_by_month(session).items():
+        summary = summarized.get(month)
+        if summary and summary.num_games == num_games:
+            continue
+
+        filter_summary_month(session.query(ExchangeCount), ExchangeCount, month)\
+                .delete(synchronize_session=False)
+
+        year, month_of_year = month or (None, None)
+        session.add_all(
+                ExchangeCount(
+                    year=year,
+                    month=month_of_year,
+                    call=call,
+                    giver=giver,
+                    rank=rank,
+                    count=count,
+                )
+                for call, giver, rank, count in 
+                    query_month_exchange_counts(session, month)
+        )
+
+        if not summary:
+            summary = SummaryMonth(year=year, month=month_of_year)
+            session.add(summary)
+        summary.num_games = num_games
+
+    session.commit()
+
+def query_month_exchange_counts(session, month):
+    """
+    Like `query_exchange_counts()`, but only count the exchanges from games 
+    played in the given ``(year, month)``, see `model.filter_month()`.
+    """
+    from .model import Exchange, Round, Game
+
+    q = query_exchange_counts(session)\
+            .join(Round, Exchange.round_id == Round.id)\
+            .join(Game, Round.game_id == Game.id)
+
+    return model.filter_month(q, month)
+
+def load_cached_frame(cache_path, source_paths, calculate):
+    """
+    Return the data frame made by ``calculate()``, reusing the one saved at 
+    *cache_path* if none of the given source files (e.g. the database) have 
+    been modified since it was saved.
+
+    This means that figures can be redrawn (e.g. after changing their style) 
+    without querying the database again.  SQLite write-ahead logs (e.g. 
+    ``tichu.db-wal``) count as part of the files they belong to.
+    """
+    import pickle
+    from pathlib import Path
+
+    def get_key():
+        key = []
+        for path in map(Path, source_paths):
+            # In WAL mode, SQLite commits to a separate "-wal" file, and only 
+            # copies the changes into the database file itself later on.
+            if path.is_dir():
+                files = sorted(path.rglob('*'))
+            else:
+                files = [path, path.with_name(path.name + '-wal')]
+
+            key += [
+                    (str(x), x.stat().st_mtime_ns, x.stat().st_size)
+                    for x in files if x.exists()
+            ]
+        return key
+
+    cache_path = Path(cache_path)
+
+    if cache_path.exists():
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache['key'] == get_key():
+            return cache['df']
+
+    df = calculate()
+
+    # Get the key after calculating the data frame, because calculating it 
+    # can update the database (e.g. `refresh_exchange_counts()`).
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, 'wb') as f:
+        pickle.dump({'key': get_key(), 'df': df}, f)
+
+    return df
+
+def count_exchanges_arrow(data_dir):
+    """
+    Calculate the same data frame as `count_exchanges()`, but from the files 
+    written by `export.export_db()` rather than from the database.
+    """
+    exchanges = load_arrow(data_dir, 'exchanges')
+    calls = load_arrow(data_dir, 'calls')
+
+    df = exchanges.merge(
+            calls[['round_id', 'seat', 'call']],
+            how='left',
+            left_on=['round_id', 'taker'],
+            right_on=['round_id', 'seat'],
+    )
+
+    # Seat values are in the order of play, see `query_exchange_counts()`.
+    df = pd.DataFrame({
+        'call': df['call'].map({
+            model.CallTypes.grand_tichu.value: 'grand_tichu',
+            model.CallTypes.tichu_before.value: 'tichu_before',
+        }).fillna('no_call'),
+        'giver': ((df['giver'] - df['taker']) % 4).map({
+            1: 'right',
+            2: 'partner',
+            3: 'left',
+        }),
+        'rank': card_ranks[df['card'].to_numpy()],
+    })
+
+    df = df.groupby(['call', 'giver', 'rank']).size().reset_index(name='count')
 
     n = df.groupby(['call', 'giver'])['count'].transform('sum')
     df['prob'] = df['count'] / n
 
     return df
 
+def load_arrow(data_dir, table, months=None):
+    """
+    Load one of the tables written by `export.export_db()` into a data frame.
+
+    The files are memory-mapped, so only the columns that are actually used 
+    are read from disk.  By default every month is loaded; *months* can be a 
+    list of ``(year, month)`` tuples to load only some of them.
+    """
+    import pyarrow as pa
+    from pathlib import Path
+    from .export import get_month_name
+
+    table_dir = Path(data_dir) / table
+
+    if months is None:
+        paths = sorted(table_dir.glob('*.arrow'))
+    else:
+        paths = [table_dir / f'{get_month_name(x)}.arrow' for x in months]
+
+    if not paths:
+        raise FileNotFoundError(f"no exported data in '{table_dir}'")
+
+    tables = [
+            pa.ipc.open_file(pa.memory_map(str(x))).read_all()
+            for x in paths
+    ]
+    return pa.concat_tables(tables).to_pandas()
+
+def query_grand_tichus(session):
+    """
+    Return a data frame with a row for every Grand Tichu call in the database, 
+    and the following columns:
+
+    round_id:
+        The round the call was made in.
+
+    first_8:
+        The first 8 cards dealt to the caller, as a `model.CardMask` integer.
+
+    success:
+        Whether the caller went out first.
+
+    Everything is loaded in a single query, using the `model.Hand` table.
+    """
+    from sqlalchemy import and_
+    from .model import Hand, Call, Finish, CallTypes
+
+    q = session.query(Hand.round_id, Hand.first_8, Finish.order)\
+            .select_from(Call)\
+            .join(Hand, and_(
+                Call.round_id == Hand.round_id,
+                Call.seat_id == Hand.seat_id,
+            ))\
+            .outerjoin(Finish, and_(
+                Call.round_id == Finish.round_id,
+                Call.seat_id == Finish.seat_id,
+            ))\
+            .filter(Call.call == CallTypes.grand_tichu)
+
+    df = pd.DataFrame(q.all(), columns=['round_id', 'first_8', 'order'])
+
+    # Finishes are numbered from 0.
+    return pd.DataFrame({
+        'round_id': df['round_id'].astype('int64'),
+        'first_8': df['first_8'].astype('uint64'),
+        'success': df['order'] == 0,
+    })
+
+def query_grand_tichus_arrow(data_dir):
+    """
+    Return the same data frame as `query_grand_tichus()`, but from the files 
+    written by `export.export_db()` rather than from the database.
+    """
+    from .hands import hands_from_deals
+
+    calls = load_arrow(data_dir, 'calls')
+    calls = calls[calls['call'] == model.CallTypes.grand_tichu.value]
+    finishes = load_arrow(data_dir, 'finishes')
+    hands = hands_from_deals(
+            load_arrow(data_dir, 'deals'),
+            groups=[model.DealTypes.first_8],
+    )
+
+    df = calls[['round_id', 'seat']]\
+            .merge(hands, on=['round_id', 'seat'])\
+            .merge(
+                    finishes[['round_id', 'seat', 'order']],
+                    how='left',
+                    on=['round_id', 'seat'],
+            )
+
+    return pd.DataFrame({
+        'round_id': df['round_id'].astype('int64'),
+        'first_8': df['hand'].astype('uint64'),
+        'success': df['order'] == 0,
+    })
+
+def grand_tichu_features(df):
+    """
+    Add the features of each hand (see `hands.hand_features()`) to the given 
+    data frame of Grand Tichu calls (see `query_grand_tichus()`).
+
+    This is the table worth caching: every further summary or model of Grand 
+    Tichu success only needs these columns.
+    """
+    from .hands import hand_features
+
+    features = hand_features(df['first_8'].to_numpy())
+    return pd.concat([df.reset_index(drop=True), features], axis=1)
+
+def summarize_grand_tichus(df, features=None):
+    """
+    Calculate the success rate of Grand Tichu calls for each value of each of 
+    the given features (by default, `GRAND_TICHU_FEATURES`).
+
+    Return a data frame with "feature", "value", "calls", "successes", "rate", 
+    "rate_lo", and "rate_hi" columns.  The last two give a 95% Wilson score 
+    interval for the success rate.
+    """
+    summaries = []
+
+    for feature in features or GRAND_TICHU_FEATURES:
+        summary = df.groupby(feature)['success']\
+                .agg(calls='size', successes='sum')\
+                .reset_index()\
+                .rename(columns={feature: 'value'})
+        summary.insert(0, 'feature', feature)
+        summaries.append(summary)
+
+    df = pd.concat(summaries, ignore_index=True)
+    df['value'] = df['value'].astype(int)
+    df['successes'] = df['successes'].astype(int)
+    df['rate'] = df['successes'] / df['calls']
+    df['rate_lo'], df['rate_hi'] = wilson_interval(df['successes'], df['calls'])
+
+    return df
+
+def wilson_interval(k, n, z=1.96):
+    """
+    Return the Wilson score interval for the probability of success, given *k* 
+    successes in *n* trials.  This is better behaved than the usual normal 
+    approximation when *n* is small or *k* is near 0 or *n*.
+    """
+    k = np.asarray(k, dtype=float)
+    n = np.asarray(n, dtype=float)
+    p = k / n
+
+    center = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half_width = z / (1 + z**2 / n) * np.sqrt(
+            p * (1 - p) / n + z**2 / (4 * n**2))
+
+    # The interval always contains *p*, but when *k* is 0 or *n*, rounding 
+    # error can put *p* just outside of it.
+    lo = np.clip(np.minimum(center - half_width, p), 0, 1)
+    hi = np.clip(np.maximum(center + half_width, p), 0, 1)
+
+    return lo, hi
+
+def plot_grand_tichu_success(df):
+    """
+    Plot the success rate of Grand Tichu calls as a function of each feature, 
+    given the data frame from `summarize_grand_tichus()`.
+    """
+    import matplotlib.pyplot as plt
+
+    features = list(dict.fromkeys(df['feature']))
+    num_cols = 4
+    num_rows = -(-len(features) // num_cols)
+
+    fig, axes = plt.subplots(
+            num_rows, num_cols,
+            figsize=(8, 2 * num_rows),
+            sharey=True,
+            squeeze=False,
+    )
+
+    for ax, feature in zip(axes.flat, features):
+        summary = df[df['feature'] == feature]
+        ax.errorbar(
+                summary['value'],
+                summary['rate'],
+                yerr=[
+                    summary['rate'] - summary['rate_lo'],
+                    summary['rate_hi'] - summary['rate'],
+                ],
+                marker='o',
+                markersize=3,
+                linestyle='none',
+                color='tab:blue',
+        )
+        ax.set_xlabel(feature.replace('_', ' '))
+        ax.set_ylim(0, 1)
+
+    for ax in axes.flat[len(features):]:
+        ax.set_visible(False)
+
+    for ax in axes[:, 0]:
+        ax.set_ylabel('success rate')
+
+    fig.tight_layout()
+    return fig
+
+def query_player_stats(session, name):
+    """
+    Return a dictionary of statistics for the player with the given name.
+
+    The statistics come from the `model.PlayerStats` table, so this only takes 
+    one indexed query no matter how many games are in the database.  The 
+    dictionary contains every `model.PLAYER_STATS` total, plus the following 
+    averages (which are NaN if there's nothing to average):
+
+    tichu_success_rate, grand_tichu_success_rate:
+        The fraction of calls where the player went out first.
+
+    mean_finish:
+        The player's average finishing position, from 1 (first) to 4.  Rounds 
+        where the other team went out first and second aren't counted, because 
+        the order of the two losers isn't known.
+
+    mean_score_diff:
+        The average number of points by which the player's team outscored the 
+        other team, per round.
+
+    Raise `KeyError` if the player isn't in the database.
+    """
+    from .model import Player, PlayerStats, PLAYER_STATS
+
+    row = session.query(PlayerStats)\
+            .join(Player, PlayerStats.player_id == Player.id)\
+            .filter(Player.name == name)\
+            .one_or_none()
+
+    if row is None:
+        raise KeyError(name)
+
+    stats = {k: getattr(row, k) for k in PLAYER_STATS}
+
+    def mean(total, n):
+        return stats[total] / stats[n] if stats[n] else np.nan
+
+    stats['tichu_success_rate'] = \
+            mean('num_tichu_successes', 'num_tichus')
+    stats['grand_tichu_success_rate'] = \
+            mean('num_grand_tichu_successes', 'num_grand_tichus')
+    stats['mean_finish'] = mean('total_finish_order', 'num_finishes') + 1
+    stats['mean_score_diff'] = mean('total_score_diff', 'num_rounds')
+
+    return stats
+
 def query_exchanges_by_call(session):
     from sqlalchemy import and_, or_
     from .model import Exchange, Call, CallTypes
@@ -166,6 +723,21 @@ def label_card_axis(ax):
     ax.set_xticks(ticks)
     ax.set_xticklabels(tick_labels, rotation='vertical')
 
+EXCHANGE_FIGURES = {
+        'passing_probs_by_giver': plot_exchanges_by_giver,
+        'passing_probs': plot_aggregated_exchanges,
+}
+GRAND_TICHU_FIGURES = {
+        'grand_tichu_success': plot_grand_tichu_success,
+}
+
+# The features of the first 8 cards that are most likely to matter for a 
+# Grand Tichu; see `hands.hand_features()` for the full list.
+GRAND_TICHU_FEATURES = [
+        'num_aces', 'num_kings', 'dragon', 'phoenix', 'one', 'hound',
+        'num_bombs', 'num_pairs', 'longest_straight',
+]
+
 def get_rank(card):
     if card.special:
         return special_rank[card.special]
@@ -180,6 +752,12 @@ special_rank = {
         model.SpecialTypes.phoenix: 16,
         model.SpecialTypes.dragon: 17,
 }
+seat_index = {
+        model.SeatTypes.south: 0,
+        model.SeatTypes.east: 1,
+        model.SeatTypes.north: 2,
+        model.SeatTypes.west: 3,
+}
 special_names = {
         model.SpecialTypes.one: 'One',
         model.SpecialTypes.hound: 'Dog',
@@ -187,3 +765,8 @@ special_names = {
         model.SpecialTypes.dragon: 'Dragon',
 }
 
+# The rank of each card, indexed in the same order as `model.CARDS`.
+card_ranks = np.array([
+        special_rank[special] if special else rank
+        for suit, rank, special in model.CARDS
+])
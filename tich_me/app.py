@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 
+import os
 from appdirs import AppDirs
 from pathlib import Path
 
 APP = AppDirs('tich_me')
 DB_PATH = Path(APP.user_data_dir) / 'tichu.db'
+ARCHIVE_PATH = Path(APP.user_data_dir) / 'logs.db'
+ARROW_DIR = Path(APP.user_data_dir) / 'arrow'
+CACHE_DIR = Path(APP.user_cache_dir)
 
-
+# The database can be anything SQLAlchemy can connect to, e.g. a PostgreSQL 
+# server shared by several people.  If no URL is given, a local SQLite 
+# database is kept at DB_PATH.
+DB_URL = os.environ.get('TICH_ME_DB_URL')
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+A local archive of the raw game logs downloaded from BSW.
+
+Keeping the logs means that the game database can always be rebuilt (e.g. to
+take advantage of improvements to the parser) without downloading anything
+again.  The archive is kept in its own SQLite database, separate from the game
+database, so that the latter can be wiped freely.  Each log is stored once,
+keyed by the SHA-256 hash of its text, and compressed with zlib.  A separate
+table records the URL (and date) each log was downloaded from.
+"""
+
+import zlib, hashlib
+
+from sqlalchemy import Column, ForeignKey, String, DateTime, LargeBinary
+from sqlalchemy.ext.declarative import declarative_base
+
+ArchiveBase = declarative_base()
+
+class Log(ArchiveBase):
+    __tablename__ = 'log'
+
+    digest = Column(String, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+    def __repr__(self):
+        return f'<Log digest={self.digest[:8]}>'
+
+class LogSource(ArchiveBase):
+    __tablename__ = 'log_source'
+
+    url = Column(String, primary_key=True)
+    date = Column(DateTime, nullable=True, index=True)
+    digest = Column(String, ForeignKey('log.digest'), nullable=False)
+
+    def __repr__(self):
+        return f'<LogSource url={self.url} digest={self.digest[:8]}>'
+
+def init_archive(pragmas=None):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from .app import ARCHIVE_PATH
+    from .model import set_sqlite_pragmas, set_sqlite_transactions
+
+    ARCHIVE_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    engine = create_engine(f'sqlite:///{ARCHIVE_PATH}')
+    set_sqlite_transactions(engine)
+    if pragmas:
+        set_sqlite_pragmas(engine, pragmas)
+    init_archive_schema(engine)
+
+    Session = sessionmaker(bind=engine)
+    return Session()
+
+def init_archive_schema(engine):
+    ArchiveBase.metadata.create_all(engine)
+
+def archive_log(logs, log_txt, url=None, date=None):
+    """
+    Add the given log to the archive, unless an identical log is already
+    there.  Return the digest that identifies the log.
+    """
+    data = log_txt.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+
+    if not logs.query(Log).filter_by(digest=digest).count():
+        log = Log(
+                digest=digest,
+                data=zlib.compress(data, 9),
+        )
+        logs.add(log)
+
+    if url is not None:
+        source = LogSource(url=url, date=date, digest=digest)
+        logs.merge(source)
+
+    return digest
+
+def is_log_archived(logs, url):
+    return logs.query(LogSource).filter_by(url=url).count() > 0
+
+def query_archived_urls(logs, urls):
+    """
+    Return the subset of the given URLs that are in the archive.
+    """
+    urls = list(urls)
+    archived = set()
+
+    # Keep the number of parameters per query below SQLite's limit.
+    for i in range(0, len(urls), 500):
+        q = logs.query(LogSource.url).filter(LogSource.url.in_(urls[i:i+500]))
+        archived.update(x for x, in q)
+
+    return archived
+
+def load_archived_log(logs, url):
+    return logs.query(Log)\
+            .join(LogSource, Log.digest == LogSource.digest)\
+            .filter(LogSource.url == url)\
+            .one().text
+
+def count_archived_logs(logs):
+    return logs.query(LogSource).count()
+
+def iter_archived_logs(logs):
+    """
+    Yield ``(url, date, text)`` for every game in the archive, in
+    chronological order.  Logs are loaded in batches, so the whole archive is
+    never in memory at once.
+    """
+    q = logs.query(LogSource, Log)\
+            .join(Log, Log.digest == LogSource.digest)\
+            .order_by(LogSource.date, LogSource.url)\
+            .yield_per(1000)
+
+    for source, log in q:
+        yield source.url, source.date, log.text
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+"""
+Export the game database to columnar Arrow IPC files, for fast analysis.
+
+Each table is denormalised (i.e. every row has its game and round id, so no
+joins are needed to group by them) and split into one file per month::
+
+    <dir>/<table>/<yyyy-mm>.arrow
+
+Games without dates go in ``undated.arrow``.  Cards are encoded by their index
+in `model.CARDS` (0-55) and enums (seats, calls, etc.) by their values, so
+almost every column is a small integer.  Arrow IPC files can be memory-mapped,
+so loading them (see `analysis.load_arrow()`) is nearly free.
+
+This module requires ``pyarrow``, which is an optional dependency.
+"""
+
+import pandas as pd
+from pathlib import Path
+from . import model
+
+def export_db(session, out_dir, progress_ui=None):
+    months = model.query_months(session)
+
+    for i, month in enumerate(months):
+        if progress_ui:
+            progress_ui.export_month(get_month_name(month), i, len(months))
+
+        export_month(session, out_dir, month)
+
+def export_month(session, out_dir, month):
+    frames = query_month_frames(session, month)
+    month_name = get_month_name(month)
+
+    for table, df in frames.items():
+        path = Path(out_dir) / table / f'{month_name}.arrow'
+        write_arrow(df, path)
+
+def query_month_frames(session, month):
+    from .model import Game, Round, Seat, Player, \
+            Deal, Exchange, Call, Wish, Finish, Score, Action
+    from sqlalchemy.orm import aliased
+
+    giver_seat = aliased(Seat)
+    taker_seat = aliased(Seat)
+    cards = {v: k for k, v in get_card_indices(session).items()}
+    frames = {}
+
+    def in_month(q):
+        return model.filter_month(q, month)
+
+    def in_rounds(q, table):
+        return in_month(q
+                .join(Round, table.round_id == Round.id)
+                .join(Game, Round.game_id == Game.id))
+
+    q = in_month(session.query(Game.id, Game.url, Game.date))
+    frames['games'] = make_frame(q, {
+        'game_id': 'int64',
+        'url': 'object',
+        'date': 'datetime64[ns]',
+    })
+
+    q = in_month(session.query(Seat.game_id, Seat.seat, Player.name)
+            .join(Player, Seat.player_id == Player.id)
+            .join(Game, Seat.game_id == Game.id))
+    frames['seats'] = make_frame(q, {
+        'game_id': 'int64',
+        'seat': 'int8',
+        'player': 'object',
+    })
+
+    q = in_rounds(session.query(
+            Round.game_id,
+            Deal.round_id,
+            Round.order,
+            Seat.seat,
+            Deal.card_id,
+            Deal.group,
+        ).join(Seat, Deal.seat_id == Seat.id), Deal)
+    frames['deals'] = make_frame(q, {
+        'game_id': 'int64',
+        'round_id': 'int64',
+        'round': 'int16',
+        'seat': 'int8',
+        'card': 'int8',
+        'group': 'int8',
+    }, cards)
+
+    q = in_rounds(session.query(
+            Round.game_id,
+            Exchange.round_id,
+            Round.order,
+            giver_seat.seat,
+            taker_seat.seat,
+            Exchange.card_id,
+        )
+        .join(giver_seat, Exchange.giver_id == giver_seat.id)
+        .join(taker_seat, Exchange.taker_id == taker_seat.id), Exchange)
+    frames['exchanges'] = make_frame(q, {
+        'game_id': 'int64',
+        'round_id': 'int64',
+        'round': 'int16',
+        'giver': 'int8',
+        'taker': 'int8',
+        'card': 'int8',
+    }, cards)
+
+    q = in_rounds(session.query(
+            Round.game_id,
+            Call.round_id,
+            Round.order,
+            Seat.seat,
+            Call.call,
+        ).join(Seat, Call.seat_id == Seat.id), Call)
+    frames['calls'] = make_frame(q, {
+        'game_id': 'int64',
+        'round_id': 'int64',
+        'round': 'int16',
+        'seat': 'int8',
+        'call': 'int8',
+    })
+
+    q = in_rounds(session.query(
+            Round.game_id,
+            Wish.round_id,
+            Round.order,
+            Seat.seat,
+            Wish.rank,
+        ).join(Seat, Wish.seat_id == Seat.id), Wish)
+    frames['wishes'] = make_frame(q, {
+        'game_id': 'int64',
+        'round_id': 'int64',
+        'round': 'int16',
+        'seat': 'int8',
+        'rank': 'Int8',
+    })
+
+    q = in_rounds(session.query(
+            Round.game_id,
+            Finish.round_id,
+            Round.order,
+            Seat.seat,
+            Finish.order,
+        ).join(Seat, Finish.seat_id == Seat.id), Finish)
+    frames['finishes'] = make_frame(q, {
+        'game_id': 'int64',
+        'round_id': 'int64',
+        'round': 'int16',
+        'seat': 'int8',
+        'order': 'int8',
+    })
+
+    # Cards are kept as `model.CardMask` integers, since one action can 
+    # involve many cards.
+    q = in_rounds(session.query(
+            Round.game_id,
+            Action.round_id,
+            Round.order,
+            Action.order,
+            Seat.seat,
+            Action.action,
+            Action.cards,
+            Action.combo,
+        ).join(Seat, Action.seat_id == Seat.id), Action)
+    frames['actions'] = make_frame(q, {
+        'game_id': 'int64',
+        'round_id': 'int64',
+        'round': 'int16',
+        'order': 'int16',
+        'seat': 'int8',
+        'action': 'int8',
+        'cards': 'uint64',
+        'combo': 'Int8',
+    })
+
+    # Teams are numbered 0 and 1 within each game, in the order they were
+    # created.  Team 0 is always south/north, and team 1 is east/west.
+    q = in_rounds(session.query(
+            Round.game_id,
+            Score.round_id,
+            Round.order,
+            Score.team_id,
+            Score.score,
+        ), Score)
+    scores = make_frame(q, {
+        'game_id': 'int64',
+        'round_id': 'int64',
+        'round': 'int16',
+        'team': 'int64',
+        'score': 'int16',
+    })
+    scores['team'] = scores.groupby('game_id')['team']\
+            .rank(method='dense').sub(1).astype('int8')
+    frames['scores'] = scores
+
+    return frames
+
+def make_frame(q, dtypes, cards=None):
+    """
+    Make a data frame from the given query, converting enums to their values
+    and card ids to card indices.
+    """
+    df = pd.DataFrame(q.all(), columns=list(dtypes))
+
+    for column, dtype in dtypes.items():
+        if column == 'card':
+            df[column] = df[column].map(cards)
+        elif dtype.lower().startswith('int'):
+            df[column] = df[column].map(
+                    lambda x: getattr(x, 'value', x))
+
+        df[column] = df[column].astype(dtype)
+
+    return df
+
+def write_arrow(df, path):
+    import pyarrow as pa
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Write to a temporary file first, so an interrupted export never leaves
+    # a truncated file behind.
+    tmp_path = path.with_suffix('.tmp')
+
+    with pa.OSFile(str(tmp_path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    tmp_path.replace(path)
+
+def get_card_indices(session):
+    """
+    Return a dictionary mapping card indices (i.e. positions in
+    `model.CARDS`) to card ids.
+    """
+    card_ids = model.get_card_ids(session)
+    return {i: card_ids[k] for i, k in enumerate(model.CARDS)}
+
+def get_month_name(month):
+    return 'undated' if month is None else '{}-{:02}'.format(*month)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Compute features of many hands at once (e.g. the number of bombs or the
+longest straight), using vectorized NumPy operations.
+
+Hands are represented as arrays of `model.CardMask` integers (dtype uint64),
+which can be loaded from the database with `load_hands()` or built from the
+exported deal table with `hands_from_deals()`.  `unpack_hands()` expands these
+into an ``(N, 56)`` boolean array, with columns in the order of `model.CARDS`,
+and `hand_features()` computes a data frame of features from that.
+"""
+
+import numpy as np
+import pandas as pd
+from . import model
+
+NUM_CARDS = len(model.CARDS)
+NUM_SUITS = len(model.SuitTypes)
+NUM_SUITED_RANKS = 13
+
+def load_hands(session, column='full'):
+    """
+    Load every hand in the database.
+
+    Return a data frame with "round_id", "seat_id", and "hand" columns, where
+    "hand" holds the masks from the given column of the `model.Hand` table
+    (either "full" or "first_8").
+    """
+    q = session.query(
+            model.Hand.round_id,
+            model.Hand.seat_id,
+            getattr(model.Hand, column),
+    )
+    df = pd.DataFrame(q.all(), columns=['round_id', 'seat_id', 'hand'])
+    df['hand'] = df['hand'].astype('uint64')
+    return df
+
+def hands_from_deals(deals, groups=None):
+    """
+    Combine the rows of the deal table exported by `export.export_db()` into
+    one mask per player per round.
+
+    Return a data frame with "round_id", "seat", and "hand" columns.  If
+    *groups* is given, only include the cards dealt in those groups (e.g.
+    ``[model.DealTypes.first_8]``).
+    """
+    if groups is not None:
+        deals = deals[deals['group'].isin([x.value for x in groups])]
+
+    bits = np.left_shift(np.uint64(1), deals['card'].to_numpy(np.uint64))
+    df = pd.DataFrame({
+        'round_id': deals['round_id'].to_numpy(),
+        'seat': deals['seat'].to_numpy(),
+        'hand': bits,
+    })
+
+    # Each card appears once per hand, so adding the bits is the same as
+    # or-ing them, and pandas can do the former much faster.
+    return df.groupby(['round_id', 'seat'], sort=False)['hand']\
+            .sum().astype('uint64').reset_index()
+
+def unpack_hands(hands):
+    """
+    Convert an array of N hand masks into an ``(N, 56)`` boolean array.
+    """
+    hands = np.asarray(hands, dtype=np.uint64)
+    bits = np.arange(NUM_CARDS, dtype=np.uint64)
+    return (hands[:, np.newaxis] >> bits) & np.uint64(1) == 1
+
+def pack_hands(cards):
+    """
+    Convert an ``(N, 56)`` boolean array into an array of N hand masks.
+    """
+    bits = np.left_shift(np.uint64(1), np.arange(NUM_CARDS, dtype=np.uint64))
+    return (cards.astype(np.uint64) * bits).sum(axis=1, dtype=np.uint64)
+
+def hand_features(hands):
+    """
+    Calculate features for each of the given hands.
+
+    *hands* can either be an array of masks or an ``(N, 56)`` boolean array.
+    Return a data frame with one row per hand and the following columns:
+
+    num_cards, num_2s ... num_aces:
+        The number of cards in the hand, and of each rank.
+
+    one, hound, phoenix, dragon:
+        Whether the hand has each of the special cards.
+
+    num_pairs, num_triples, num_four_of_a_kinds:
+        The number of ranks with at least 2, 3, or 4 cards.
+
+    num_straight_flushes:
+        The number of suits with at least 5 consecutive cards.
+
+    num_bombs:
+        The number of four-of-a-kinds plus the number of straight flushes.
+
+    longest_straight:
+        The length of the longest run of consecutive ranks, counting the one as
+        rank 1 but not counting the phoenix.
+
+    points:
+        The number of points in the hand (5s, 10s, kings, dragon, phoenix).
+    """
+    hands = np.asarray(hands)
+    cards = hands if hands.ndim == 2 else unpack_hands(hands)
+
+    suited = cards[:, :NUM_SUITS * NUM_SUITED_RANKS]\
+            .reshape(-1, NUM_SUITS, NUM_SUITED_RANKS)
+    specials = cards[:, NUM_SUITS * NUM_SUITED_RANKS:]
+    rank_counts = suited.sum(axis=1)
+
+    features = {'num_cards': cards.sum(axis=1)}
+
+    for i, rank in enumerate(range(2, 15)):
+        features[f'num_{rank_names[rank]}'] = rank_counts[:, i]
+
+    for i, special in enumerate(model.SpecialTypes):
+        features[special.name] = specials[:, i]
+
+    num_four_of_a_kinds = (rank_counts == 4).sum(axis=1)
+    num_straight_flushes = sum(
+            longest_run(suited[:, i]) >= 5
+            for i in range(NUM_SUITS)
+    )
+
+    features['num_pairs'] = (rank_counts >= 2).sum(axis=1)
+    features['num_triples'] = (rank_counts >= 3).sum(axis=1)
+    features['num_four_of_a_kinds'] = num_four_of_a_kinds
+    features['num_straight_flushes'] = num_straight_flushes
+    features['num_bombs'] = num_four_of_a_kinds + num_straight_flushes
+
+    # The one is the first special card, and it can start a straight.
+    features['longest_straight'] = longest_run(
+            np.hstack([specials[:, :1], rank_counts > 0]))
+
+    features['points'] = \
+            5 * rank_counts[:, 5 - 2] \
+            + 10 * rank_counts[:, 10 - 2] \
+            + 10 * rank_counts[:, 13 - 2] \
+            + 25 * features['dragon'] \
+            - 25 * features['phoenix']
+
+    return pd.DataFrame(features)
+
+def longest_run(x):
+    """
+    Return the length of the longest run of true values in each row of the
+    given 2D boolean array.
+    """
+    run = np.zeros(len(x), dtype=int)
+    longest = np.zeros(len(x), dtype=int)
+
+    for column in x.T:
+        run = (run + 1) * column
+        np.maximum(longest, run, out=longest)
+
+    return longest
+
+rank_names = {
+        2: '2s',
+        3: '3s',
+        4: '4s',
+        5: '5s',
+        6: '6s',
+        7: '7s',
+        8: '8s',
+        9: '9s',
+        10: '10s',
+        11: 'jacks',
+        12: 'queens',
+        13: 'kings',
+        14: 'aces',
+}
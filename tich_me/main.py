@@ -5,89 +5,457 @@ def main():
 Improve your Tichu strategy by analyzing trends from thousands of games.
 
 Usage:
-    tich_me download [<year> <month>]
-    tich_me analyze passing
+    tich_me download [<year> <month>] [options]
+    tich_me download (--from <month> [--to <month>] | --all-missing) [options]
+    tich_me reparse [-j <n>] [-s <level>]
+    tich_me export [<dir>]
+    tich_me analyze passing [-a <dir>] [-o <dir>] [-f <format>] [-j <n>]
+    tich_me analyze passing-ci [-a <dir>] [-n <deals>] [-b <samples>] [-c <csv>]
+    tich_me analyze grand-tichu [-a <dir>] [-o <dir>] [-f <format>]
+    tich_me analyze player <name>
     tich_me wipe
 
+Options:
+    --db <url>
+        The database to use with any of the above commands, e.g. 
+        `postgresql+psycopg://user@host/tichu`.  This can also be set with the 
+        $TICH_ME_DB_URL environment variable.  By default, a local SQLite 
+        database is used.
+
+    --profile <path>
+        Run any of the above commands under cProfile, and save the profile to 
+        the given path.  It can be viewed with `python -m pstats <path>`.
+
 Database:
     {DB_PATH}
     """
+    import sys
+    from . import app
+
+    # Handle these options here, so every command doesn't have to.
+    app.DB_URL = pop_option(sys.argv, '--db') or app.DB_URL
+    profile_path = pop_option(sys.argv, '--profile')
+
     try:
-        import sys
-        if sys.argv[1] in globals():
-                return globals()[sys.argv[1]]()
+        if profile_path:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(dispatch)
+            finally:
+                profiler.dump_stats(profile_path)
+                print(f"Profile saved to: {profile_path}")
         else:
-            get_docopt_args(main)
+            return dispatch()
 
     except KeyboardInterrupt:
         print()
 
+def dispatch():
+    import sys
+
+    commands = {
+            'download': download,
+            'reparse': reparse,
+            'export': export,
+            'analyze': analyze,
+            'wipe': wipe,
+    }
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if command in commands:
+        return commands[command]()
+    else:
+        get_docopt_args(main)
+
 def download():
     """\
-Download complete logs for any games that occurred in the specified month, 
-and extract the information into a local SQLite database.
+Download complete logs for any games that occurred in the specified month(s), 
+and extract the information into a local SQLite database.  The raw logs are 
+also kept in a local archive, so they never need to be downloaded again.
 
 Usage:
-    tich_me download [<year> <month>]
+    tich_me download [<year> <month>] [options]
+    tich_me download (--from <month> [--to <month>] | --all-missing) [options]
+
+Options:
+    -j --jobs <n>   [default: 8]
+        The number of games to download at once.  Downloading is limited by 
+        network latency rather than bandwidth, so more concurrent downloads 
+        means a faster scrape (up to the point where the server complains).
+
+    --from <month>
+        Download every month from the given one (e.g. 2007-01) to the one 
+        given by `--to`, inclusive.
+
+    --to <month>
+        The last month to download, e.g. 2018-12.  By default, this is the 
+        current month.
+
+    --all-missing
+        Download every month since 2007 without any games in the database.
+
+    -c --commit-every <n>   [default: 100]
+        The number of games to record in each transaction.  Larger batches 
+        are faster, but more games have to be downloaded again if the scrape 
+        is killed.  Games that can't be recorded never affect the others.
+
+    -s --synchronous <level>    [default: NORMAL]
+        How carefully SQLite should wait for data to reach the disk: OFF, 
+        NORMAL, FULL, or EXTRA.  Anything but OFF keeps the database 
+        consistent if the computer crashes.
 
 Database:
     {DB_PATH}
+
+Archive:
+    {ARCHIVE_PATH}
     """
-    from . import scrape_bsw_month, model, NoDataBefore2007
-    from datetime import datetime
+    from . import scrape_bsw_months, model, NoDataBefore2007
 
     class Progress:
 
         def download_index(self, url):
-            print("Downloading games from:", url)
-            print()
-            print("This may take a while.  Hit <Ctrl-C> to abort.")
-            print()
+            print("Downloading index:", url)
 
         def download_game(self, url, i, n):
+            if i == 0:
+                print()
+                print("This may take a while.  Hit <Ctrl-C> to abort.")
+                print()
             print(f"\r[{i+1}/{n}] {url}", end='')
 
         def error(self, url, err):
             print()
             print("  Unable to parse above game:", err)
 
+        def finish(self, stats):
+            print()
+            print()
+            print(stats.summarize())
+
     args = get_docopt_args(download)
 
     if args['<year>']:
-        year = int(args['<year>'])
-        month = int(args['<month>'])
+        months = [(int(args['<year>']), int(args['<month>']))]
+
+    elif args['--from']:
+        start = parse_month(args['--from'])
+        end = parse_month(args['--to']) if args['--to'] else None
+        months = list(model.iter_months(start, end))
+
+    elif args['--all-missing']:
+        session = model.init_db()
+        months = model.query_missing_months(session)
+        print(f"Months not downloaded: {len(months)}")
+
     else:
         session = model.init_db()
-        year, month = model.most_recent_month_not_downloaded(session)
-        print(f"Most recent month not downloaded: {year}-{month:02}")
+        months = [model.most_recent_month_not_downloaded(session)]
+        print("Most recent month not downloaded: {}-{:02}".format(*months[0]))
 
     try:
-        scrape_bsw_month(year, month, Progress())
+        scrape_bsw_months(
+                months, Progress(), int(args['--jobs']),
+                commit_every=int(args['--commit-every']),
+                synchronous=args['--synchronous'],
+        )
     except NoDataBefore2007 as err:
         print(err)
 
+def reparse():
+    """\
+Rebuild the database from the local archive of game logs, without downloading 
+anything.  This is useful after improvements to the parser.  The existing 
+database is replaced.
+
+Usage:
+    tich_me reparse [-j <n>] [-s <level>]
+
+Options:
+    -j --jobs <n>
+        The number of processes to use for parsing.  The default is the number 
+        of CPUs.  The database is always written by a single process.
+
+    -s --synchronous <level>    [default: NORMAL]
+        How carefully SQLite should wait for data to reach the disk: OFF, 
+        NORMAL, FULL, or EXTRA.  Since the whole database is rebuilt from the 
+        archive, OFF is reasonable here.
+
+Database:
+    {DB_PATH}
+
+Archive:
+    {ARCHIVE_PATH}
+    """
+    from . import model, archive, reparse_archive
+    from time import perf_counter
+    from os import cpu_count
+
+    class Progress:
+
+        def __init__(self):
+            self.start = perf_counter()
+
+        def parse_game(self, url, i, n):
+            rate = (i + 1) / (perf_counter() - self.start)
+            print(f"\r[{i+1}/{n}] {rate:.0f} games/sec", end='')
+
+        def error(self, url, err):
+            print()
+            print(f"  Unable to parse {url}:", err)
+
+        def finish(self, stats):
+            print()
+            print()
+            print(stats.summarize())
+
+    args = get_docopt_args(reparse)
+    num_workers = int(args['--jobs'] or cpu_count())
+
+    # Don't replace the database with an empty one.  Databases created before
+    # the archive existed can have games that aren't in the archive, so get
+    # confirmation in that case, and if the database is shared.
+    logs = archive.init_archive()
+    num_logs = archive.count_archived_logs(logs)
+    logs.close()
+
+    if not num_logs:
+        print("The archive is empty, so the database can't be rebuilt.")
+        raise SystemExit(1)
+
+    session = model.init_db()
+    num_games = session.query(model.Game).count()
+    session.close()
+
+    if num_games > num_logs:
+        prompt = f"The database has {num_games} games, but the archive " \
+                 f"only has {num_logs}."
+    elif not model.get_db_path():
+        prompt = "The database is shared."
+    else:
+        prompt = None
+
+    if prompt:
+        yn = input(f"{prompt}  Are you sure you want to replace it? [y/N] ")
+        if yn != 'y':
+            print("Aborted")
+            return
+
+    model.drop_db()
+
+    reparse_archive(
+            Progress(), num_workers,
+            synchronous=args['--synchronous'],
+    )
+
+def export():
+    """\
+Export the database to columnar Arrow files (one per table per month), which 
+can be analyzed much faster than the database itself.  This requires the 
+`pyarrow` package.
+
+Usage:
+    tich_me export [<dir>]
+
+Arguments:
+    <dir>
+        The directory to write the files to.  The default is:
+        {ARROW_DIR}
+
+Database:
+    {DB_PATH}
+    """
+    from . import app, model, export_db
+
+    class Progress:
+
+        def export_month(self, month, i, n):
+            print(f"\r[{i+1}/{n}] {month}", end='')
+
+    args = get_docopt_args(export)
+    session = model.init_db()
+
+    export_db(session, args['<dir>'] or app.ARROW_DIR, Progress())
+    print()
+
 def analyze():
     """
     Analyze a particular aspect of Tichu strategy.
 
     Usage:
-        tich_me analyze passing
+        tich_me analyze passing [-a <dir>] [-o <dir>] [-f <format>] [-j <n>]
+        tich_me analyze passing-ci [-a <dir>] [-n <deals>] [-b <samples>] 
+            [-c <csv>]
+        tich_me analyze grand-tichu [-a <dir>] [-o <dir>] [-f <format>]
+        tich_me analyze player <name>
 
     Commands:
         passing
             Calculate the probability of being passed each card, conditional on 
             calling Tichu (before the pass) or Grand Tichu.
+            The counts are cached in the database, and only recounted for 
+            months with new games.
+
+        passing-ci
+            Calculate confidence intervals for the above probabilities, and 
+            compare them to the probabilities expected if everyone passed 
+            random cards (estimated by simulating random deals).  List the 
+            cases where the difference is significant.  Note that there are 
+            >100 cases, so about 5% of them will seem significant by chance.
+
+        grand-tichu
+            Calculate how often Grand Tichu calls succeed, as a function of 
+            features of the first 8 cards (e.g. the number of aces, the dragon, 
+            bombs).
+
+        player
+            Summarize the given player's games: how many they've played, how 
+            often their calls succeed, where they usually finish, and how many 
+            points their team wins by on average.  These statistics are kept 
+            up-to-date as games are recorded, so this is fast even for large 
+            databases.
+
+    Options:
+        -a --arrow <dir>
+            Read the data from the Arrow files written by `tich_me export`, 
+            rather than from the database.  This is much faster.
+
+        -o --output <dir>
+            Save the figures to the given directory, rather than showing them 
+            in a window.  This doesn't require a display, so it works on 
+            servers and in scripts.
+
+        -f --format <format>    [default: svg]
+            The file format to save the figures in, e.g. svg, png, or pdf.
+
+        -j --jobs <n>           [default: 1]
+            The number of processes to use when saving figures.
+
+        -n --num-deals <deals>  [default: 1000000]
+            The number of random deals to simulate for each kind of call.
+
+        -b --bootstrap <samples>    [default: 10000]
+            The number of bootstrap samples to use for the confidence 
+            intervals.
+
+        -c --csv <csv>
+            Save every probability, confidence interval, and baseline to the 
+            given path, not just the significant ones.
+
+    The data behind the figures (e.g. the features of every Grand Tichu hand) 
+    is cached in {CACHE_DIR}, and only recalculated when the database (or the 
+    Arrow files) change.
 
     Database:
         {DB_PATH}
     """
-    from . import analysis, model
+    from . import analysis, model, app
 
     args = get_docopt_args(analyze)
-    session = model.init_db()
+
+    def load_cached(name, from_db, from_arrow):
+        if args['--arrow']:
+            return analysis.load_cached_frame(
+                    app.CACHE_DIR / f'{name}_arrow.pkl',
+                    [args['--arrow']],
+                    lambda: from_arrow(args['--arrow']),
+            )
+        elif model.get_db_path():
+            return analysis.load_cached_frame(
+                    app.CACHE_DIR / f'{name}_db.pkl',
+                    [model.get_db_path()],
+                    lambda: from_db(model.init_db()),
+            )
+        else:
+            # There's no file to check for changes, so don't cache the data 
+            # frame.
+            return from_db(model.init_db())
+
+    def count_exchanges():
+        return load_cached(
+                'exchange_counts',
+                analysis.count_exchanges,
+                analysis.count_exchanges_arrow,
+        )
 
     if args['passing']:
-        analysis.plot_exchanges(session)
+        df = count_exchanges()
+
+        if args['--output']:
+            paths = analysis.save_exchange_figures(
+                    df, args['--output'],
+                    format=args['--format'],
+                    num_workers=int(args['--jobs']),
+            )
+            for path in paths:
+                print(f"Saved: {path}")
+        else:
+            analysis.plot_exchange_counts(df)
+
+    if args['passing-ci']:
+        from . import simulate
+
+        df = analysis.bootstrap_exchange_probs(
+                count_exchanges(),
+                num_samples=int(args['--bootstrap']),
+        )
+
+        if args['--arrow']:
+            hands = simulate.load_taker_hands_arrow(args['--arrow'])
+        else:
+            hands = simulate.load_taker_hands(model.init_db())
+
+        baseline = simulate.simulate_exchanges_by_call(
+                hands, int(args['--num-deals']))
+        df = analysis.compare_exchange_probs(df, baseline)
+
+        if args['--csv']:
+            df.to_csv(args['--csv'], index=False)
+
+        columns = ['call', 'giver', 'rank', 'count', 'prob', 'prob_lo',
+                'prob_hi', 'baseline']
+        print(df[df['significant']][columns].to_string(index=False))
+
+    if args['grand-tichu']:
+        df = load_cached(
+                'grand_tichu_features',
+                lambda session: analysis.grand_tichu_features(
+                    analysis.query_grand_tichus(session)),
+                lambda data_dir: analysis.grand_tichu_features(
+                    analysis.query_grand_tichus_arrow(data_dir)),
+        )
+        summary = analysis.summarize_grand_tichus(df)
+        print(summary.to_string(index=False))
+
+        if args['--output']:
+            paths = analysis.save_figures(
+                    analysis.GRAND_TICHU_FIGURES, summary, args['--output'],
+                    format=args['--format'],
+            )
+            for path in paths:
+                print(f"Saved: {path}")
+        else:
+            import matplotlib.pyplot as plt
+            analysis.plot_grand_tichu_success(summary)
+            plt.show()
+
+    if args['player']:
+        name = args['<name>']
+
+        try:
+            stats = analysis.query_player_stats(model.init_db(), name)
+        except KeyError:
+            print(f"Player not found: {name}")
+            raise SystemExit(1)
+
+        print(f"Player:           {name}")
+        print(f"Games:            {stats['num_games']}")
+        print(f"Rounds:           {stats['num_rounds']}")
+        print(f"Tichu:            {stats['tichu_success_rate']:.1%} of {stats['num_tichus']} calls")
+        print(f"Grand Tichu:      {stats['grand_tichu_success_rate']:.1%} of {stats['num_grand_tichus']} calls")
+        print(f"Mean finish:      {stats['mean_finish']:.2f}")
+        print(f"Mean score diff:  {stats['mean_score_diff']:+.1f} per round")
 
 def wipe():
     """\
@@ -99,23 +467,65 @@ Usage:
 Database:
     {DB_PATH}
     """
-    from . import app
+    from . import model
 
     get_docopt_args(wipe)
-    
-    # Get confirmation if the database if more than 10MB:
-    mb = app.DB_PATH.stat.st_size / 1024**2
-    if mb > 10:
-        yn = input("The databse is {mb:.0f}MB.  Are you sure you want to wipe it? [Y/n] ")
+    path = model.get_db_path()
+
+    # Get confirmation if the database if more than 10MB, or if it's shared 
+    # (i.e. not a local file):
+    if path:
+        mb = path.stat().st_size / 1024**2 if path.exists() else 0
+        prompt = f"The database is {mb:.0f}MB." if mb > 10 else None
+    else:
+        prompt = "The database is shared."
+
+    if prompt:
+        yn = input(f"{prompt}  Are you sure you want to wipe it? [Y/n] ")
         if yn == 'n':
             print("Aborted")
             return
 
-    app.DB_PATH.unlink()
+    model.drop_db()
+
+def pop_option(argv, name):
+    """
+    Remove the given option and its value from *argv*, and return the value.  
+    Return None if the option isn't present.
+    """
+    if name not in argv[1:-1]:
+        return None
+
+    i = argv.index(name)
+    value = argv[i+1]
+    del argv[i:i+2]
+    return value
+
+def parse_month(month):
+    """
+    Convert a string like "2018-07" to a ``(year, month)`` tuple.
+    """
+    from datetime import datetime
+    date = datetime.strptime(month, '%Y-%m')
+    return date.year, date.month
+
+def get_db_name():
+    from . import app
+
+    # Don't import SQLAlchemy unless there's a URL to parse, because it's slow.
+    if not app.DB_URL:
+        return app.DB_PATH
 
+    from sqlalchemy.engine import make_url
+    return make_url(app.DB_URL).render_as_string(hide_password=True)
 
 def get_docopt_args(f):
     import docopt
     from . import app
-    return docopt.docopt(f.__doc__.format(DB_PATH=app.DB_PATH).strip())
+    return docopt.docopt(f.__doc__.format(
+        DB_PATH=get_db_name(),
+        ARCHIVE_PATH=app.ARCHIVE_PATH,
+        ARROW_DIR=app.ARROW_DIR,
+        CACHE_DIR=app.CACHE_DIR,
+    ).strip())
 
@@ -29,13 +29,33 @@ class SeatTypes(Enum):
     north = 3
     west = 4
 
-from sqlalchemy import Table, Column, ForeignKey, UniqueConstraint
-from sqlalchemy import Integer, String, Enum, DateTime
+class ActionTypes(Enum):
+    play = 1
+    pass_ = 2
+    tichu = 3
+    wish = 4
+    give_dragon = 5
+
+class ComboTypes(Enum):
+    single = 1
+    pair = 2
+    triple = 3
+    full_house = 4
+    straight = 5
+    steps = 6  # i.e. consecutive pairs.
+    four_of_a_kind = 7
+    straight_flush = 8
+
+from sqlalchemy import Table, Column, ForeignKey, Index
+from sqlalchemy import Integer, BigInteger, String, Enum, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm import relationship
 
 from functools import partial
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+from .stats import STATS
 
 Base = declarative_base()
 Column = partial(Column, nullable=False)
@@ -46,10 +66,16 @@ relationship = partial(relationship, collection_class=set)
 teammate = Table('teammate', Base.metadata,
     Column('player_id', Integer, ForeignKey('player.id')),
     Column('team_id', Integer, ForeignKey('team.id')),
+
+    Index('uq_teammate', 'team_id', 'player_id', unique=True),
+    Index('ix_teammate_player', 'player_id'),
 )
 
 class Player(Base):
     __tablename__ = 'player'
+    __table_args__ = (
+            Index('uq_player_name', 'name', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String)
@@ -59,6 +85,10 @@ class Player(Base):
 
 class Game(Base):
     __tablename__ = 'game'
+    __table_args__ = (
+            Index('uq_game_url', 'url', unique=True),
+            Index('ix_game_date', 'date'),
+    )
 
     id = Column(Integer, primary_key=True)
     url = Column(String, nullable=True)
@@ -70,6 +100,9 @@ class Game(Base):
 
 class Team(Base):
     __tablename__ = 'team'
+    __table_args__ = (
+            Index('ix_team_game', 'game_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     game_id = Column(Integer, ForeignKey('game.id'))
@@ -80,6 +113,10 @@ class Team(Base):
 
 class Seat(Base):
     __tablename__ = 'seat'
+    __table_args__ = (
+            Index('uq_seat', 'game_id', 'seat', unique=True),
+            Index('ix_seat_player', 'player_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     game_id = Column(Integer, ForeignKey('game.id'))
@@ -91,10 +128,11 @@ class Seat(Base):
     deal = relationship('Deal', back_populates='seat')
     finishes = relationship('Finish', back_populates='seat')
 
-    UniqueConstraint('player_id', 'team_id')
-
 class Round(Base):
     __tablename__ = 'round'
+    __table_args__ = (
+            Index('uq_round', 'game_id', 'order', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     game_id = Column(Integer, ForeignKey('game.id'))
@@ -107,11 +145,14 @@ class Round(Base):
     wishes = relationship('Wish', back_populates='round')
     finishes = relationship('Finish', back_populates='round')
     scores = relationship('Score', back_populates='round')
-
-    UniqueConstraint('game', 'order')
+    hands = relationship('Hand', back_populates='round')
+    actions = relationship('Action', back_populates='round')
 
 class Deal(Base):
     __tablename__ = 'deal'
+    __table_args__ = (
+            Index('uq_deal', 'round_id', 'seat_id', 'card_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     round_id = Column(Integer, ForeignKey('round.id'))
@@ -123,10 +164,13 @@ class Deal(Base):
     seat = relationship('Seat', back_populates='deal')
     card = relationship('Card')
 
-    UniqueConstraint('round_id', 'seat_id', 'card_id')
-
 class Exchange(Base):
     __tablename__ = 'exchange'
+    __table_args__ = (
+            Index('uq_exchange', 'round_id', 'giver_id', 'taker_id', unique=True),
+            # For joining exchanges with the calls made by the taker.
+            Index('ix_exchange_taker', 'round_id', 'taker_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     round_id = Column(Integer, ForeignKey('round.id'))
@@ -139,13 +183,14 @@ class Exchange(Base):
     taker = relationship('Seat', foreign_keys=taker_id)
     card = relationship('Card')
 
-    UniqueConstraint('round', 'giver', 'taker')
-
     def __repr__(self):
         return f'<Exchange round={self.round_id} giver={self.giver_id} taker={self.taker_id}, card={self.card}>'
 
 class Call(Base):
     __tablename__ = 'call'
+    __table_args__ = (
+            Index('uq_call', 'round_id', 'seat_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     round_id = Column(Integer, ForeignKey('round.id'))
@@ -155,10 +200,11 @@ class Call(Base):
     round = relationship('Round', back_populates='calls')
     seat = relationship('Seat')
 
-    UniqueConstraint('round', 'seat', 'call')
-
 class Wish(Base):
     __tablename__ = 'wish'
+    __table_args__ = (
+            Index('uq_wish', 'round_id', 'seat_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     round_id = Column(Integer, ForeignKey('round.id'))
@@ -168,10 +214,11 @@ class Wish(Base):
     round = relationship('Round', back_populates='wishes')
     seat = relationship('Seat')
 
-    UniqueConstraint('round', 'seat')
-
 class Finish(Base):
     __tablename__ = 'finish'
+    __table_args__ = (
+            Index('uq_finish', 'round_id', 'seat_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     round_id = Column(Integer, ForeignKey('round.id'))
@@ -181,10 +228,11 @@ class Finish(Base):
     round = relationship('Round', back_populates='finishes')
     seat = relationship('Seat', back_populates='finishes')
 
-    UniqueConstraint('round', 'seat')
-
 class Score(Base):
     __tablename__ = 'score'
+    __table_args__ = (
+            Index('uq_score', 'round_id', 'team_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     round_id = Column(Integer, ForeignKey('round.id'))
@@ -201,8 +249,6 @@ class Score(Base):
     round = relationship('Round', back_populates='scores')
     team = relationship('Team', back_populates='scores')
 
-    UniqueConstraint('round', 'team')
-
 class Card(Base):
     __tablename__ = 'card'
 
@@ -235,26 +281,561 @@ class Card(Base):
         else:
             return f'{suit_abbr[self.suit]}{rank_abbr.get(self.rank, self.rank)}'
 
-def init_db():
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-    from .app import DB_PATH
+class Hand(Base):
+    """
+    The cards held by one player in one round, encoded as `CardMask` integers.  
+    This is redundant with the `Deal` table, but it allows hands to be queried 
+    using bitwise operations (see `sql_holds()`) rather than joins.
+    """
+    __tablename__ = 'hand'
+    __table_args__ = (
+            Index('uq_hand', 'round_id', 'seat_id', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    round_id = Column(Integer, ForeignKey('round.id'))
+    seat_id = Column(Integer, ForeignKey('seat.id'))
+    first_8 = Column(BigInteger)
+    full = Column(BigInteger)
+
+    round = relationship('Round', back_populates='hands')
+    seat = relationship('Seat')
+
+    def __repr__(self):
+        return f'<Hand round={self.round_id} seat={self.seat_id} full={CardMask(self.full)}>'
+
+class Action(Base):
+    """
+    One line of the play-by-play log of a round, in the order given by the 
+    *order* column.
+
+    The *cards* column is a `CardMask` integer.  For plays, it holds the cards 
+    that were played and *combo* says what kind of combination they make.  For 
+    wishes, it holds the four cards of the wished rank.  It's empty for the 
+    other kinds of actions.  The seat is the player who acted, except when the 
+    dragon is given away, in which case it's the player receiving the trick.  
+    See `replay.replay_round()` for a way to reconstruct the state of the round 
+    after each action.
+    """
+    __tablename__ = 'action'
+    __table_args__ = (
+            Index('uq_action', 'round_id', 'order', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    round_id = Column(Integer, ForeignKey('round.id'))
+    order = Column(Integer)
+    seat_id = Column(Integer, ForeignKey('seat.id'))
+    action = Column(Enum(ActionTypes))
+    cards = Column(BigInteger)
+    combo = Column(Enum(ComboTypes), nullable=True)
+
+    round = relationship('Round', back_populates='actions')
+    seat = relationship('Seat')
+
+    def __repr__(self):
+        return f'<Action round={self.round_id} order={self.order} action={self.action.name} cards={CardMask(self.cards)}>'
+
+class ExchangeCount(Base):
+    """
+    The number of times each rank was passed in one month, grouped like 
+    `analysis.query_exchange_counts()`.  This is a summary of the `Exchange` 
+    table, kept up to date by `analysis.refresh_exchange_counts()`.  The year 
+    and month are null for games without dates.
+    """
+    __tablename__ = 'exchange_count'
+    __table_args__ = (
+            Index('uq_exchange_count',
+                'year', 'month', 'call', 'giver', 'rank', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    year = Column(Integer, nullable=True)
+    month = Column(Integer, nullable=True)
+    call = Column(String)
+    giver = Column(String)
+    rank = Column(Integer)
+    count = Column(Integer)
+
+class SummaryMonth(Base):
+    """
+    The number of games in each month when the summary tables (e.g. 
+    `ExchangeCount`) were last refreshed.  A month needs to be refreshed again 
+    if it now has a different number of games.
+    """
+    __tablename__ = 'summary_month'
+    __table_args__ = (
+            Index('uq_summary_month', 'year', 'month', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    year = Column(Integer, nullable=True)
+    month = Column(Integer, nullable=True)
+    num_games = Column(Integer)
+
+class PlayerStats(Base):
+    """
+    Running totals for each player, so that questions about one player don't 
+    require joining every table in the database.  This is a summary of the 
+    `Seat`, `Call`, `Finish`, and `Score` tables, which is updated every time a 
+    game is recorded (see `update_player_stats()`), and can be rebuilt from 
+    scratch by `rebuild_player_stats()`.
+
+    Finish orders are numbered from 0, like in the `Finish` table.  Rounds 
+    where the player's team lost a double victory don't count towards the 
+    finish totals, because the order of the two losers isn't known.  The score 
+    differential is the player's team's score minus the other team's score.
+    """
+    __tablename__ = 'player_stats'
+    __table_args__ = (
+            Index('uq_player_stats', 'player_id', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    player_id = Column(Integer, ForeignKey('player.id'))
+    num_games = Column(Integer, default=0)
+    num_rounds = Column(Integer, default=0)
+    num_tichus = Column(Integer, default=0)
+    num_tichu_successes = Column(Integer, default=0)
+    num_grand_tichus = Column(Integer, default=0)
+    num_grand_tichu_successes = Column(Integer, default=0)
+    num_finishes = Column(Integer, default=0)
+    total_finish_order = Column(Integer, default=0)
+    total_score_diff = Column(Integer, default=0)
+
+    player = relationship('Player')
+
+class CardMask(int):
+    """
+    A set of cards, encoded as a 56-bit integer.  Bit *i* is set if the set 
+    includes the *i*-th card in `CARDS`.
+
+    Since masks are just integers, they can be stored in the database and 
+    combined with the usual bitwise operators.  Note that these operators 
+    return plain integers.
+    """
+
+    @classmethod
+    def from_indices(cls, indices):
+        mask = 0
+        for i in indices:
+            mask |= 1 << i
+        return cls(mask)
+
+    @classmethod
+    def from_cards(cls, cards):
+        """
+        Make a mask from ``(suit, rank, special)`` tuples.
+        """
+        return cls.from_indices(CARD_INDICES[x] for x in cards)
+
+    def __contains__(self, i):
+        return bool(self >> i & 1)
+
+    def __iter__(self):
+        # Only visit the bits that are set, by repeatedly clearing the lowest 
+        # one.
+        mask = int(self)
+        while mask:
+            low_bit = mask & -mask
+            yield low_bit.bit_length() - 1
+            mask ^= low_bit
+
+    def __len__(self):
+        return bin(self).count('1')
 
-    DB_PATH.parent.mkdir(exist_ok=True)
+    def __repr__(self):
+        return f'CardMask({list(self)})'
+
+    def holds(self, mask):
+        return self & mask == mask
+
+    def has_bomb(self):
+        return any(self.holds(x) for x in BOMB_MASKS)
+
+def rank_mask(rank):
+    """
+    Return a mask of all four cards with the given rank (2-14).
+    """
+    return CardMask.from_cards((suit, rank, None) for suit in SuitTypes)
+
+def special_mask(special):
+    return CardMask.from_cards([(None, None, special)])
+
+def sql_holds(column, mask):
+    """
+    Return an SQL expression that's true if the given `Hand` column (e.g. 
+    ``Hand.full``) contains every card in the given mask.
+    """
+    return column.op('&')(int(mask)) == int(mask)
+
+def sql_has_bomb(column):
+    """
+    Return an SQL expression that's true if the given `Hand` column contains 
+    either four of a kind or a straight flush.
+    """
+    from sqlalchemy import or_
+    return or_(*(sql_holds(column, x) for x in BOMB_MASKS))
+
+# The columns of `PlayerStats` that hold running totals.
+PLAYER_STATS = [
+        'num_games',
+        'num_rounds',
+        'num_tichus',
+        'num_tichu_successes',
+        'num_grand_tichus',
+        'num_grand_tichu_successes',
+        'num_finishes',
+        'total_finish_order',
+        'total_score_diff',
+]
+
+# The canonical order of the cards.  The card table is filled in in this order, 
+# and card indices (e.g. in `CardMask`) refer to it.
+CARDS = [
+        *((suit, rank, None) for suit in SuitTypes for rank in range(2, 15)),
+        *((None, None, special) for special in SpecialTypes),
+]
+CARD_INDICES = {k: i for i, k in enumerate(CARDS)}
+
+# Every four-of-a-kind and every 5-card straight flush.  Longer straight 
+# flushes always contain a 5-card one.
+BOMB_MASKS = [
+        *(rank_mask(rank) for rank in range(2, 15)),
+        *(
+            CardMask.from_cards((suit, rank + i, None) for i in range(5))
+            for suit in SuitTypes
+            for rank in range(2, 11)
+        ),
+]
+
+_card_ids = WeakKeyDictionary()
+
+# SQLite settings for recording lots of games quickly.  In WAL mode, readers 
+# (e.g. the analysis commands) don't block the writer and vice versa.  With 
+# WAL, "NORMAL" synchronization can't corrupt the database, even if the 
+# computer crashes; at worst the most recent commits are lost.  "OFF" is 
+# faster still, but a power failure can corrupt the database.
+INGEST_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64 * 1024,           # KiB, i.e. 64 MiB
+        'mmap_size': 256 * 1024**2,         # bytes
+        'temp_store': 'MEMORY',
+}
+SYNCHRONOUS_LEVELS = 'OFF', 'NORMAL', 'FULL', 'EXTRA'
+
+# The number of ids to reserve at once from PostgreSQL sequences.  See 
+# `BulkInsert`.
+ID_BLOCK_SIZE = 1000
+
+# Settings for the connection pool, when the database is a server rather than 
+# a local file.
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+
+def init_db(pragmas=None, url=None):
+    """
+    Connect to the database, creating it if necessary.
+
+    *url* can be any SQLAlchemy database URL.  The default comes from 
+    `get_db_url()`.  *pragmas* is a dictionary of SQLite settings (e.g. 
+    `INGEST_PRAGMAS`) to apply to every connection.  It's ignored for other 
+    kinds of databases.
+    """
+    from sqlalchemy.orm import sessionmaker
 
-    engine = create_engine(f'sqlite:///{DB_PATH}')
+    engine = init_engine(url, pragmas)
     init_schema(engine)
 
     Session = sessionmaker(bind=engine)
     return Session()
 
+def init_engine(url=None, pragmas=None):
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import make_url
+
+    url = make_url(url or get_db_url())
+
+    if url.get_backend_name() == 'sqlite':
+        path = get_db_path(url)
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+        engine = create_engine(url)
+        set_sqlite_transactions(engine)
+        if pragmas:
+            set_sqlite_pragmas(engine, pragmas)
+
+    else:
+        engine = create_engine(
+                url,
+                pool_size=POOL_SIZE,
+                max_overflow=POOL_MAX_OVERFLOW,
+                pool_pre_ping=True,
+        )
+
+    return engine
+
+def get_db_url():
+    """
+    Return the URL of the database to use: `app.DB_URL` if it's set (e.g. via 
+    the ``TICH_ME_DB_URL`` environment variable), or the SQLite database at 
+    `app.DB_PATH` otherwise.
+    """
+    from . import app
+    return app.DB_URL or f'sqlite:///{app.DB_PATH}'
+
+def get_db_path(url=None):
+    """
+    Return the path to the given database, or None if it isn't a file (e.g. 
+    a PostgreSQL server, or an in-memory SQLite database).
+    """
+    from sqlalchemy.engine import make_url
+    from pathlib import Path
+
+    url = make_url(url or get_db_url())
+
+    if url.get_backend_name() != 'sqlite':
+        return None
+    if url.database in (None, '', ':memory:'):
+        return None
+
+    return Path(url.database)
+
+def drop_db(url=None):
+    """
+    Delete every game from the database.  For SQLite, this means deleting the 
+    file(s).  For other databases, it means dropping all the tables.
+    """
+    path = get_db_path(url)
+
+    if path:
+        # In WAL mode, SQLite keeps recent changes in separate files.  These 
+        # must be deleted along with the database, or they'd be applied to the 
+        # next database created at the same path.
+        for suffix in ['', '-wal', '-shm']:
+            p = path.with_name(path.name + suffix)
+            if p.exists():
+                p.unlink()
+
+    else:
+        engine = init_engine(url)
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+def get_ingest_pragmas(synchronous='NORMAL'):
+    """
+    Return `INGEST_PRAGMAS` with the given synchronization level.
+    """
+    synchronous = synchronous.upper()
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(
+                f"unknown synchronous level: {synchronous!r} "
+                f"(expected one of: {', '.join(SYNCHRONOUS_LEVELS)})"
+        )
+
+    return {**INGEST_PRAGMAS, 'synchronous': synchronous}
+
+def set_sqlite_pragmas(engine, pragmas):
+    """
+    Apply the given pragmas to every new connection made by the given engine.  
+    This has to be called before the engine makes any connections.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f'PRAGMA {key} = {value}')
+        cursor.close()
+
+def set_sqlite_transactions(engine):
+    """
+    Make SQLite savepoints work as expected for the given engine.
+
+    By default, the `sqlite3` module doesn't begin a transaction until the 
+    first INSERT/UPDATE/DELETE, so a SAVEPOINT issued before then starts its 
+    own transaction, which RELEASE then commits.  This gives SQLite control 
+    of the transactions instead, following the recipe in the SQLAlchemy 
+    documentation.  This has to be called before the engine makes any 
+    connections.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
 def init_schema(engine):
+    from sqlalchemy import inspect
+
+    # Summary tables that are added to existing databases have to be filled in 
+    # from the games that are already there.
+    inspector = inspect(engine)
+    rebuilds = [
+            rebuild for table, rebuild in [
+                (Hand, rebuild_hands),
+                (PlayerStats, rebuild_player_stats),
+            ]
+            if not inspector.has_table(table.__tablename__)
+    ]
+
     Base.metadata.create_all(engine)
+    migrate_schema(engine)
+    init_cards(engine)
+
+    if rebuilds:
+        from sqlalchemy.orm import Session
+
+        session = Session(bind=engine)
+        try:
+            for rebuild in rebuilds:
+                rebuild(session)
+            session.commit()
+        finally:
+            session.close()
+
+def migrate_schema(engine):
+    """
+    Bring databases created by older versions of tich_me up to date.
+
+    `create_all()` only creates tables that don't exist yet, so indexes added 
+    to existing tables have to be created separately.  Note that this will 
+    fail if an existing table contains rows that violate a new uniqueness 
+    constraint.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+def init_cards(engine):
+    """
+    Fill in the card table.  The cards never change after this, which is what 
+    allows `get_card_ids()` to cache them.
+    """
+    from sqlalchemy.orm import Session
+
+    session = Session(bind=engine)
+    try:
+        if not session.query(Card).count():
+            session.execute(Card.__table__.insert(), [
+                dict(suit=suit, rank=rank, special=special)
+                for suit, rank, special in CARDS
+            ])
+            session.commit()
+    finally:
+        session.close()
 
 def is_game_recorded(session, url):
     if url is None: return False
     return session.query(Game).filter_by(url=url).count()
 
+def query_recorded_urls(session, urls):
+    """
+    Return the subset of the given URLs that belong to games that have already 
+    been recorded.  This takes one query per 500 URLs, rather than one query 
+    per URL like `is_game_recorded()`.
+    """
+    urls = [x for x in urls if x is not None]
+    recorded = set()
+
+    # Keep the number of parameters per query below SQLite's limit.
+    for i in range(0, len(urls), 500):
+        q = session.query(Game.url).filter(Game.url.in_(urls[i:i+500]))
+        recorded.update(x for x, in q)
+
+    return recorded
+
+def query_months(session):
+    """
+    Return a sorted list of every ``(year, month)`` with at least one recorded 
+    game.  If there are games without dates, the list ends with None.
+    """
+    return list(count_games_by_month(session))
+
+def filter_month(q, month):
+    """
+    Restrict the given query, which must involve the `Game` table, to games 
+    played in the given ``(year, month)``.  If *month* is None, restrict it 
+    to games without dates.
+    """
+    from datetime import datetime
+
+    if month is None:
+        return q.filter(Game.date == None)
+
+    year, month = month
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+
+    return q.filter(Game.date >= start, Game.date < end)
+
+def count_games_by_month(session):
+    """
+    Return a dictionary mapping each ``(year, month)`` with at least one 
+    recorded game to the number of games recorded in it, in chronological 
+    order.  Games without dates are counted under None, which comes last.
+
+    This takes a single ``GROUP BY`` query, so only one row per month is ever 
+    loaded from the database.
+    """
+    from sqlalchemy import extract, func
+
+    year = extract('year', Game.date)
+    month = extract('month', Game.date)
+    q = session.query(year, month, func.count()).group_by(year, month)
+
+    counts = {
+            None if y is None else (int(y), int(m)): n
+            for y, m, n in q
+    }
+    months = sorted(counts.keys() - {None})
+    if None in counts:
+        months.append(None)
+
+    return {k: counts[k] for k in months}
+
+def filter_summary_month(q, table, month):
+    """
+    Restrict the given query to the rows of the given summary table (e.g.  
+    `ExchangeCount`) for the given ``(year, month)``, or for undated games if 
+    *month* is None.
+    """
+    year, month = month or (None, None)
+    return q.filter(table.year == year, table.month == month)
+
+def query_missing_months(session, start=(2007, 1), end=None):
+    """
+    Return a list of every ``(year, month)`` between *start* and *end* 
+    (inclusive) without any recorded games.  By default, *end* is the current 
+    month.
+    """
+    downloaded = set(query_months(session))
+    return [x for x in iter_months(start, end) if x not in downloaded]
+
+def iter_months(start, end=None):
+    """
+    Yield every ``(year, month)`` from *start* to *end*, inclusive.  By 
+    default, *end* is the current month.
+    """
+    from datetime import datetime
+
+    if end is None:
+        now = datetime.now()
+        end = now.year, now.month
+
+    year, month = start
+
+    while (year, month) <= tuple(end):
+        yield year, month
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+
 def most_recent_month_not_downloaded(session):
     from datetime import datetime
 
@@ -280,6 +861,280 @@ def most_recent_month_not_downloaded(session):
         else:
             next_month -= 1
 
+def get_card_ids(session):
+    """
+    Return a dictionary mapping ``(suit, rank, special)`` tuples to card ids.
+
+    The ids are only queried once per engine, because the card table never 
+    changes once it's been filled in by `init_schema()`.
+    """
+    engine = session.get_bind()
+
+    try:
+        return _card_ids[engine]
+    except KeyError:
+        pass
+
+    card_ids = {
+            (x.suit, x.rank, x.special): x.id
+            for x in session.query(Card)
+    }
+
+    # Don't cache an incomplete table, e.g. one that's being filled in by the 
+    # ORM in a transaction that hasn't been committed yet.
+    if len(card_ids) == len(CARDS):
+        _card_ids[engine] = card_ids
+
+    return card_ids
+
+def get_or_create_player_ids(session, names, bulk):
+    """
+    Return a dictionary mapping each of the given names to a player id.  
+    Players that aren't already in the database are added to the given 
+    `BulkInsert`, in the order they are given.
+    """
+    cache = PlayerCache.from_session(session)
+    names = list(dict.fromkeys(names))
+    ids = {x: cache[x] for x in names if x in cache}
+    missing = [x for x in names if x not in ids]
+
+    STATS.count('player cache hits', len(ids))
+    STATS.count('player cache misses', len(missing))
+
+    # Keep the number of parameters per query below SQLite's limit.
+    with STATS.timer('look up players'):
+        for i in range(0, len(missing), 500):
+            q = session.query(Player.id, Player.name)\
+                    .filter(Player.name.in_(missing[i:i+500]))
+            ids.update({name: id for id, name in q})
+
+    # If possible, insert the new players right away rather than with the rest 
+    # of the rows.  Then, if another process is adding the same players, one 
+    # waits for the other to commit (and uses its ids) instead of failing.
+    new = [x for x in missing if x not in ids]
+    insert = get_on_conflict_insert(session)
+
+    if new and insert:
+        with STATS.timer('add players'):
+            stmt = insert(Player.__table__)\
+                    .on_conflict_do_nothing(index_elements=['name'])
+            session.execute(stmt, [{'name': x} for x in new])
+
+            for i in range(0, len(new), 500):
+                q = session.query(Player.id, Player.name)\
+                        .filter(Player.name.in_(new[i:i+500]))
+                ids.update({name: id for id, name in q})
+
+    for name in missing:
+        if name not in ids:
+            ids[name] = bulk.add(Player, name=name)
+
+        cache[name] = ids[name]
+
+    return ids
+
+def get_on_conflict_insert(session):
+    """
+    Return the ``insert()`` function for the given session's database, if it 
+    supports ``ON CONFLICT`` clauses (i.e. PostgreSQL and SQLite).  Otherwise, 
+    return None.
+    """
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    inserts = {
+            'postgresql': postgresql.insert,
+            'sqlite': sqlite.insert,
+    }
+    return inserts.get(session.get_bind().dialect.name)
+
+def update_player_stats(session, stats):
+    """
+    Add to the totals in the `PlayerStats` table.
+
+    *stats* is a dictionary mapping player ids to dictionaries (e.g. 
+    `Counter` objects) mapping `PLAYER_STATS` column names to the amounts to 
+    add.  Rows are created for any players that don't have one yet.
+    """
+    from sqlalchemy import update, insert, bindparam
+
+    table = PlayerStats.__table__
+    ids = list(stats)
+    existing = set()
+
+    # Where possible, let the database decide whether each row needs to be 
+    # inserted or updated, so that processes recording games at the same time 
+    # can't both insert a row for the same player.
+    on_conflict_insert = get_on_conflict_insert(session)
+
+    if on_conflict_insert:
+        stmt = on_conflict_insert(table)
+        stmt = stmt.on_conflict_do_update(
+                index_elements=['player_id'],
+                set_={k: table.c[k] + stmt.excluded[k] for k in PLAYER_STATS},
+        )
+        rows = [
+                {'player_id': id, **{k: stats[id].get(k, 0) for k in PLAYER_STATS}}
+                for id in ids
+        ]
+        with STATS.timer('update player stats'):
+            if rows:
+                session.execute(stmt, rows)
+        return
+
+    # Keep the number of parameters per query below SQLite's limit.
+    for i in range(0, len(ids), 500):
+        q = session.query(PlayerStats.player_id)\
+                .filter(PlayerStats.player_id.in_(ids[i:i+500]))
+        existing |= {x for x, in q}
+
+    updates = [
+            {'player': id, **{
+                f'd_{k}': stats[id].get(k, 0) for k in PLAYER_STATS
+            }}
+            for id in ids if id in existing
+    ]
+    inserts = [
+            {'player_id': id, **{k: stats[id].get(k, 0) for k in PLAYER_STATS}}
+            for id in ids if id not in existing
+    ]
+
+    with STATS.timer('update player stats'):
+        if updates:
+            stmt = update(table)\
+                    .where(table.c.player_id == bindparam('player'))\
+                    .values({
+                        k: table.c[k] + bindparam(f'd_{k}')
+                        for k in PLAYER_STATS
+                    })
+            session.execute(stmt, updates)
+
+        if inserts:
+            session.execute(insert(table), inserts)
+
+def rebuild_hands(session):
+    """
+    Recalculate the `Hand` table from scratch, using the `Deal` table.
+
+    This takes one ``INSERT ... SELECT`` statement, so nothing is loaded into 
+    Python.  Each card contributes a different bit to the hand masks, so the 
+    bitwise OR of the cards is the same as their sum (which, unlike the OR, is 
+    an aggregate function in every database).
+    """
+    from sqlalchemy import func, case, select, literal
+
+    bits = case(
+            {
+                card_id: literal(1 << CARD_INDICES[card], BigInteger)
+                for card, card_id in get_card_ids(session).items()
+            },
+            value=Deal.card_id,
+    )
+    first_8 = case((Deal.group == DealTypes.first_8, bits), else_=0)
+
+    hands = select(
+                Deal.round_id,
+                Deal.seat_id,
+                func.sum(first_8),
+                func.sum(bits),
+            )\
+            .group_by(Deal.round_id, Deal.seat_id)
+
+    session.query(Hand).delete(synchronize_session=False)
+    session.execute(
+            Hand.__table__.insert().from_select(
+                ['round_id', 'seat_id', 'first_8', 'full'], hands,
+            )
+    )
+
+def rebuild_player_stats(session):
+    """
+    Recalculate the `PlayerStats` table from scratch, using the games already 
+    in the database.
+    """
+    from sqlalchemy import func, and_, or_, case, select
+    from sqlalchemy.orm import aliased
+    from collections import Counter
+
+    stats = {}
+
+    def add(name, q):
+        for player_id, value in q.group_by(Seat.player_id):
+            stats.setdefault(player_id, Counter())[name] += value or 0
+
+    def count_calls(calls):
+        return session.query(Seat.player_id, func.count())\
+                .select_from(Call)\
+                .join(Seat, Call.seat_id == Seat.id)\
+                .filter(Call.call.in_(calls))
+
+    def count_successes(calls):
+        return count_calls(calls)\
+                .join(Finish, and_(
+                    Call.round_id == Finish.round_id,
+                    Call.seat_id == Finish.seat_id,
+                ))\
+                .filter(Finish.order == 0)
+
+    tichus = [CallTypes.tichu_before, CallTypes.tichu_after]
+    grand_tichus = [CallTypes.grand_tichu]
+
+    add('num_games', session.query(Seat.player_id, func.count()))
+    add('num_rounds', session.query(Seat.player_id, func.count())
+            .join(Round, Round.game_id == Seat.game_id))
+    add('num_tichus', count_calls(tichus))
+    add('num_tichu_successes', count_successes(tichus))
+    add('num_grand_tichus', count_calls(grand_tichus))
+    add('num_grand_tichu_successes', count_successes(grand_tichus))
+    # After a double victory, the order of the two losers is arbitrary (see 
+    # `scrape.count_round_stats()`), so leave them out.  North and south are 
+    # one team, and east and west are the other.
+    first, second = aliased(Finish), aliased(Finish)
+    first_seat, second_seat = aliased(Seat), aliased(Seat)
+    north_south = [SeatTypes.north, SeatTypes.south]
+
+    double_victories = select(first.round_id)\
+            .join(second, and_(
+                second.round_id == first.round_id,
+                second.order == 1,
+            ))\
+            .join(first_seat, first_seat.id == first.seat_id)\
+            .join(second_seat, second_seat.id == second.seat_id)\
+            .where(first.order == 0)\
+            .where(
+                first_seat.seat.in_(north_south) ==
+                second_seat.seat.in_(north_south)
+            )
+
+    def query_finishes(value):
+        return session.query(Seat.player_id, value)\
+                .join(Finish, Finish.seat_id == Seat.id)\
+                .filter(or_(
+                    Finish.order < 2,
+                    Finish.round_id.not_in(double_victories),
+                ))
+
+    add('num_finishes', query_finishes(func.count()))
+    add('total_finish_order', query_finishes(func.sum(Finish.order)))
+
+    # The score differential is the player's team's score minus the other 
+    # team's score.  Each round has a score for each team, and the joins below 
+    # make `Team` the team the player is on.
+    score_diff = case(
+            (Score.team_id == Team.id, Score.score),
+            else_=-Score.score,
+    )
+    add('total_score_diff', session.query(Seat.player_id, func.sum(score_diff))
+            .join(Round, Round.game_id == Seat.game_id)
+            .join(Score, Score.round_id == Round.id)
+            .join(Team, Team.game_id == Seat.game_id)
+            .join(teammate, and_(
+                teammate.c.team_id == Team.id,
+                teammate.c.player_id == Seat.player_id,
+            )))
+
+    session.query(PlayerStats).delete(synchronize_session=False)
+    update_player_stats(session, stats)
+
 def get_or_create(session, model, **kwargs):
     try: 
         row = session.query(model).filter_by(**kwargs).one()
@@ -289,5 +1144,170 @@ def get_or_create(session, model, **kwargs):
         session.add(row)
         return row
 
-
+class BulkInsert:
+    """
+    Collect rows for any number of tables, then insert all of them with one 
+    ``executemany()`` per table (or one ``COPY`` per table, on PostgreSQL).
+
+    Primary keys are assigned up front, so rows can refer to each other before 
+    anything is written to the database.  This avoids the overhead of the ORM 
+    unit-of-work.  On PostgreSQL, the keys are reserved from each table's 
+    sequence, so any number of processes can insert rows at once.  Otherwise, 
+    the keys count up from the largest id already in each table, which assumes 
+    that nothing else inserts into the same tables while the rows are being 
+    collected.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.dialect = session.get_bind().dialect
+        self.rows = {}
+        self.next_ids = {}
+
+    def add(self, table, **row):
+        """
+        Queue a row to be inserted into the given table (either a mapped class 
+        or a `Table`) and return its primary key, if it has one.
+        """
+        table = getattr(table, '__table__', table)
+
+        if 'id' in table.c and 'id' not in row:
+            row['id'] = self.next_id(table)
+
+        self.rows.setdefault(table, []).append(row)
+        return row.get('id')
+
+    def next_id(self, table):
+        if self.dialect.name == 'postgresql':
+            # Ids taken from a sequence are never handed out again, even if 
+            # the transaction is rolled back, so the unused ones can be kept 
+            # for as long as the session lasts.
+            reserved = self.session.info\
+                    .setdefault('reserved_ids', {})\
+                    .setdefault(table.name, [])
+
+            if not reserved:
+                reserved += reversed(reserve_ids(self.session, table))
+
+            return reserved.pop()
+
+        if table not in self.next_ids:
+            from sqlalchemy import func
+            max_id = self.session.query(func.max(table.c.id)).scalar()
+            self.next_ids[table] = (max_id or 0) + 1
+
+        id = self.next_ids[table]
+        self.next_ids[table] += 1
+        return id
+
+    def execute(self):
+        # Insert parent tables before the tables that refer to them.
+        with STATS.timer('insert rows'):
+            for table in Base.metadata.sorted_tables:
+                rows = self.rows.pop(table, None)
+                if rows:
+                    if self.dialect.driver == 'psycopg':
+                        copy_rows(self.session, table, rows)
+                    else:
+                        self.session.execute(table.insert(), rows)
+                    STATS.count('rows inserted', len(rows))
+
+def reserve_ids(session, table, n=ID_BLOCK_SIZE):
+    """
+    Return a list of *n* ids from the sequence for the given table's primary 
+    key.  This only works on PostgreSQL.
+    """
+    from sqlalchemy import text
+
+    q = text("""\
+            SELECT nextval(pg_get_serial_sequence(:table, 'id'))
+            FROM generate_series(1, :n)""")
+    return [x for x, in session.execute(q, dict(table=table.name, n=n))]
+
+def copy_rows(session, table, rows):
+    """
+    Insert the given rows using PostgreSQL's ``COPY`` command, which is much 
+    faster than ``INSERT`` for lots of rows.  This requires the psycopg (v3) 
+    driver.  Every row must have the same keys.
+    """
+    dialect = session.get_bind().dialect
+    quote = dialect.identifier_preparer.quote
+    columns = list(rows[0])
+    processors = [
+            table.c[k].type.bind_processor(dialect) or (lambda x: x)
+            for k in columns
+    ]
+    copy_sql = 'COPY {} ({}) FROM STDIN'.format(
+            dialect.identifier_preparer.format_table(table),
+            ', '.join(quote(k) for k in columns),
+    )
+
+    # Use the connection belonging to the session, so the rows are inserted 
+    # in the same transaction as everything else.
+    connection = session.connection().connection.driver_connection
+
+    with connection.cursor() as cursor:
+        with cursor.copy(copy_sql) as copy:
+            for row in rows:
+                copy.write_row([f(row[k]) for k, f in zip(columns, processors)])
+
+class PlayerCache:
+    """
+    Map player names to ids, without querying the database for players that 
+    have been seen recently.
+
+    Only the *max_size* most recently used players are remembered.  Ids 
+    learned during a transaction are only trusted once that transaction is 
+    committed.  If it's rolled back (even to a savepoint), they're forgotten, 
+    because the players they refer to may no longer exist.
+    """
+
+    def __init__(self, session, max_size=100000):
+        from sqlalchemy import event
+
+        self.max_size = max_size
+        self.committed = OrderedDict()
+        self.pending = {}
+
+        event.listen(session, 'after_commit', self.on_commit)
+        event.listen(session, 'after_soft_rollback', self.on_rollback)
+
+    @classmethod
+    def from_session(cls, session):
+        """
+        Return the cache attached to the given session, creating it if 
+        necessary.  This way, the cache is shared by every game recorded in 
+        the same scrape or reparse.
+        """
+        try:
+            return session.info['player_cache']
+        except KeyError:
+            cache = session.info['player_cache'] = cls(session)
+            return cache
+
+    def __contains__(self, name):
+        return name in self.pending or name in self.committed
+
+    def __getitem__(self, name):
+        try:
+            return self.pending[name]
+        except KeyError:
+            self.committed.move_to_end(name)
+            return self.committed[name]
+
+    def __setitem__(self, name, id):
+        self.pending[name] = id
+
+    def __len__(self):
+        return len(self.committed)
+
+    def on_commit(self, session):
+        self.committed.update(self.pending)
+        self.pending.clear()
+
+        while len(self.committed) > self.max_size:
+            self.committed.popitem(last=False)
+
+    def on_rollback(self, session, previous_transaction):
+        self.pending.clear()
 
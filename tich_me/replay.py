@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+"""
+Reconstruct the state of a round (the cards left in each hand, the current
+trick, the points taken, etc.) after each of its actions.
+
+Players are identified by their index in the log (0-3, i.e. south, east,
+north, west) and sets of cards by `model.CardMask` integers, so replaying a
+round is just a few bitwise operations per action.  Actions are ``(player,
+action_type, cards)`` tuples, as stored in the `model.Action` table and
+returned by `scrape.get_actions()`.
+"""
+
+from collections import Counter
+from itertools import groupby
+from . import model
+
+class RoundState:
+    """
+    The state of a round between two actions.
+
+    hands:
+        The cards each player is still holding.
+
+    trick:
+        The ``(player, cards)`` plays made in the current trick, or an empty
+        list if the next player will lead.
+
+    holder:
+        The player who made the highest play in the current trick.
+
+    points:
+        The card points each player has taken in tricks so far.
+
+    finishes:
+        The players who've run out of cards, in order.
+
+    wish:
+        The rank that's been wished for and not yet played, if any.
+
+    tichus:
+        The players who've called tichu during the play.
+    """
+
+    def __init__(self, hands):
+        self.hands = list(hands)
+        self.trick = []
+        self.holder = None
+        self.points = [0, 0, 0, 0]
+        self.finishes = []
+        self.wish = None
+        self.tichus = []
+        self.num_passes = 0
+        self.dragon_points = 0
+
+    def __repr__(self):
+        return f'<RoundState hands={self.hands} trick={self.trick} points={self.points}>'
+
+    def copy(self):
+        state = RoundState(self.hands)
+        state.trick = list(self.trick)
+        state.holder = self.holder
+        state.points = list(self.points)
+        state.finishes = list(self.finishes)
+        state.wish = self.wish
+        state.tichus = list(self.tichus)
+        state.num_passes = self.num_passes
+        state.dragon_points = self.dragon_points
+        return state
+
+    def apply(self, player, action, cards):
+        if action == model.ActionTypes.play:
+            self.play(player, cards)
+
+        elif action == model.ActionTypes.pass_:
+            self.pass_(player)
+
+        elif action == model.ActionTypes.give_dragon:
+            self.points[player] += self.dragon_points
+            self.dragon_points = 0
+
+        elif action == model.ActionTypes.wish:
+            self.wish = get_cards_rank(cards)
+
+        elif action == model.ActionTypes.tichu:
+            self.tichus.append(player)
+
+    def play(self, player, cards):
+        # The log doesn't say when a trick ends.  Usually the player who won it
+        # "passes", but if that player is out of cards, the trick ends when the
+        # next player leads.  Only bombs can be played onto a trick that
+        # everyone else has passed on.
+        if self.trick:
+            if player == self.holder:
+                self.end_trick()
+            elif self.num_passes >= self.num_other_players() \
+                    and not is_bomb(cards):
+                self.end_trick()
+
+        self.hands[player] &= ~cards
+        self.trick.append((player, cards))
+        self.holder = player
+        self.num_passes = 0
+
+        if self.wish and cards & model.rank_mask(self.wish):
+            self.wish = None
+
+        if not self.hands[player]:
+            self.finishes.append(player)
+
+        if cards == HOUND:
+            self.end_trick()
+
+    def pass_(self, player):
+        if not self.trick:
+            return
+        if player == self.holder:
+            self.end_trick()
+        else:
+            self.num_passes += 1
+
+    def end_trick(self):
+        points = sum(get_points(cards) for _, cards in self.trick)
+
+        if self.trick[-1][1] == DRAGON:
+            self.dragon_points += points
+        else:
+            self.points[self.holder] += points
+
+        self.trick = []
+        self.holder = None
+        self.num_passes = 0
+
+    def num_other_players(self):
+        return sum(
+                1 for i, hand in enumerate(self.hands)
+                if hand and i != self.holder
+        )
+
+def replay_round(hands, actions):
+    """
+    Yield ``(action, state)`` after each of the given actions.
+
+    *hands* gives the cards each player held after the exchange.  The same
+    `RoundState` object is yielded each time, updated in place, so use
+    `RoundState.copy()` to keep a snapshot.
+    """
+    state = RoundState(hands)
+
+    for action in actions:
+        state.apply(*action)
+        yield action, state
+
+    if state.trick:
+        state.end_trick()
+
+def score_round(state, calls):
+    """
+    Return the score of each team (south/north, east/west) at the end of the
+    given round.  *calls* maps players to `model.CallTypes`.
+    """
+    finishes = state.finishes
+    scores = [0, 0]
+
+    if len(finishes) >= 2 and finishes[0] % 2 == finishes[1] % 2:
+        scores[finishes[0] % 2] = 200
+
+    else:
+        points = list(state.points)
+
+        # The last player gives their tricks to the first player to go out,
+        # and the cards left in their hand to the other team.
+        last, = set(range(4)) - set(finishes[:3])
+        points[finishes[0]] += points[last] + state.dragon_points
+        points[(last + 1) % 4] += get_points(state.hands[last])
+        points[last] = 0
+
+        for i, p in enumerate(points):
+            scores[i % 2] += p
+
+    for i, call in calls.items():
+        bonus = 200 if call == model.CallTypes.grand_tichu else 100
+        scores[i % 2] += bonus if finishes[:1] == [i] else -bonus
+
+    return tuple(scores)
+
+def classify_combo(cards):
+    """
+    Return the `model.ComboTypes` of the given set of cards, or None if they
+    don't make a legal combination.  The phoenix is used as a wild card.
+    """
+    keys = [model.CARDS[i] for i in model.CardMask(cards)]
+    n = len(keys)
+
+    if n == 1:
+        return model.ComboTypes.single
+
+    specials = {special for _, _, special in keys if special}
+    if specials - {model.SpecialTypes.one, model.SpecialTypes.phoenix}:
+        return None
+
+    wild = int(model.SpecialTypes.phoenix in specials)
+    ranks = Counter(rank for _, rank, _ in keys if rank)
+    suits = {suit for suit, _, _ in keys if suit}
+    counts = sorted(ranks.values(), reverse=True)
+
+    if model.SpecialTypes.one in specials:
+        ranks[1] += 1
+
+    # The one can only be played alone or in a straight.
+    if n >= 5 and set(ranks.values()) == {1}:
+        span = max(ranks) - min(ranks) + 1
+        if span == n or (wild and span == n - 1):
+            if not wild and len(suits) == 1 and 1 not in ranks:
+                return model.ComboTypes.straight_flush
+            return model.ComboTypes.straight
+
+    if 1 in ranks:
+        return None
+
+    if n == 2 and (counts == [2] or wild and counts == [1]):
+        return model.ComboTypes.pair
+    if n == 3 and (counts == [3] or wild and counts == [2]):
+        return model.ComboTypes.triple
+    if n == 4 and counts == [4]:
+        return model.ComboTypes.four_of_a_kind
+    if n == 5 and (counts == [3, 2] or wild and counts in ([2, 2], [3, 1])):
+        return model.ComboTypes.full_house
+
+    if n >= 4 and n % 2 == 0 and len(ranks) == n // 2 \
+            and max(ranks) - min(ranks) + 1 == n // 2 \
+            and sum(2 - x for x in counts) == wild and max(counts) == 2:
+        return model.ComboTypes.steps
+
+    return None
+
+def is_bomb(cards):
+    return classify_combo(cards) in BOMBS
+
+def get_points(cards):
+    return sum(
+            points * len(model.CardMask(cards & mask))
+            for mask, points in POINT_MASKS
+    )
+
+def get_cards_rank(cards):
+    rank, = {model.CARDS[i][1] for i in model.CardMask(cards)}
+    return rank
+
+def get_hands_after_exchange(hands, exchanges):
+    """
+    Return the cards each player held after the exchange.
+
+    *hands* gives the cards each player was dealt, and *exchanges* is an
+    iterable of ``(giver, taker, card_index)`` tuples.
+    """
+    hands = list(hands)
+    for giver, taker, i in exchanges:
+        hands[giver] &= ~(1 << i)
+        hands[taker] |= 1 << i
+    return hands
+
+def iter_rounds(session):
+    """
+    Yield ``(round_id, hands, actions, calls)`` for every round in the
+    database, suitable for passing to `replay_round()` and `score_round()`.
+
+    Each table is read in one pass, sorted by round, so the whole database is
+    never in memory at once.
+    """
+    from sqlalchemy.orm import aliased
+    from .model import Hand, Exchange, Action, Call, Seat
+
+    card_ids = model.get_card_ids(session)
+    card_indices = {card_ids[k]: i for i, k in enumerate(model.CARDS)}
+    giver_seat = aliased(Seat)
+    taker_seat = aliased(Seat)
+
+    hands = session.query(Hand.round_id, Seat.seat, Hand.full)\
+            .join(Seat, Hand.seat_id == Seat.id)\
+            .order_by(Hand.round_id)\
+            .yield_per(10000)
+    exchanges = session.query(
+                Exchange.round_id,
+                giver_seat.seat,
+                taker_seat.seat,
+                Exchange.card_id,
+            )\
+            .join(giver_seat, Exchange.giver_id == giver_seat.id)\
+            .join(taker_seat, Exchange.taker_id == taker_seat.id)\
+            .order_by(Exchange.round_id)\
+            .yield_per(10000)
+    actions = session.query(
+                Action.round_id,
+                Seat.seat,
+                Action.action,
+                Action.cards,
+            )\
+            .join(Seat, Action.seat_id == Seat.id)\
+            .order_by(Action.round_id, Action.order)\
+            .yield_per(10000)
+    calls = session.query(Call.round_id, Seat.seat, Call.call)\
+            .join(Seat, Call.seat_id == Seat.id)\
+            .order_by(Call.round_id)\
+            .yield_per(10000)
+
+    exchanges = GroupedByRound(exchanges)
+    actions = GroupedByRound(actions)
+    calls = GroupedByRound(calls)
+
+    for round_id, rows in groupby(hands, key=lambda x: x[0]):
+        dealt = [0, 0, 0, 0]
+        for _, seat, full in rows:
+            dealt[player_index[seat]] = full
+
+        round_exchanges = [
+                (player_index[giver], player_index[taker], card_indices[card])
+                for _, giver, taker, card in exchanges.get(round_id)
+        ]
+        round_actions = [
+                (player_index[seat], action, cards)
+                for _, seat, action, cards in actions.get(round_id)
+        ]
+        round_calls = {
+                player_index[seat]: call
+                for _, seat, call in calls.get(round_id)
+        }
+
+        yield (
+                round_id,
+                get_hands_after_exchange(dealt, round_exchanges),
+                round_actions,
+                round_calls,
+        )
+
+class GroupedByRound:
+    """
+    Get the rows for each round from a query sorted by round id, assuming the
+    rounds are requested in increasing order.
+    """
+
+    def __init__(self, rows):
+        self.groups = groupby(rows, key=lambda x: x[0])
+        self.next = next(self.groups, None)
+
+    def get(self, round_id):
+        while self.next and self.next[0] < round_id:
+            self.next = next(self.groups, None)
+
+        if self.next and self.next[0] == round_id:
+            rows = list(self.next[1])
+            self.next = next(self.groups, None)
+            return rows
+
+        return []
+
+player_index = {
+        model.SeatTypes.south: 0,
+        model.SeatTypes.east: 1,
+        model.SeatTypes.north: 2,
+        model.SeatTypes.west: 3,
+}
+
+HOUND = model.special_mask(model.SpecialTypes.hound)
+DRAGON = model.special_mask(model.SpecialTypes.dragon)
+BOMBS = {model.ComboTypes.four_of_a_kind, model.ComboTypes.straight_flush}
+POINT_MASKS = [
+        (model.rank_mask(5), 5),
+        (model.rank_mask(10), 10),
+        (model.rank_mask(13), 10),
+        (DRAGON, 25),
+        (model.special_mask(model.SpecialTypes.phoenix), -25),
+]
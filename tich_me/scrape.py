@@ -2,60 +2,432 @@
 
 import requests
 import sqlalchemy
+from itertools import chain
+from collections import Counter
 from bs4 import BeautifulSoup
 from datetime import datetime
-from . import model
+from . import model, archive, replay
+from .stats import STATS
 
 BSW_URL = 'http://tichulog.brettspielwelt.de'
 
-def scrape_bsw_month(year, month, progress_ui):
-    if year < 2007:
+# Timeouts are (connect, read) in seconds.  Retries back off exponentially: 
+# the n-th retry waits ``HTTP_BACKOFF * 2**(n-1)`` seconds.
+HTTP_TIMEOUT = 10, 60
+HTTP_RETRIES = 5
+HTTP_BACKOFF = 0.5
+
+# Committing is the slowest part of recording a game (it waits for the disk), 
+# so downloaded games are committed in batches.
+COMMIT_EVERY = 100
+
+def scrape_bsw_month(year, month, progress_ui, num_workers=1, **kwargs):
+    scrape_bsw_months([(year, month)], progress_ui, num_workers, **kwargs)
+
+def scrape_bsw_months(months, progress_ui, num_workers=1,
+        commit_every=COMMIT_EVERY, synchronous='NORMAL'):
+    """
+    Download and record every game played in the given ``(year, month)`` 
+    tuples.
+
+    The indices for all the months are downloaded first (concurrently), so 
+    that progress can be reported for all the games at once.  The games 
+    themselves are then downloaded by a single pool of *num_workers* threads.  
+    All the database access happens in this thread, so there is only ever one 
+    writer.
+
+    Games are committed every *commit_every* games, and each is recorded in 
+    its own savepoint, so a game that can't be recorded doesn't affect any of 
+    the others.  *synchronous* is the SQLite synchronization level to use; see 
+    `model.INGEST_PRAGMAS`.
+    """
+    months = list(months)
+    if any(year < 2007 for year, month in months):
         raise NoDataBefore2007()
 
-    index_url = f'{BSW_URL}/{year}{month:02}/'
-    progress_ui.download_index(index_url)
+    STATS.reset()
 
-    index_request = requests.get(index_url)
-    index_doc = BeautifulSoup(index_request.text, features='lxml')
-    game_links = index_doc.find_all('a')
+    pragmas = model.get_ingest_pragmas(synchronous)
+    http = init_http(num_workers)
+    session = model.init_db(pragmas)
+    logs = archive.init_archive(pragmas)
 
-    session = model.init_db()
+    index_urls = [get_bsw_index_url(*x) for x in months]
+    games = {}
 
-    for i, a in enumerate(game_links):
+    for index_url, future in fetch_bsw_indices(http, index_urls, num_workers):
+        progress_ui.download_index(index_url)
+
+        try:
+            games.update(future.result())
+        except Exception as err:
+            STATS.count('errors')
+            progress_ui.error(index_url, err)
+
+    recorded = model.query_recorded_urls(session, games)
+    games = {k: v for k, v in games.items() if k not in recorded}
+
+    # Only download games that aren't already in the archive.  Downloads 
+    # happen in worker threads, but all the database access happens here in 
+    # the main thread.
+    archived = archive.query_archived_urls(logs, games)
+    archived_urls = [x for x in games if x in archived]
+    download_urls = [x for x in games if x not in archived]
+
+    downloads = chain(
+            fetch_bsw_games(http, download_urls, num_workers),
+            load_archived_games(logs, archived_urls),
+    )
+
+    try:
+        for i, (game_url, download) in enumerate(downloads):
+            progress_ui.download_game(game_url, i, len(games))
+
+            try:
+                game_txt = download.result()
+
+                # Archive the log before trying to parse it, so that games 
+                # which can't be parsed yet can be reparsed later.
+                with STATS.timer('archive'), logs.begin_nested():
+                    archive.archive_log(
+                            logs, game_txt, game_url, games[game_url])
+
+                with session.begin_nested():
+                    record_bsw_game(
+                            session, game_txt, game_url, games[game_url])
+
+                STATS.count('games recorded')
+
+            except Exception as err:
+                STATS.count('errors')
+                progress_ui.error(game_url, err)
+
+            if (i + 1) % commit_every == 0:
+                commit_bsw_games(session, logs)
+
+    finally:
+        # Keep the games recorded so far, even if the scrape is interrupted.
+        commit_bsw_games(session, logs)
+
+    progress_ui.finish(STATS)
+
+def commit_bsw_games(session, logs):
+    # Commit the archive first, so that every game in the database is also in 
+    # the archive, even if we crash in between.
+    with STATS.timer('commit'):
+        logs.commit()
+        session.commit()
+
+def reparse_archive(progress_ui, num_workers=1, batch_size=1000,
+        synchronous='NORMAL'):
+    """
+    Record every game in the archive, without accessing the network.
+
+    The logs are parsed by a pool of *num_workers* processes, while this 
+    process records the parsed games in transactions of *batch_size* games.
+    """
+    session = model.init_db(model.get_ingest_pragmas(synchronous))
+    logs = archive.init_archive()
+    n = archive.count_archived_logs(logs)
+    STATS.reset()
+
+    parsed_games = parse_bsw_games(
+            archive.iter_archived_logs(logs),
+            num_workers,
+    )
+    batch = []
+
+    for i, (game_url, game, err) in enumerate(parsed_games):
+        progress_ui.parse_game(game_url, i, n)
+
+        if err:
+            STATS.count('errors')
+            progress_ui.error(game_url, err)
+            continue
+
+        batch.append(game)
+
+        if len(batch) >= batch_size:
+            record_bsw_batch(session, batch, progress_ui)
+            batch = []
+
+    record_bsw_batch(session, batch, progress_ui)
+    progress_ui.finish(STATS)
+
+def get_bsw_index_url(year, month):
+    return f'{BSW_URL}/{year}{month:02}/'
+
+def scrape_bsw_index(http, index_url):
+    with STATS.timer('download index'):
+        index_request = http.get(index_url)
+        index_request.raise_for_status()
+        STATS.count('bytes fetched', len(index_request.content))
+
+    with STATS.timer('parse index'):
+        index_doc = BeautifulSoup(index_request.text, features='lxml')
+        links = index_doc.find_all('a')
+
+    for a in links:
         game_url = BSW_URL + a.get('href')
         game_date = datetime.strptime(a.text[:16], '%Y-%m-%d %H:%M')
-        progress_ui.download_game(game_url, i, len(game_links))
+        yield game_url, game_date
 
-        if model.is_game_recorded(session, game_url):
-            continue
+def scrape_bsw_game(session, game_url, game_date=None, http=None):
+    # Parse the game as it's being downloaded, rather than waiting for the 
+    # whole log.
+    game_lines = stream_bsw_game(http or init_http(), game_url)
 
+    game = parse_game_stream(game_lines)
+    game['url'] = game_url
+    game['date'] = game_date
+
+    record_games_bulk(session, [game])
+
+def fetch_bsw_game(http, game_url):
+    with STATS.timer('download game'):
+        game_request = http.get(game_url)
+        game_request.raise_for_status()
+        STATS.count('bytes fetched', len(game_request.content))
+        return game_request.text
+
+def stream_bsw_game(http, game_url):
+    with http.get(game_url, stream=True) as game_request:
+        game_request.raise_for_status()
+
+        # Without an encoding, requests would yield bytes rather than str.
+        if game_request.encoding is None:
+            game_request.encoding = 'utf-8'
+
+        yield from game_request.iter_lines(decode_unicode=True)
+
+def fetch_bsw_games(http, game_urls, num_workers=1):
+    """
+    Download the given games using a pool of worker threads.
+
+    Yield ``(url, future)`` pairs in the same order as the given URLs.  Calling 
+    ``future.result()`` returns the text of the game log, or raises whatever 
+    exception prevented it from being downloaded.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+
+    with ThreadPoolExecutor(num_workers) as executor:
+        yield from submit_bounded(
+                executor,
+                partial(fetch_bsw_game, http),
+                game_urls,
+                2 * num_workers,
+        )
+
+def fetch_bsw_index(http, index_url):
+    return dict(scrape_bsw_index(http, index_url))
+
+def fetch_bsw_indices(http, index_urls, num_workers=1):
+    """
+    Download the given month indices using a pool of worker threads.
+
+    Yield ``(url, future)`` pairs like `fetch_bsw_games()`.  Calling 
+    ``future.result()`` returns a dictionary mapping the URL of each game in 
+    the month to the date it was played.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+
+    with ThreadPoolExecutor(num_workers) as executor:
+        yield from submit_bounded(
+                executor,
+                partial(fetch_bsw_index, http),
+                index_urls,
+                2 * num_workers,
+        )
+
+def parse_bsw_games(logs, num_workers=1, chunk_size=100):
+    """
+    Parse the given ``(url, date, text)`` logs using a pool of worker 
+    processes.
+
+    Yield ``(url, game, error)`` tuples in the same order as the given logs.  
+    If the log was parsed successfully, *error* is None.  Otherwise *game* is 
+    None.  Logs are sent to the workers in chunks, to amortize the cost of 
+    communicating between processes.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import islice
+
+    logs = iter(logs)
+    chunks = iter(lambda: list(islice(logs, chunk_size)), [])
+
+    # Don't bother starting any processes if there's only one worker.
+    if num_workers == 1:
+        for chunk in chunks:
+            yield from parse_bsw_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(num_workers) as executor:
+        futures = submit_bounded(
+                executor,
+                parse_bsw_chunk,
+                chunks,
+                2 * num_workers,
+        )
+        for chunk, future in futures:
+            yield from future.result()
+
+def parse_bsw_chunk(logs):
+    parsed_games = []
+
+    for game_url, game_date, game_txt in logs:
         try:
-            scrape_bsw_game(session, game_url, game_date)
-            session.commit()
+            game = parse_game(game_txt)
+            game['url'] = game_url
+            game['date'] = game_date
+            parsed_games.append((game_url, game, None))
+
         except Exception as err:
-            session.rollback()
-            progress_ui.error(game_url, err)
+            parsed_games.append((game_url, None, err))
+
+    return parsed_games
+
+def submit_bounded(executor, f, items, max_pending):
+    """
+    Submit ``f(item)`` to the given executor for each item, and yield 
+    ``(item, future)`` pairs in the same order as the items.
+
+    No more than *max_pending* items are allowed to get ahead of the consumer, 
+    so memory use doesn't grow with the number of items.
+    """
+    from collections import deque
+
+    pending = deque()
+
+    try:
+        for item in items:
+            pending.append((item, executor.submit(f, item)))
+
+            if len(pending) >= max_pending:
+                yield pending.popleft()
+
+        while pending:
+            yield pending.popleft()
+
+    finally:
+        for item, future in pending:
+            future.cancel()
+
+def load_archived_games(logs, game_urls):
+    """
+    Yield ``(url, future)`` pairs like `fetch_bsw_games()`, but load the logs 
+    from the archive rather than downloading them.
+    """
+    from concurrent.futures import Future
+
+    for game_url in game_urls:
+        future = Future()
+        future.set_result(archive.load_archived_log(logs, game_url))
+        yield game_url, future
+
+def init_http(pool_size=1, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES,
+        backoff=HTTP_BACKOFF):
+    """
+    Create an HTTP session that keeps connections to BSW alive between 
+    requests, gives up on stalled connections, and retries transient errors.
+
+    A single session can be shared by all the download threads; *pool_size* 
+    should be at least the number of threads, otherwise connections will be 
+    discarded rather than reused.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+    )
 
-def scrape_bsw_game(session, game_url, game_date=None):
-    game_request = requests.get(game_url)
-    game_txt = game_request.text
+    http = HttpSession(timeout)
+    http.mount('http://', adapter)
+    http.mount('https://', adapter)
+    return http
+
+def record_bsw_batch(session, games, progress_ui):
+    """
+    Record the given (parsed) games in a single transaction.  If that fails, 
+    record the games one at a time, so that only the games that actually 
+    cause errors are lost.
+    """
+    if not games:
+        return
+
+    try:
+        record_games_bulk(session, games)
+
+        with STATS.timer('commit'):
+            session.commit()
+
+        STATS.count('games recorded', len(games))
 
+    except Exception as err:
+        session.rollback()
+
+        if len(games) == 1:
+            STATS.count('errors')
+            progress_ui.error(games[0]['url'], err)
+        else:
+            for game in games:
+                record_bsw_batch(session, [game], progress_ui)
+
+def record_bsw_game(session, game_txt, game_url, game_date=None):
     game = parse_game(game_txt)
     game['url'] = game_url
     game['date'] = game_date
 
-    record_game(session, game)
+    record_games_bulk(session, [game])
 
 
 def parse_game(tch):
-    mode = None
-    lines = tch.split('\n')
+    with STATS.timer('parse'):
+        game = parse_game_stream(tch.split('\n'))
+        game['rounds'] = list(game['rounds'])
+
+    STATS.count('games parsed')
+    return game
+
+def parse_game_stream(tch_lines):
+    """
+    Parse a game from any iterable of lines (e.g. a file object or an HTTP 
+    response), without reading the whole log into memory.
+
+    The returned game has the same format as the one returned by 
+    `parse_game()`, except that "rounds" is a generator that reads lines only 
+    as far as necessary to yield the next round.  Only the first few lines 
+    (i.e. the players) are read before this function returns.
+    """
+    from itertools import chain, islice
+
+    tch_lines = (x.rstrip('\r\n') for x in tch_lines)
+    header = list(islice(tch_lines, 5))
+    players = parse_players(header)
+
+    game = {
+            'url': None,
+            'date': None,
+            'players': players,
+            'rounds': parse_rounds(chain(header, tch_lines), players),
+    }
+    return game
 
-    rounds = []
-    players = parse_players(lines)
+def parse_rounds(tch_lines, players):
+    mode = None
     player_ids = {v: k for k, v in players.items()}
 
-    for line in lines:
+    for line in tch_lines:
         if not line:
             continue
 
@@ -82,6 +454,7 @@ def parse_game(tch):
             mode = 'actions'
             wish = None
             plays = {i: set() for i in players}
+            actions = []
             finishes = []
 
         if line.startswith('Ergebnis:'):
@@ -95,9 +468,10 @@ def parse_game(tch):
                     'calls': calls,
                     'scores': (int(tokens[1]), int(tokens[3])),
                     'wish': wish,
+                    'actions': actions,
                     'finishes': finishes
             }
-            rounds.append(round)
+            yield round
 
         # Parse game data
         if mode == 'first deal':
@@ -132,26 +506,28 @@ def parse_game(tch):
             if tokens[0] == 'Tichu:':
                 player = parse_player(tokens[1])
                 calls[player] = model.CallTypes.tichu_after
+                actions.append((player, model.ActionTypes.tichu, ()))
 
             elif tokens[0].startswith('Wunsch'):
                 wish = (player, tokens[0].split(':')[-1])
+                actions.append((player, model.ActionTypes.wish, (wish[1],)))
+
+            elif line.startswith('Drache an:'):
+                taker = parse_player(tokens[2])
+                actions.append((taker, model.ActionTypes.give_dragon, ()))
 
             elif tokens[0].startswith('('):
                 player = parse_player(tokens[0])
                 play = tokens[1]
 
                 if play != 'passt.':
-                    plays[player].update(tokens[1:])
+                    cards = tuple(tokens[1:])
+                    actions.append((player, model.ActionTypes.play, cards))
+                    plays[player].update(cards)
                     if len(plays[player]) == 14:
                         finishes.append(player)
-
-    game = {
-            'url': None,
-            'date': None,
-            'players': players,
-            'rounds': rounds,
-    }
-    return game
+                else:
+                    actions.append((player, model.ActionTypes.pass_, ()))
 
 def parse_players(tch_lines):
     players = {}
@@ -176,17 +552,21 @@ def record_game(session, game_dict):
     teams, seats = record_players(session, game, game_dict['players'])
     cards = load_cards(session)
 
+    # The rounds may be a generator (see `parse_game_stream()`), so count the 
+    # player statistics as each round is recorded.
+    stats = count_player_stats(game_dict['players'])
+
     for i, round_dict in enumerate(game_dict['rounds']):
         record_round(session, game, teams, seats, cards, round_dict, i)
+        count_round_stats(stats, game_dict['players'], round_dict)
 
-def record_players(session, game, players_dict):
-    seat_order = {
-            0: model.SeatTypes.south,
-            1: model.SeatTypes.east,
-            2: model.SeatTypes.north,
-            3: model.SeatTypes.west,
-    }
+    session.flush()
+    model.update_player_stats(session, {
+            seats[i].player.id: stats[name]
+            for i, name in game_dict['players'].items()
+    })
 
+def record_players(session, game, players_dict):
     # Create the teams for this game.
     teams = [
             model.Team(game=game),
@@ -219,6 +599,17 @@ def record_round(session, game, teams, seats, cards, round_dict, round_num):
     record_deal(session, round, seats, cards,
             round_dict['second_deals'], model.DealTypes.second_6)
 
+    # Hands
+    for i, seat in seats.items():
+        first_8, full = get_hand_masks(round_dict, i)
+        hand = model.Hand(
+                round=round,
+                seat=seat,
+                first_8=first_8,
+                full=full,
+        )
+        session.add(hand)
+
     # Exchanges
     for (i, j), x in round_dict['exchanges'].items():
         exchange = model.Exchange(
@@ -248,6 +639,19 @@ def record_round(session, game, teams, seats, cards, round_dict, round_num):
         )
         session.add(wish)
 
+    # Actions:
+    for order, (i, action_type, cards, combo) in \
+            enumerate(get_actions(round_dict)):
+        action = model.Action(
+                round=round,
+                order=order,
+                seat=seats[i],
+                action=action_type,
+                cards=cards,
+                combo=combo,
+        )
+        session.add(action)
+
     # Finishes:
     for order, i in enumerate(round_dict['finishes']):
         finish = model.Finish(
@@ -264,6 +668,7 @@ def record_round(session, game, teams, seats, cards, round_dict, round_num):
                 team=teams[i],
                 score=score,
         )
+        session.add(score)
 
 def record_deal(session, round, seats, cards, deal_dict, deal_type):
     for i, deal in deal_dict.items():
@@ -278,25 +683,276 @@ def record_deal(session, round, seats, cards, deal_dict, deal_type):
         }
         session.add_all(hand)
 
+def record_games_bulk(session, game_dicts):
+    """
+    Record the given games using a few multi-row INSERT statements, rather 
+    than one ORM object per row.
+
+    The resulting tables are the same as if each game had been recorded by 
+    `record_game()`, which is kept as the reference implementation.  Note that 
+    nothing else should be writing to the database at the same time, see 
+    `model.BulkInsert`.
+    """
+    bulk = model.BulkInsert(session)
+    cards = load_card_ids(session)
+
+    # Skip games that are already recorded, including any duplicates within 
+    # the given games.
+    game_dicts = list(game_dicts)
+    urls = model.query_recorded_urls(session, [x['url'] for x in game_dicts])
+    new_game_dicts = []
+
+    for game_dict in game_dicts:
+        url = game_dict['url']
+        if url in urls:
+            continue
+        if url is not None:
+            urls.add(url)
+        new_game_dicts.append(game_dict)
+
+    players = model.get_or_create_player_ids(
+            session, 
+            [x for game in new_game_dicts for x in game['players'].values()],
+            bulk,
+    )
+
+    stats = {}
+
+    with STATS.timer('build rows'):
+        for game_dict in new_game_dicts:
+            game_stats = bulk_record_game(bulk, players, cards, game_dict)
+
+            for name, counts in game_stats.items():
+                stats.setdefault(players[name], Counter()).update(counts)
+
+    bulk.execute()
+    model.update_player_stats(session, stats)
+
+def bulk_record_game(bulk, players, cards, game_dict):
+    game = bulk.add(
+            model.Game,
+            url=game_dict['url'],
+            date=game_dict['date'],
+    )
+    teams = [
+            bulk.add(model.Team, game_id=game),
+            bulk.add(model.Team, game_id=game),
+    ]
+
+    team_map = {}
+    seat_map = {}
+
+    for i, name in game_dict['players'].items():
+        team_map[i] = teams[i%2]
+        bulk.add(model.teammate, player_id=players[name], team_id=team_map[i])
+
+        seat_map[i] = bulk.add(
+                model.Seat,
+                game_id=game,
+                player_id=players[name],
+                seat=seat_order[i],
+        )
+
+    stats = count_player_stats(game_dict['players'])
+
+    for i, round_dict in enumerate(game_dict['rounds']):
+        bulk_record_round(bulk, game, team_map, seat_map, cards, round_dict, i)
+        count_round_stats(stats, game_dict['players'], round_dict)
+
+    return stats
+
+def bulk_record_round(bulk, game, teams, seats, cards, round_dict, round_num):
+    round = bulk.add(model.Round, game_id=game, order=round_num)
+
+    # Deals
+    deal_groups = [
+            (round_dict['first_deals'], model.DealTypes.first_8),
+            (round_dict['second_deals'], model.DealTypes.second_6),
+    ]
+    for deal_dict, deal_type in deal_groups:
+        for i, deal in deal_dict.items():
+            for x in deal:
+                bulk.add(
+                        model.Deal,
+                        round_id=round,
+                        seat_id=seats[i],
+                        card_id=cards[x],
+                        group=deal_type,
+                )
+
+    # Hands
+    for i, seat in seats.items():
+        first_8, full = get_hand_masks(round_dict, i)
+        bulk.add(
+                model.Hand,
+                round_id=round,
+                seat_id=seat,
+                first_8=first_8,
+                full=full,
+        )
+
+    # Exchanges
+    for (i, j), x in round_dict['exchanges'].items():
+        bulk.add(
+                model.Exchange,
+                round_id=round,
+                giver_id=seats[i],
+                taker_id=seats[j],
+                card_id=cards[x],
+        )
+
+    # Tichu calls
+    for i, call_type in round_dict['calls'].items():
+        bulk.add(model.Call, round_id=round, seat_id=seats[i], call=call_type)
+
+    # Wishes
+    if round_dict['wish']:
+        i, rank = round_dict['wish']
+        bulk.add(
+                model.Wish,
+                round_id=round,
+                seat_id=seats[i],
+                rank=rank_map[rank],
+        )
+
+    # Actions
+    for order, (i, action_type, cards, combo) in \
+            enumerate(get_actions(round_dict)):
+        bulk.add(
+                model.Action,
+                round_id=round,
+                order=order,
+                seat_id=seats[i],
+                action=action_type,
+                cards=cards,
+                combo=combo,
+        )
+
+    # Finishes
+    for order, i in enumerate(round_dict['finishes']):
+        bulk.add(model.Finish, round_id=round, seat_id=seats[i], order=order)
+
+    # Scores
+    for i, score in enumerate(round_dict['scores']):
+        bulk.add(model.Score, round_id=round, team_id=teams[i], score=score)
+
+def count_player_stats(players):
+    """
+    Return a dictionary mapping the name of each of the given players to a 
+    `Counter` of how much a game adds to their `model.PlayerStats` totals, not 
+    counting any of its rounds.  Use `count_round_stats()` to add the rounds.
+    """
+    return {name: Counter(num_games=1) for name in players.values()}
+
+def count_round_stats(stats, players, round_dict):
+    """
+    Add the given round to the statistics from `count_player_stats()`.
+    """
+    tichus = model.CallTypes.tichu_before, model.CallTypes.tichu_after
+    grand_tichus = model.CallTypes.grand_tichu,
+
+    calls = round_dict['calls']
+    finishes = round_dict['finishes']
+    scores = round_dict['scores']
+
+    # `parse_rounds()` lists the players who never went out after the ones who 
+    # did.  That's only a problem after a double victory, where the order of 
+    # the two losers is arbitrary, so their positions aren't counted.
+    known_finishes = finishes
+    if len(finishes) >= 2 and finishes[0] % 2 == finishes[1] % 2:
+        known_finishes = finishes[:2]
+
+    for i, name in players.items():
+        counts = stats[name]
+        success = bool(finishes) and finishes[0] == i
+
+        counts['num_rounds'] += 1
+
+        if calls.get(i) in tichus:
+            counts['num_tichus'] += 1
+            counts['num_tichu_successes'] += success
+
+        if calls.get(i) in grand_tichus:
+            counts['num_grand_tichus'] += 1
+            counts['num_grand_tichu_successes'] += success
+
+        if i in known_finishes:
+            counts['num_finishes'] += 1
+            counts['total_finish_order'] += finishes.index(i)
+
+        if scores:
+            counts['total_score_diff'] += scores[i % 2] - scores[1 - i % 2]
+
+def get_hand_masks(round_dict, i):
+    """
+    Return `model.CardMask` integers for the first 8 cards and the full hand 
+    dealt to the given player.
+    """
+    first_8 = model.CardMask.from_indices(
+            card_indices[x] for x in round_dict['first_deals'].get(i, ()))
+    second_6 = model.CardMask.from_indices(
+            card_indices[x] for x in round_dict['second_deals'].get(i, ()))
+
+    return first_8, first_8 | second_6
+
+def get_actions(round_dict):
+    """
+    Return ``(player, action_type, cards, combo)`` tuples for each action in 
+    the given round, with the cards encoded as `model.CardMask` integers.  See 
+    `model.Action`.
+    """
+    actions = []
+
+    for i, action_type, tokens in round_dict.get('actions', ()):
+        combo = None
+
+        if action_type == model.ActionTypes.wish:
+            cards = model.rank_mask(rank_map[tokens[0]])
+        else:
+            cards = model.CardMask.from_indices(card_indices[x] for x in tokens)
+
+        if action_type == model.ActionTypes.play:
+            combo = replay.classify_combo(cards)
+
+        actions.append((i, action_type, int(cards), combo))
+
+    return actions
+
 def load_cards(session):
+    existing = {
+            (x.suit, x.rank, x.special): x
+            for x in session.query(model.Card)
+    }
     cards = {}
 
-    for suit in suit_map:
-        for rank in rank_map:
-            cards[suit+rank] = model.get_or_create(
-                    session, model.Card,
-                    suit=suit_map[suit],
-                    rank=rank_map[rank],
-            )
-
-    for special in special_map:
-        cards[special] = model.get_or_create(
-                session, model.Card,
-                special=special_map[special],
-        )
+    for code, key in card_keys.items():
+        try:
+            cards[code] = existing[key]
+        except KeyError:
+            suit, rank, special = key
+            cards[code] = model.Card(suit=suit, rank=rank, special=special)
+            session.add(cards[code])
 
     return cards
 
+def load_card_ids(session):
+    card_ids = model.get_card_ids(session)
+
+    # The card table should've been filled in when the schema was created, but 
+    # fall back on creating any missing cards just in case.
+    if len(card_ids) < len(card_keys):
+        cards = load_cards(session)
+        session.flush()
+        return {k: v.id for k, v in cards.items()}
+
+    return {k: card_ids[v] for k, v in card_keys.items()}
+
+seat_order = {
+        0: model.SeatTypes.south,
+        1: model.SeatTypes.east,
+        2: model.SeatTypes.north,
+        3: model.SeatTypes.west,
+}
 suit_map = {
         'R': model.SuitTypes.red,
         'G': model.SuitTypes.green,
@@ -324,6 +980,32 @@ special_map = {
         'Ph': model.SpecialTypes.phoenix,
         'Dr': model.SpecialTypes.dragon,
 }
+card_keys = {
+        **{
+            suit + rank: (suit_map[suit], rank_map[rank], None)
+            for suit in suit_map
+            for rank in rank_map
+        },
+        **{
+            special: (None, None, special_map[special])
+            for special in special_map
+        },
+}
+card_indices = {k: model.CARD_INDICES[v] for k, v in card_keys.items()}
+
+class HttpSession(requests.Session):
+    """
+    A requests session with a default timeout.  Without a timeout, a single 
+    stalled socket would hang the whole scrape.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(*args, **kwargs)
 
 class NoDataBefore2007(ValueError):
 
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+Estimate how often each rank would be passed by chance, by simulating
+millions of random deals in which every player passes random cards.
+
+These baseline probabilities are what the observed passing probabilities (see
+`analysis.count_exchanges()`) should be compared to.  They aren't simply 4/56
+for each rank, because players can't be passed cards that they already hold.
+This matters when the players are grouped by what they called: e.g. players
+who call Grand Tichu usually hold the dragon, so they are rarely passed it no
+matter what anyone intends.  To account for this, the taker in each simulated
+deal is dealt a hand actually held by a player who made the call in question.
+"""
+
+import numpy as np
+import pandas as pd
+from . import model
+from .analysis import card_ranks, NUM_RANKS
+from .hands import NUM_CARDS, unpack_hands
+
+GIVERS = 'right', 'partner', 'left'
+BATCH_SIZE = 100000
+
+def simulate_exchanges(num_deals, taker_hands=None, seed=0,
+        batch_size=BATCH_SIZE):
+    """
+    Simulate passing random cards in the given number of random deals.
+
+    Return a data frame with "giver", "rank", "count", and "prob" columns, like
+    `analysis.count_exchanges()` (but without "call").  If *taker_hands* is
+    given, it should be an array of hand masks (see `hands.load_hands()`).
+    Each deal will give one of these hands (chosen at random) to the taker,
+    and shuffle only the remaining 42 cards.
+    """
+    rng = np.random.default_rng(seed)
+    counts = np.zeros((len(GIVERS), NUM_RANKS + 1), dtype=np.int64)
+
+    if taker_hands is not None:
+        taker_hands = np.asarray(taker_hands, dtype=np.uint64)
+
+    for i in range(0, num_deals, batch_size):
+        n = min(batch_size, num_deals - i)
+        keys = rng.random((n, NUM_CARDS))
+
+        # Sort the cards held by the taker after all the others, so they can't
+        # be passed.
+        if taker_hands is not None:
+            j = rng.integers(len(taker_hands), size=n)
+            keys[unpack_hands(taker_hands[j])] = 2
+
+        # Each giver passes a random card from a random hand of 14 cards not
+        # held by the taker.  That's the same as each giver passing a
+        # different one of those 42 cards, all chosen at random, so there's no
+        # need to actually deal the other hands.
+        passed = np.argpartition(keys, len(GIVERS), axis=1)[:, :len(GIVERS)]
+        ranks = card_ranks[passed]
+
+        for k in range(len(GIVERS)):
+            counts[k] += np.bincount(ranks[:, k], minlength=NUM_RANKS + 1)
+
+    return pd.DataFrame({
+        'giver': np.repeat(GIVERS, NUM_RANKS),
+        'rank': np.tile(np.arange(1, NUM_RANKS + 1), len(GIVERS)),
+        'count': counts[:, 1:].ravel(),
+        'prob': counts[:, 1:].ravel() / num_deals,
+    })
+
+def simulate_exchanges_by_call(taker_hands, num_deals, seed=0):
+    """
+    Simulate passing random cards to players who made each kind of call.
+
+    *taker_hands* should be a data frame with "call" and "hand" columns, e.g.
+    from `load_taker_hands()`.  Return a data frame with "call", "giver",
+    "rank", "count", and "prob" columns, with *num_deals* deals for each call.
+    """
+    dfs = []
+
+    for i, (call, group) in enumerate(taker_hands.groupby('call')):
+        df = simulate_exchanges(num_deals, group['hand'], seed=(seed, i))
+        df.insert(0, 'call', call)
+        dfs.append(df)
+
+    return pd.concat(dfs, ignore_index=True)
+
+def load_taker_hands(session):
+    """
+    Return a data frame with the "call" (grouped the same way as in
+    `analysis.query_exchange_counts()`) and the dealt "hand" of every player
+    in the database.
+    """
+    from sqlalchemy import and_
+    from .model import Hand, Call
+
+    q = session.query(Call.call, Hand.full)\
+            .select_from(Hand)\
+            .outerjoin(Call, and_(
+                Hand.round_id == Call.round_id,
+                Hand.seat_id == Call.seat_id,
+            ))
+
+    df = pd.DataFrame(q.all(), columns=['call', 'hand'])
+    return pd.DataFrame({
+        'call': df['call'].map(lambda x: call_names.get(x, 'no_call')),
+        'hand': df['hand'].astype('uint64'),
+    })
+
+def load_taker_hands_arrow(data_dir):
+    """
+    Return the same data frame as `load_taker_hands()`, but from the files
+    written by `export.export_db()` rather than from the database.
+    """
+    from .analysis import load_arrow
+    from .hands import hands_from_deals
+
+    hands = hands_from_deals(load_arrow(data_dir, 'deals'))
+    calls = load_arrow(data_dir, 'calls')
+
+    df = hands.merge(
+            calls[['round_id', 'seat', 'call']],
+            how='left',
+            on=['round_id', 'seat'],
+    )
+    names = {k.value: v for k, v in call_names.items()}
+
+    return pd.DataFrame({
+        'call': df['call'].map(names).fillna('no_call'),
+        'hand': df['hand'].astype('uint64'),
+    })
+
+# Players who call Tichu after the pass are lumped in with players who don't
+# call anything, as in `analysis.query_exchange_counts()`.
+call_names = {
+        model.CallTypes.grand_tichu: 'grand_tichu',
+        model.CallTypes.tichu_before: 'tichu_before',
+}
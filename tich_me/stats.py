@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""
+Lightweight counters and timers for the stages of downloading, parsing, and
+recording games.
+
+The stages record themselves in the global `STATS` object, e.g.::
+
+    with STATS.timer('parse'):
+        ...
+    STATS.count('bytes fetched', len(data))
+
+This is cheap enough to leave on all the time (a couple of calls to
+`time.perf_counter()` per stage per game).  The download and reparse commands
+pass `STATS` to ``progress_ui.finish()`` at the end of the run, so it can be
+summarized.  Note that work done in other processes (i.e. parsing, when
+reparsing with more than one worker) isn't recorded.
+"""
+
+import time
+from collections import Counter
+from contextlib import contextmanager
+from threading import Lock
+
+class Stats:
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.start = time.perf_counter()
+            self.counts = Counter()
+            self.times = Counter()
+            self.calls = Counter()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counts[name] += n
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Add the time spent in the context to the total for the given stage.
+        Stages can be timed from multiple threads at once, in which case the
+        total can exceed the elapsed time.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.times[name] += elapsed
+                self.calls[name] += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def rate(self, name):
+        """
+        Return the number of the given thing counted per second of elapsed
+        time, e.g. ``rate('games recorded')``.
+        """
+        return self.counts[name] / max(self.elapsed, 1e-9)
+
+    def summarize(self):
+        """
+        Return a multi-line string describing the time spent in each stage and
+        the final value of each counter.
+        """
+        elapsed = self.elapsed
+        lines = [f"Elapsed: {elapsed:.1f}s"]
+
+        if self.times:
+            lines += ["", f"{'Stage':24s} {'calls':>8s} {'total':>9s} {'%':>6s}"]
+            for name, t in self.times.most_common():
+                lines.append(
+                        f"{name:24s} {self.calls[name]:8d} {t:8.2f}s "
+                        f"{100 * t / elapsed:5.1f}%"
+                )
+
+        if self.counts:
+            lines += ["", f"{'Counter':24s} {'total':>12s} {'per sec':>10s}"]
+            for name, n in sorted(self.counts.items()):
+                lines.append(f"{name:24s} {n:12d} {n / elapsed:10.1f}")
+
+        return '\n'.join(lines)
+
+STATS = Stats()
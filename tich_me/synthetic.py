@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+"""
+Generate random game logs in the same format as BrettSpielWelt, for testing
+and benchmarking.
+
+The games are played by simple bots: they lead their lowest single, pair, or
+triple, follow with the lowest combination that wins the trick (if they feel
+like it), never bomb, and honor wishes for singles.  The play is therefore not
+very realistic, but every log has random deals, exchanges, tichu calls,
+wishes, dragon gifts and scores, and can be parsed and replayed like a real
+one.  The scores are calculated by `replay.score_round()`.
+"""
+
+import random
+from collections import Counter
+from . import model, replay
+from .scrape import card_indices
+
+def generate_logs(num_games, seed=0, num_players=1000):
+    """
+    Yield the text of *num_games* random game logs.  The players are drawn
+    from a pool of *num_players* names.
+    """
+    rng = random.Random(seed)
+    names = [f'player{i}' for i in range(num_players)]
+
+    for i in range(num_games):
+        yield generate_game(rng, rng.sample(names, 4))
+
+def generate_game(rng, names, max_score=1000, max_rounds=20):
+    rounds = []
+    scores = [0, 0]
+
+    while max(scores) < max_score and len(rounds) < max_rounds:
+        round_lines, round_scores = generate_round(rng, names)
+        rounds.append(round_lines)
+        scores = [a + b for a, b in zip(scores, round_scores)]
+
+    return '\n'.join(x for round_lines in rounds for x in round_lines) + '\n'
+
+def generate_round(rng, names):
+    players = [f'({i}){name}' for i, name in enumerate(names)]
+    deck = list(range(len(model.CARDS)))
+    rng.shuffle(deck)
+    dealt = [deck[i::4] for i in range(4)]
+    calls = {}
+    lines = []
+
+    lines.append('---------------Gr.Tichukarten------------------')
+    for i in range(4):
+        lines.append(f'{players[i]} {format_cards(dealt[i][:8])} ')
+
+    lines.append('---------------Startkarten------------------')
+    for i in range(4):
+        lines.append(f'{players[i]} {format_cards(dealt[i])} ')
+
+    for i in range(4):
+        if rng.random() < 0.05:
+            calls[i] = model.CallTypes.grand_tichu
+            lines.append(f'Grosses Tichu: {players[i]}')
+        elif rng.random() < 0.05:
+            calls[i] = model.CallTypes.tichu_before
+            lines.append(f'Tichu: {players[i]}')
+
+    # Exchange
+    lines.append('Schupfen:')
+    hands = [set(x) for x in dealt]
+    exchanges = []
+
+    for i in range(4):
+        gifts = rng.sample(sorted(hands[i]), 3)
+        exchanges += [(i, (i + j + 1) % 4, x) for j, x in enumerate(gifts)]
+        lines.append(f'{players[i]} gibt: ' + ''.join(
+            f'{names[(i + j + 1) % 4]}: {format_cards([x])} - '
+            for j, x in enumerate(gifts)
+        ))
+
+    for giver, taker, x in exchanges:
+        hands[giver].remove(x)
+        hands[taker].add(x)
+
+    bombers = [
+            players[i] for i in range(4)
+            if model.CardMask.from_indices(hands[i]).has_bomb()
+    ]
+    if bombers:
+        lines.append(f'BOMBE: {" ".join(bombers)} ')
+
+    # Play
+    lines.append('---------------Rundenverlauf------------------')
+    after = [model.CardMask.from_indices(x) for x in hands]
+    actions = play_round(rng, hands, calls)
+
+    for i, action, cards in actions:
+        if action == model.ActionTypes.play:
+            lines.append(f'{players[i]}: {format_cards(cards)} ')
+        elif action == model.ActionTypes.pass_:
+            lines.append(f'{players[i]} passt.')
+        elif action == model.ActionTypes.wish:
+            lines.append(f'Wunsch:{rank_codes[cards]}')
+        elif action == model.ActionTypes.give_dragon:
+            lines.append(f'Drache an: {players[i]}')
+        elif action == model.ActionTypes.tichu:
+            lines.append(f'Tichu: {players[i]}')
+
+    # Score
+    masks = [
+            (i, action, model.CardMask.from_indices(cards)
+                if action == model.ActionTypes.play
+                else model.rank_mask(cards)
+                if action == model.ActionTypes.wish
+                else 0)
+            for i, action, cards in actions
+    ]
+    for _, state in replay.replay_round(after, masks):
+        pass
+
+    scores = replay.score_round(state, calls)
+    lines.append('Ergebnis: {} - {}'.format(*scores))
+
+    return lines, scores
+
+def play_round(rng, hands, calls):
+    """
+    Play out a round between four bots.  Return a list of ``(player,
+    action_type, cards)`` tuples, where *cards* is a list of card indices for
+    plays, a rank for wishes, and None otherwise.
+    """
+    A = model.ActionTypes
+    actions = []
+    finishes = []
+    wish = None
+
+    def is_active(i):
+        return bool(hands[i])
+
+    def next_active(i):
+        for j in range(1, 5):
+            if is_active((i + j) % 4):
+                return (i + j) % 4
+
+    def is_over():
+        if len(finishes) >= 3:
+            return True
+        return len(finishes) == 2 and finishes[0] % 2 == finishes[1] % 2
+
+    def play(i, cards):
+        nonlocal wish
+        for x in cards:
+            hands[i].remove(x)
+        actions.append((i, A.play, cards))
+
+        if wish and any(get_rank(x) == wish for x in cards):
+            wish = None
+        if ONE in cards and rng.random() < 0.7:
+            wish = rng.randint(2, 14)
+            actions.append((i, A.wish, wish))
+        if not hands[i]:
+            finishes.append(i)
+
+    leader = next(i for i in range(4) if ONE in hands[i])
+
+    while not is_over():
+        # Lead
+        if len(hands[leader]) == 14 and leader not in calls \
+                and rng.random() < 0.03:
+            calls[leader] = model.CallTypes.tichu_after
+            actions.append((leader, A.tichu, None))
+
+        lead = choose_lead(rng, hands[leader], wish)
+        play(leader, lead)
+
+        if lead == [HOUND]:
+            partner = (leader + 2) % 4
+            leader = partner if is_active(partner) else next_active(partner)
+            continue
+
+        holder, top = leader, lead
+        value = get_top_value(lead, 1)
+        turn = leader
+
+        # Follow
+        while not is_over():
+            turn = next_active(turn)
+
+            if turn is None or turn == holder:
+                break
+
+            cards = choose_follow(rng, hands[turn], len(top), value, wish)
+
+            if cards and (holder % 2 != turn % 2 or rng.random() < 0.1):
+                play(turn, cards)
+                holder, top = turn, cards
+                value = get_top_value(cards, value)
+                continue
+
+            actions.append((turn, A.pass_, None))
+
+            # The trick is over once everyone else has passed.
+            others = [i for i in range(4) if is_active(i) and i != holder]
+            passes = 0
+            for i, action, _ in reversed(actions):
+                if action != A.pass_:
+                    break
+                passes += 1
+
+            if passes >= len(others):
+                break
+
+        if is_over():
+            break
+
+        if is_active(holder):
+            actions.append((holder, A.pass_, None))
+
+        if top == [DRAGON]:
+            opponent = (holder + 1 + 2 * rng.randint(0, 1)) % 4
+            actions.append((opponent, A.give_dragon, None))
+
+        leader = holder if is_active(holder) else next_active(holder)
+
+    return actions
+
+def choose_lead(rng, hand, wish):
+    ranks = Counter(get_rank(x) for x in hand if get_rank(x))
+
+    if wish in ranks:
+        return [next(x for x in sorted(hand) if get_rank(x) == wish)]
+    if ONE in hand:
+        return [ONE]
+    if HOUND in hand and (rng.random() < 0.3 or len(hand) == 1):
+        return [HOUND]
+    if not ranks:
+        return [sorted(hand)[0]]
+
+    rank = min(ranks)
+    size = rng.randint(1, min(ranks[rank], 3))
+    return [x for x in sorted(hand) if get_rank(x) == rank][:size]
+
+def choose_follow(rng, hand, size, value, wish):
+    """
+    Return the cards to play on a trick of the given size (i.e. singles, 
+    pairs, or triples) and value, or None to pass.
+    """
+    if rng.random() < 0.2 and wish is None:
+        return None
+
+    if size == 1:
+        singles = sorted(
+                (x for x in hand
+                    if x not in (HOUND, ONE) and get_value(x) > value),
+                key=get_value,
+        )
+        wished = [x for x in singles if get_rank(x) == wish]
+        if wished:
+            return wished[:1]
+        return singles[:1] or None
+
+    # Pairs and triples, without the phoenix.
+    ranks = Counter(get_rank(x) for x in hand if get_rank(x))
+    for rank in sorted(ranks):
+        if rank > value and ranks[rank] >= size:
+            return [x for x in sorted(hand) if get_rank(x) == rank][:size]
+
+    return None
+
+def get_top_value(cards, value):
+    """
+    Return the value that has to be beaten after the given cards are played 
+    on a trick with the given value.  The phoenix beats any single except the 
+    dragon, by half a rank.
+    """
+    if cards == [PHOENIX]:
+        return value + 0.5
+    return get_value(cards[0])
+
+def get_rank(i):
+    return model.CARDS[i][1]
+
+def get_value(i):
+    return values[i] if i in values else model.CARDS[i][1]
+
+def format_cards(cards):
+    cards = sorted(cards, key=get_value, reverse=True)
+    return ' '.join(card_codes[x] for x in cards)
+
+card_codes = {v: k for k, v in card_indices.items()}
+rank_codes = {
+        2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9',
+        10: '10', 11: 'B', 12: 'D', 13: 'K', 14: 'A',
+}
+
+ONE = card_indices['Ma']
+HOUND = card_indices['Hu']
+PHOENIX = card_indices['Ph']
+DRAGON = card_indices['Dr']
+
+values = {
+        ONE: 1,
+        HOUND: 0,
+        PHOENIX: 14.5,
+        DRAGON: 15,
+}